@@ -0,0 +1,202 @@
+import asyncio
+import hashlib
+import os
+import secrets
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import aiohttp
+
+import metrics
+import upstream
+
+# ── Asset cache configuration ───────────────────────────────────────────────────
+CACHE_DIR = Path(__file__).parent / "cache" / "assets"
+MAX_DISK_BYTES = 2 * 1024 ** 3   # card art is ~1-3 MB per image
+# Upstream bodies are written to disk in chunks of this size, never held whole in memory
+CHUNK_SIZE = 256 * 1024
+# Leftover downloads older than this are from a crashed process, younger ones may be another shard's
+STALE_TMP_AGE = 60 * 60
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+def asset_key(source: str, path: str) -> str:
+    return hashlib.sha256(f"{source}:{path}".encode("utf8")).hexdigest()
+
+
+def _unlink_quietly(file_path: Path):
+    try:
+        file_path.unlink(missing_ok=True)
+    except OSError:
+        # e.g. still open for an upload on Windows, the next scan picks it up again
+        pass
+
+
+class AssetCache:
+    def __init__(self, root: Path = CACHE_DIR, max_bytes: int = MAX_DISK_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        # key -> size on disk, least recently used first
+        self._disk: OrderedDict[str, int] = OrderedDict()
+        self._disk_total = 0
+        self._session: aiohttp.ClientSession | None = None
+
+    async def start(self, session: aiohttp.ClientSession):
+        self._session = session
+        entries = await asyncio.to_thread(self._scan)
+        for key, size in entries:
+            self._disk[key] = size
+            self._disk_total += size
+        await self._evict()
+        print(f"[asset_cache] {len(self._disk)} assets, {self._disk_total / 1024 ** 2:.1f} MB on disk")
+
+    def _scan(self) -> list[tuple[str, int]]:
+        self.root.mkdir(parents=True, exist_ok=True)
+        found = []
+        now = time.time()
+        for file_path in self.root.glob("*/*"):
+            try:
+                stat = file_path.stat()
+            except FileNotFoundError:
+                # Renamed or evicted by another process mid-scan
+                continue
+            if file_path.suffix == ".tmp":
+                if now - stat.st_mtime > STALE_TMP_AGE:
+                    _unlink_quietly(file_path)
+                continue
+            found.append((stat.st_mtime, file_path.name, stat.st_size))
+        # mtime doubles as the persisted "last used" time
+        found.sort()
+        return [(key, size) for _, key, size in found]
+
+    def _file(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def __contains__(self, item: tuple[str, str]) -> bool:
+        return asset_key(*item) in self._disk
+
+    async def get(self, source: str, path: str) -> Path | None:
+        # Path of the cached file, uploads open it directly instead of reading it into memory
+        key = asset_key(source, path)
+        file_path = self._file(key)
+        if key not in self._disk:
+            # Other shards share the directory, they may have downloaded it already
+            size = await asyncio.to_thread(self._adopt_existing, file_path)
+            if size is None:
+                metrics.cache_event("asset", "miss")
+                return None
+            metrics.cache_event("asset", "hit")
+            self._disk[key] = size
+            self._disk_total += size
+            await self._evict()
+            return file_path if key in self._disk else None
+        try:
+            await asyncio.to_thread(os.utime, file_path)
+        except FileNotFoundError:
+            self._forget(key)
+            metrics.cache_event("asset", "miss")
+            return None
+        metrics.cache_event("asset", "hit")
+        self._disk.move_to_end(key)
+        return file_path
+
+    @staticmethod
+    def _adopt_existing(file_path: Path) -> int | None:
+        try:
+            os.utime(file_path)
+            return file_path.stat().st_size
+        except FileNotFoundError:
+            return None
+
+    async def put(self, source: str, path: str, data: bytes) -> Path:
+        key = asset_key(source, path)
+        file_path = self._file(key)
+        tmp_path = await asyncio.to_thread(self._tmp_path, file_path)
+        await asyncio.to_thread(tmp_path.write_bytes, data)
+        return await self._commit(key, tmp_path, len(data))
+
+    async def fetch(self, source: str, path: str, loader: Callable[[], Awaitable[bytes | None]]) -> Path | None:
+        # For loaders that can only hand over bytes (bestdori-api), written out and dropped right away
+        file_path = await self.get(source, path)
+        if file_path is not None:
+            return file_path
+
+        data = await loader()
+        if not data:
+            return None
+        return await self.put(source, path, data)
+
+    async def fetch_url(self, source: str, path: str, url: str) -> Path | None:
+        file_path = await self.get(source, path)
+        if file_path is not None:
+            return file_path
+
+        key = asset_key(source, path)
+
+        async def download() -> Path | None:
+            async with self._session.get(url) as resp:
+                if resp.status >= 500:
+                    resp.raise_for_status()
+                if resp.status != 200:
+                    return None
+                tmp_path, size = await self._stream(key, resp)
+            return await self._commit(key, tmp_path, size)
+
+        # None only for a missing asset, a 5xx that outlasted the retries is raised
+        return await upstream.call_url(url, download)
+
+    # ── Files written by someone else (e.g. the render pool) ────────────────────
+    async def reserve(self, source: str, path: str) -> Path:
+        # A tmp path next to the final file, hand it back to adopt() or discard()
+        return await asyncio.to_thread(self._tmp_path, self._file(asset_key(source, path)))
+
+    async def adopt(self, source: str, path: str, tmp_path: Path, size: int) -> Path:
+        return await self._commit(asset_key(source, path), tmp_path, size)
+
+    async def discard(self, tmp_path: Path):
+        await asyncio.to_thread(_unlink_quietly, tmp_path)
+
+    async def _stream(self, key: str, resp: aiohttp.ClientResponse) -> tuple[Path, int]:
+        tmp_path = await asyncio.to_thread(self._tmp_path, self._file(key))
+        handle = await asyncio.to_thread(open, tmp_path, "wb")
+        size = 0
+        try:
+            async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                await asyncio.to_thread(handle.write, chunk)
+                size += len(chunk)
+        except BaseException:
+            handle.close()
+            _unlink_quietly(tmp_path)
+            raise
+        await asyncio.to_thread(handle.close)
+        return tmp_path, size
+
+    @staticmethod
+    def _tmp_path(file_path: Path) -> Path:
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        return file_path.with_name(f"{file_path.name}.{secrets.token_hex(4)}.tmp")
+
+    async def _commit(self, key: str, tmp_path: Path, size: int) -> Path:
+        file_path = self._file(key)
+        await asyncio.to_thread(os.replace, tmp_path, file_path)
+
+        self._disk_total -= self._disk.pop(key, 0)
+        self._disk[key] = size
+        self._disk_total += size
+        await self._evict()
+        return file_path
+
+    def _forget(self, key: str):
+        self._disk_total -= self._disk.pop(key, 0)
+
+    async def _evict(self):
+        victims = []
+        while self._disk_total > self.max_bytes and self._disk:
+            key, _ = next(iter(self._disk.items()))
+            self._forget(key)
+            victims.append(self._file(key))
+            metrics.cache_event("asset", "evict")
+        if victims:
+            await asyncio.to_thread(lambda: [_unlink_quietly(p) for p in victims])
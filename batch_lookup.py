@@ -0,0 +1,174 @@
+import asyncio
+import re
+from typing import Awaitable, Callable, NamedTuple
+
+import discord
+from discord.ext import commands
+
+from cdn_cache import Asset, edit_with_assets, reply_with_assets
+from localisation import get_text
+from upstream import UpstreamUnavailable, with_deadline
+
+# ── Batch lookup configuration ──────────────────────────────────────────────────
+# Most ids one command may ask for, e.g. `^card 947-996`
+MAX_BATCH = 50
+# Discord shows at most 10 embeds per message, one page is one message
+PAGE_SIZE = 10
+# Image downloads in flight at once while a page is built
+BATCH_CONCURRENCY = 4
+# Seconds the page buttons keep working after the last use
+PAGE_TIMEOUT = 180
+# ────────────────────────────────────────────────────────────────────────────────
+
+# 947, pjsk12, 947-955, pjsk100~pjsk110
+_ID_OR_RANGE = re.compile(r"(pjsk)?(\d+)(?:[-~～](?:pjsk)?(\d+))?")
+_SEPARATORS = re.compile(r"[\s,，、]+")
+
+
+class BatchEntry(NamedTuple):
+    embed: discord.Embed
+    # Thumbnail of the entry, only fetched once its page is shown
+    thumbnail: Callable[[], Awaitable[Asset | None]] | None = None
+
+
+def parse_ids(text: str) -> list[str] | None:
+    # Tokens in the cogs' id format ("947", "pjsk12") for a list or range, None for a single id or a name.
+    # Words after the ids are ignored. Stops one past MAX_BATCH, so a huge range is never spelled out.
+    parts = [part for part in _SEPARATORS.split(text.strip().lower()) if part]
+    batch = False
+    ids = []
+    for i, part in enumerate(parts):
+        match = _ID_OR_RANGE.fullmatch(part)
+        if match is None:
+            if i == 0:
+                return None
+            break
+        if i > 0:
+            batch = True
+        prefix, start, end = match.group(1) or "", int(match.group(2)), match.group(3)
+        if end is None:
+            ids.append(f"{prefix}{start}")
+            continue
+        batch = True
+        start, end = sorted((start, int(end)))
+        for entry_id in range(start, min(end, start + MAX_BATCH) + 1):
+            ids.append(f"{prefix}{entry_id}")
+        if len(ids) > MAX_BATCH:
+            break
+    return list(dict.fromkeys(ids)) if batch else None
+
+
+async def _render(lang: str, entries: list[BatchEntry], missing: list[str], page: int) -> tuple[list[discord.Embed], list[Asset]]:
+    chunk = entries[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
+    # Copies, reply_with_assets() sets the image urls on them
+    embeds = [entry.embed.copy() for entry in chunk]
+    budget = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def load(entry: BatchEntry) -> Asset | None:
+        if entry.thumbnail is None:
+            return None
+        async with budget:
+            try:
+                return await with_deadline(entry.thumbnail())
+            except Exception as e:
+                # The entry still shows, just without its thumbnail
+                print(f"[batch_lookup] Thumbnail fetch failed: {e}")
+                return None
+
+    loaded = await asyncio.gather(*(load(entry) for entry in chunk))
+    assets = [asset._replace(embed=i) for i, asset in enumerate(loaded) if asset is not None]
+
+    pages = -(-len(entries) // PAGE_SIZE)
+    footer = []
+    if pages > 1:
+        footer.append(get_text(lang, "batch", "PAGE", PAGE=page + 1, PAGES=pages))
+    if missing:
+        footer.append(get_text(lang, "batch", "MISSING", IDS=", ".join(missing)))
+    if footer:
+        embeds[-1].set_footer(text=" · ".join(footer))
+    return embeds, assets
+
+
+class BatchPages(discord.ui.View):
+    def __init__(self, bot: commands.Bot, author_id: int, pages: int, render: Callable[[int], Awaitable[tuple]]):
+        super().__init__(timeout=PAGE_TIMEOUT)
+        self.bot = bot
+        self.author_id = author_id
+        self.pages = pages
+        self.page = 0
+        self.message: discord.Message | None = None
+        self._render = render
+        self._sync_buttons()
+
+    def _sync_buttons(self):
+        self.previous.disabled = self.page == 0
+        self.next.disabled = self.page >= self.pages - 1
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # Only whoever ran the command turns the pages
+        return interaction.user.id == self.author_id
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+    async def previous(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page - 1)
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+    async def next(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page + 1)
+
+    async def _show(self, interaction: discord.Interaction, page: int):
+        self.page = max(0, min(page, self.pages - 1))
+        self._sync_buttons()
+        # Images of the new page may need fetching, answer the click first
+        await interaction.response.defer()
+        embeds, assets = await self._render(self.page)
+        self.message = await edit_with_assets(self.bot, interaction.message, embeds, assets, view=self)
+
+    async def on_timeout(self):
+        if self.message is not None:
+            try:
+                await self.message.edit(view=None)
+            except discord.HTTPException:
+                pass
+
+
+async def lookup_batch(
+    ctx: commands.Context,
+    lang: str,
+    section: str,
+    ids: list[str],
+    build: Callable[[list[str]], Awaitable[list[BatchEntry | None]]],
+):
+    # build() answers every id in one pass over the shared directories / master tables, None for unknown ids
+    if len(ids) > MAX_BATCH:
+        await ctx.reply(get_text(lang, "batch", "TOO_MANY", MAX=MAX_BATCH))
+        return
+    # Slash invocations have 3 seconds to answer, prefix ones ignore this
+    await ctx.defer()
+
+    try:
+        found = await with_deadline(build(ids))
+    except (UpstreamUnavailable, asyncio.TimeoutError):
+        await ctx.reply(get_text(lang, section, "UNAVAILABLE"))
+        return
+    except Exception as e:
+        await ctx.reply(get_text(lang, section, "ERROR", ERROR=e))
+        return
+
+    entries = [entry for entry in found if entry is not None]
+    missing = [entry_id for entry_id, entry in zip(ids, found) if entry is None]
+    if not entries:
+        await ctx.reply(get_text(lang, "batch", "NONE_FOUND", IDS=", ".join(missing)))
+        return
+
+    async def render(page: int) -> tuple[list[discord.Embed], list[Asset]]:
+        return await _render(lang, entries, missing, page)
+
+    embeds, assets = await render(0)
+    pages = -(-len(entries) // PAGE_SIZE)
+    if pages == 1:
+        await reply_with_assets(ctx, embeds, assets)
+        return
+    view = BatchPages(ctx.bot, ctx.author.id, pages, render)
+    # Turning the page deletes these attachments, so their urls are not kept for other replies
+    view.message = await reply_with_assets(ctx, embeds, assets, remember=False, view=view)
@@ -0,0 +1,91 @@
+import asyncio
+import itertools
+from types import SimpleNamespace
+
+import discord
+from discord.ext import commands
+
+_ids = itertools.count(1)
+
+
+def _drain(files: list[discord.File]) -> int:
+    # Reads the attachments the way an upload would, so disk and file handle costs show up
+    total = 0
+    for file in files:
+        while chunk := file.fp.read(256 * 1024):
+            total += len(chunk)
+    return total
+
+
+class FakeContext(commands.Context):
+    # A real Context, only replies stay local, recorded on the bench instead of sent to Discord
+    bench = None
+
+    async def reply(self, content: str | None = None, **kwargs) -> SimpleNamespace:
+        return await self.bench.record_reply(content, **kwargs)
+
+    async def send(self, content: str | None = None, **kwargs) -> SimpleNamespace:
+        return await self.bench.record_reply(content, **kwargs)
+
+
+class FakeDiscord:
+    def __init__(self, bot: commands.Bot, upload_latency: float = 0.0):
+        self.bot = bot
+        self.upload_latency = upload_latency
+        self.replies = 0
+        self.text_replies = 0
+        self.uploaded_bytes = 0
+        self.uploaded_files = 0
+
+        FakeContext.bench = self
+        # Commands only care that the author is not the bot itself
+        bot._connection.user = SimpleNamespace(id=0, bot=True)
+        original_get_context = bot.get_context
+
+        async def get_context(origin, *, cls=FakeContext):
+            return await original_get_context(origin, cls=cls)
+
+        bot.get_context = get_context
+
+    def reset_counters(self):
+        self.replies = 0
+        self.text_replies = 0
+        self.uploaded_bytes = 0
+        self.uploaded_files = 0
+
+    def message(self, content: str, user_id: int = 1) -> SimpleNamespace:
+        # Direct message from a user, so language resolves per user and no guild is needed
+        return SimpleNamespace(
+            id=next(_ids),
+            content=content,
+            author=SimpleNamespace(id=user_id, bot=False),
+            guild=None,
+            channel=SimpleNamespace(id=user_id),
+            attachments=[],
+            _state=self.bot._connection,
+        )
+
+    async def record_reply(self, content: str | None = None, **kwargs) -> SimpleNamespace:
+        files = list(kwargs.get("files") or ())
+        if kwargs.get("file") is not None:
+            files.append(kwargs["file"])
+        embeds = list(kwargs.get("embeds") or ())
+        if kwargs.get("embed") is not None:
+            embeds.append(kwargs["embed"])
+
+        self.replies += 1
+        if not embeds:
+            # Usage, not found, error and unavailable messages are all plain text
+            self.text_replies += 1
+        if files:
+            self.uploaded_bytes += await asyncio.to_thread(_drain, files)
+            self.uploaded_files += len(files)
+        if self.upload_latency:
+            await asyncio.sleep(self.upload_latency)
+
+        # Signed CDN urls far in the future, so the CDN url cache keeps them
+        attachments = [
+            SimpleNamespace(filename=file.filename, url=f"https://cdn.discordapp.com/attachments/0/{next(_ids)}/{file.filename}?ex=7fffffff")
+            for file in files
+        ]
+        return SimpleNamespace(id=next(_ids), attachments=attachments, embeds=embeds, content=content)
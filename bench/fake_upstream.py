@@ -0,0 +1,130 @@
+import asyncio
+import random
+from collections import Counter
+
+from aiohttp import web
+
+from bench.fixtures import Fixtures
+
+
+class FakeUpstream:
+    # One local server standing in for Bestdori, GitHub raw/API and storage.sekai.best,
+    # told apart by path prefix
+    def __init__(
+        self,
+        fixtures: Fixtures,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: int = 0,
+    ):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.host = host
+        self.port = port
+        self.calls: Counter[str] = Counter()
+        self.errors: Counter[str] = Counter()
+        self._rng = random.Random(seed)
+        self._runner: web.AppRunner | None = None
+
+    @property
+    def base(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/bestdori/{path:.*}", self._bestdori)
+        app.router.add_get("/github-raw/{repo}/main/{table}.json", self._github_raw)
+        app.router.add_get("/github-api/{repo}/commits/main", self._github_commit)
+        app.router.add_get("/sekai-assets/{path:.*}", self._sekai_asset)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Port 0 picks a free one, read back what we got
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def reset_counters(self):
+        self.calls.clear()
+        self.errors.clear()
+
+    async def _delay(self, upstream: str) -> bool:
+        # True means answer this one with a 503
+        self.calls[upstream] += 1
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self._rng.gauss(self.latency, self.jitter)))
+        if self.error_rate and self._rng.random() < self.error_rate:
+            self.errors[upstream] += 1
+            return True
+        return False
+
+    def _png(self) -> web.Response:
+        return web.Response(body=self.fixtures.png, content_type="image/png")
+
+    async def _bestdori(self, request: web.Request) -> web.Response:
+        if await self._delay("bestdori"):
+            return web.Response(status=503)
+        path = request.match_info["path"]
+        fixtures = self.fixtures
+        if path.endswith(".png"):
+            return self._png()
+
+        # api/<kind>/<id>.json or api/<kind>/all.<n>.json
+        parts = path.split("/")
+        if len(parts) != 3 or parts[0] != "api":
+            return web.Response(status=404)
+        kind, name = parts[1], parts[2]
+        if name.startswith("all."):
+            if kind == "bands":
+                return web.json_response(fixtures.bestdori_bands)
+            if kind in ("cards", "characters", "gacha"):
+                return web.json_response(fixtures.bestdori_directory(kind))
+            return web.Response(status=404)
+
+        try:
+            entry_id = int(name.removesuffix(".json"))
+        except ValueError:
+            return web.Response(status=404)
+        source = {
+            "cards": fixtures.bestdori_cards,
+            "characters": fixtures.bestdori_characters,
+            "gacha": fixtures.bestdori_gachas,
+        }.get(kind, {})
+        if entry_id not in source:
+            # What Bestdori answers for an unknown id
+            return web.json_response({"result": False})
+        return web.json_response(source[entry_id])
+
+    async def _github_raw(self, request: web.Request) -> web.Response:
+        if await self._delay("github-raw"):
+            return web.Response(status=503)
+        table = request.match_info["table"]
+        rows = self.fixtures.pjsk_tables.get(table)
+        if rows is None:
+            return web.Response(status=404)
+        etag = f'"{table}-{len(rows)}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.json_response(rows, headers={"ETag": etag})
+
+    async def _github_commit(self, request: web.Request) -> web.Response:
+        if await self._delay("github-api"):
+            return web.Response(status=503)
+        etag = '"bench-commit"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(text="bench0000000000000000000000000000000000000", headers={"ETag": etag})
+
+    async def _sekai_asset(self, request: web.Request) -> web.Response:
+        if await self._delay("sekai-assets"):
+            return web.Response(status=503)
+        return self._png()
@@ -0,0 +1,124 @@
+import random
+import struct
+import zlib
+
+# Same shapes as the real upstream payloads, only the fields the bot reads
+UNITS = ("light_sound", "idol", "street", "theme_park", "school_refusal", "piapro")
+SERVERS = ("jp", "en", "tw", "cn", "kr")
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def make_png(size_kb: int, seed: int = 0) -> bytes:
+    # A valid RGB PNG of noise, so it neither compresses away nor breaks Pillow
+    width = 256
+    height = max(1, size_kb * 1024 // (width * 3 + 1))
+    rng = random.Random(seed)
+    rows = b"".join(b"\x00" + rng.randbytes(width * 3) for _ in range(height))
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + _png_chunk(b"IHDR", header)
+        + _png_chunk(b"IDAT", zlib.compress(rows, 1))
+        + _png_chunk(b"IEND", b"")
+    )
+
+
+class Fixtures:
+    def __init__(self, cards: int = 500, characters: int = 26, gachas: int = 100, png_kb: int = 256):
+        self.card_ids = list(range(1, cards + 1))
+        self.character_ids = list(range(1, characters + 1))
+        self.gacha_ids = list(range(1, gachas + 1))
+        self.png = make_png(png_kb)
+
+        # ── PJSK master tables ──────────────────────────────────────────────────
+        self.pjsk_tables = {
+            "cards": [
+                {
+                    "id": card_id,
+                    "characterId": self._character_of(card_id),
+                    "prefix": f"Card {card_id}",
+                    "assetbundleName": f"res{self._character_of(card_id):03d}_no{card_id:03d}",
+                    "cardRarityType": f"rarity_{card_id % 4 + 1}",
+                }
+                for card_id in self.card_ids
+            ],
+            "gameCharacters": [
+                {
+                    "id": char_id,
+                    "firstName": f"First{char_id}",
+                    "givenName": f"Given{char_id}",
+                    "unit": UNITS[char_id % len(UNITS)],
+                    "resourceId": char_id,
+                }
+                for char_id in self.character_ids
+            ],
+            "gachas": [
+                {
+                    "id": gacha_id,
+                    "name": f"Gacha {gacha_id}",
+                    "assetbundleName": f"ab_gacha{gacha_id}",
+                    "startAt": 1600000000000 + gacha_id * 86400000,
+                    "endAt": 1600000000000 + (gacha_id + 7) * 86400000,
+                    "gachaPickups": [{"cardId": card_id} for card_id in self._pickups(gacha_id)],
+                }
+                for gacha_id in self.gacha_ids
+            ],
+            "unitProfiles": [{"unit": unit, "unitName": unit.replace("_", " ").title()} for unit in UNITS],
+        }
+
+        # ── Bestdori API ────────────────────────────────────────────────────────
+        self.bestdori_cards = {
+            card_id: {
+                "characterId": self._character_of(card_id),
+                "rarity": card_id % 4 + 1,
+                "attribute": "cool",
+                "levelLimit": 50,
+                "resourceSetName": f"res{card_id:06d}",
+                "prefix": [f"カード{card_id}", f"Card {card_id}", None, f"卡面{card_id}", None],
+                "releasedAt": ["1600000000000"] * len(SERVERS),
+                "type": "permanent",
+            }
+            for card_id in self.card_ids
+        }
+        self.bestdori_characters = {
+            char_id: {
+                "characterType": "unique",
+                "characterName": [f"キャラ{char_id}", f"Character {char_id}", None, f"角色{char_id}", None],
+                "bandId": char_id % 5 + 1,
+            }
+            for char_id in self.character_ids
+        }
+        self.bestdori_bands = {
+            str(band_id): {"bandName": [f"バンド{band_id}", f"Band {band_id}", None, f"乐队{band_id}", None]}
+            for band_id in range(1, 6)
+        }
+        self.bestdori_gachas = {
+            gacha_id: {
+                "resourceName": f"gacha{gacha_id}",
+                "bannerAssetBundleName": f"banner_gacha{gacha_id}",
+                "gachaName": [f"ガチャ{gacha_id}", f"Gacha {gacha_id}", None, f"卡池{gacha_id}", None],
+                "publishedAt": [str(1600000000000 + gacha_id * 86400000)] * len(SERVERS),
+                "closedAt": [str(1600000000000 + (gacha_id + 7) * 86400000)] * len(SERVERS),
+                "type": "permanent",
+            }
+            for gacha_id in self.gacha_ids
+        }
+
+    def _character_of(self, card_id: int) -> int:
+        return (card_id - 1) % len(self.character_ids) + 1
+
+    def _pickups(self, gacha_id: int) -> list[int]:
+        first = (gacha_id * 3) % len(self.card_ids)
+        return [self.card_ids[(first + i) % len(self.card_ids)] for i in range(3)]
+
+    def bestdori_directory(self, kind: str) -> dict:
+        # all.5.json style, the same entries keyed by id
+        source = {
+            "cards": self.bestdori_cards,
+            "characters": self.bestdori_characters,
+            "gacha": self.bestdori_gachas,
+        }[kind]
+        return {str(entry_id): entry for entry_id, entry in source.items()}
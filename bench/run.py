@@ -0,0 +1,267 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench.fake_discord import FakeDiscord
+from bench.fake_upstream import FakeUpstream
+from bench.fixtures import Fixtures
+
+# ── Workload ────────────────────────────────────────────────────────────────────
+# (command, id prefix), every request picks one of these and a random id
+COMMANDS = (
+    ("card", "pjsk"),
+    ("card", ""),
+    ("character", "pjsk"),
+    ("character", ""),
+    ("gacha", "pjsk"),
+    ("gacha", ""),
+)
+# Raw (prefix-less) aliases from bot.py, to go through the on_message rewrite
+ALIASES = {"card": "查卡", "character": "角色", "gacha": "卡池"}
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+def build_workload(fixtures: Fixtures, requests: int, alias_share: float, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    pools = {"card": fixtures.card_ids, "character": fixtures.character_ids, "gacha": fixtures.gacha_ids}
+    workload = []
+    for _ in range(requests):
+        command, prefix = rng.choice(COMMANDS)
+        entity_id = rng.choice(pools[command])
+        name = ALIASES[command] if rng.random() < alias_share else f"^{command}"
+        workload.append(f"{name} {prefix}{entity_id}")
+    return workload
+
+
+def peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:
+        # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, KiB everywhere else
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values: list[float], q: float) -> float:
+    # Nearest rank on an already sorted list
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(q * len(values)) - 1))]
+
+
+def prepare_bot(base: str, cache_dir: Path, keep_rate_limits: bool):
+    # Everything upstream is pointed at the fake server before the bot module is imported
+    import bestdori.utils.network
+    import pjsk_master
+    import upstream
+
+    bestdori.utils.network.PREFIX["bestdori"] = f"{base}/bestdori"
+    pjsk_master.RAW_BASE = f"{base}/github-raw/{{repo}}/main"
+    pjsk_master.COMMIT_URL = f"{base}/github-api/{{repo}}/commits/main"
+    pjsk_master.ASSET_BASE = f"{base}/sekai-assets"
+    if not keep_rate_limits:
+        # Every fake upstream is the same local host, the real per-host buckets would all collapse into one
+        upstream.RATE_LIMITS = {}
+        upstream.DEFAULT_RATE_LIMIT = (1_000_000, 1_000_000)
+    # lang_settings reads the path on import, which happens with the bot module
+    os.environ["BOT_LANG_DB"] = str(cache_dir / "language_settings.db")
+
+    import bot as bot_module
+    from asset_cache import AssetCache
+    from cdn_cache import CdnUrlCache
+    from image_render import ImageRenderer
+
+    # Fresh on-disk stores, the bench must neither read nor pollute the real cache/
+    bot = bot_module.bot
+    bot.asset_cache = AssetCache(cache_dir / "assets")
+    bot.cdn_urls = CdnUrlCache(cache_dir / "cdn_urls.json")
+    bot.pjsk_master = pjsk_master.PjskMasterStore(cache_dir=cache_dir / "master")
+    bot.pjsk_master.add_listener(bot_module._on_pjsk_update)
+    bot.renderer = ImageRenderer(bot.asset_cache, bot.cdn_urls, bot.single_flight)
+    return bot_module
+
+
+async def start_bot(bot_module):
+    # Mirrors main() in bot.py, minus the gateway and the background jobs (warm-up, watchers)
+    from http_client import create_session
+    import lang_settings
+    import pjsk_master
+
+    bot = bot_module.bot
+    bot.http_session = create_session()
+    bot.pjsk_master.start(bot.http_session)
+    await bot.asset_cache.start(bot.http_session)
+    # No session, the fake attachment urls are not on Discord's CDN to be checked
+    await bot.cdn_urls.start()
+    await lang_settings.start()
+    bot.band_directory.start()
+    bot.character_directory.start()
+    bot.card_directory.start()
+    bot.gacha_directory.start()
+    bot.search.start()
+    await bot_module.load_commands()
+    # Cogs copied ASSET_BASE at import time
+    for name, module in list(sys.modules.items()):
+        if name.startswith("commands.") and hasattr(module, "ASSET_BASE"):
+            module.ASSET_BASE = pjsk_master.ASSET_BASE
+
+
+async def stop_bot(bot_module):
+    import lang_settings
+
+    bot = bot_module.bot
+    await bot.search.close()
+    await bot.renderer.close()
+    await bot.game_data.close()
+    await bot.pjsk_master.close()
+    await bot.band_directory.close()
+    await bot.character_directory.close()
+    await bot.card_directory.close()
+    await bot.gacha_directory.close()
+    await lang_settings.close()
+    await bot.cdn_urls.close()
+    await bot.http_session.close()
+
+
+async def run_scenario(
+    name: str, workload: list[str], concurrency: int, bot_module, upstream: FakeUpstream, discord: FakeDiscord
+) -> dict:
+    import metrics
+
+    upstream.reset_counters()
+    discord.reset_counters()
+    metrics.reset()
+
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(content: str):
+        async with semaphore:
+            started = time.perf_counter()
+            await bot_module.on_message(discord.message(content))
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(content) for content in workload))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    phases = {}
+    for labels, histogram in metrics.histograms("bot_command_phase_seconds").items():
+        names = dict(labels)
+        phases[f"{names['command']}/{names['phase']}"] = {
+            "count": histogram.count,
+            "p95_ms": round((histogram.quantile(0.95) or 0) * 1000, 1),
+        }
+
+    rss = peak_rss_mb()
+    return {
+        "scenario": name,
+        "requests": len(workload),
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "rps": round(len(workload) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        "replies": discord.replies,
+        "text_replies": discord.text_replies,
+        "uploaded_files": discord.uploaded_files,
+        "uploaded_mb": round(discord.uploaded_bytes / 1024 ** 2, 2),
+        "upstream_calls": dict(upstream.calls),
+        "upstream_errors": dict(upstream.errors),
+        "phases": phases,
+        "peak_rss_mb": round(rss, 1) if rss is not None else None,
+    }
+
+
+def print_report(result: dict):
+    print(
+        f"[bench] {result['scenario']}: {result['requests']} requests in {result['seconds']:.2f} s, "
+        f"{result['rps']} req/s (concurrency {result['concurrency']})"
+    )
+    print(
+        f"[bench]   latency p50 {result['p50_ms']} ms · p95 {result['p95_ms']} ms · "
+        f"p99 {result['p99_ms']} ms · max {result['max_ms']} ms"
+    )
+    print(
+        f"[bench]   replies {result['replies']} ({result['text_replies']} text-only), "
+        f"{result['uploaded_files']} files / {result['uploaded_mb']} MB uploaded"
+    )
+    calls = ", ".join(f"{name} {count}" for name, count in sorted(result["upstream_calls"].items())) or "none"
+    print(f"[bench]   upstream calls: {calls}")
+    if result["upstream_errors"]:
+        errors = ", ".join(f"{name} {count}" for name, count in sorted(result["upstream_errors"].items()))
+        print(f"[bench]   injected errors: {errors}")
+    if result["phases"]:
+        phases = ", ".join(f"{name} p95 {stats['p95_ms']} ms" for name, stats in sorted(result["phases"].items()))
+        print(f"[bench]   phases: {phases}")
+    if result["peak_rss_mb"] is not None:
+        print(f"[bench]   peak RSS {result['peak_rss_mb']} MB")
+
+
+async def main_async(args: argparse.Namespace) -> list[dict]:
+    cache_dir = Path(tempfile.mkdtemp(prefix="bot-bench-"))
+    fixtures = Fixtures(args.cards, args.characters, args.gachas, args.png_kb)
+    upstream = FakeUpstream(fixtures, args.latency, args.jitter, args.error_rate, seed=args.seed)
+    await upstream.start()
+
+    bot_module = prepare_bot(upstream.base, cache_dir, args.keep_rate_limits)
+    discord = FakeDiscord(bot_module.bot, args.upload_latency)
+    workload = build_workload(fixtures, args.requests, args.alias_share, args.seed)
+
+    results = []
+    try:
+        await start_bot(bot_module)
+        # "warm" replays the same workload, so it runs against whatever "cold" left in the caches
+        scenarios = ["cold", "warm"] if args.scenario == "both" else [args.scenario]
+        if scenarios == ["warm"]:
+            print("[bench] Priming caches for the warm run...")
+            await run_scenario("prime", workload, args.concurrency, bot_module, upstream, discord)
+        for name in scenarios:
+            result = await run_scenario(name, workload, args.concurrency, bot_module, upstream, discord)
+            print_report(result)
+            results.append(result)
+    finally:
+        await stop_bot(bot_module)
+        await upstream.close()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return results
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(
+        prog="python -m bench",
+        description="Offline load test of the card/char/gacha commands against local stand-ins for every upstream.",
+    )
+    parser.add_argument("--scenario", choices=("cold", "warm", "both"), default="both")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--alias-share", type=float, default=0.3, help="share of requests sent as raw aliases")
+    parser.add_argument("--latency", type=float, default=0.03, help="mean upstream latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.01, help="stddev of the upstream latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of upstream requests answered with 503")
+    parser.add_argument("--upload-latency", type=float, default=0.05, help="seconds per simulated Discord reply")
+    parser.add_argument("--cards", type=int, default=500)
+    parser.add_argument("--characters", type=int, default=26)
+    parser.add_argument("--gachas", type=int, default=100)
+    parser.add_argument("--png-kb", type=int, default=256, help="size of every fake image")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="keep upstream.py's rate limits in place")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", type=Path, help="also write the results here, e.g. to compare runs")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(main_async(args))
+    if args.json is not None:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf8")
+        print(f"[bench] Results written to {args.json}")
@@ -0,0 +1,223 @@
+import asyncio
+import functools
+import inspect
+import os
+import traceback
+from types import ModuleType
+from typing import Any, Awaitable, Callable
+
+import bestdori.bands
+import bestdori.cards
+import bestdori.characters
+import bestdori.exceptions
+import bestdori.gacha
+
+import metrics
+import upstream
+
+# ── Bestdori directory configuration ────────────────────────────────────────────
+DIRECTORY_TTL = 6 * 60 * 60
+# Cards and gachas are polled more often so new releases are noticed (and prefetched) quickly
+RELEASE_DIRECTORY_TTL = 30 * 60
+# Synchronous bestdori calls made on the event loop are logged once per call site, BOT_BLOCKING_GUARD=0 turns it off
+BLOCKING_GUARD = os.environ.get("BOT_BLOCKING_GUARD", "1") == "1"
+# BOT_LOOP_DEBUG=1 also runs asyncio in debug mode, which reports any callback holding the loop this long
+LOOP_DEBUG = os.environ.get("BOT_LOOP_DEBUG") == "1"
+SLOW_CALLBACK_SECONDS = 0.1
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+async def call_bestdori(func: Callable, *args, **kwargs) -> Any:
+    # Prefer the library's own `<name>_async` twin, otherwise keep the loop free with a thread
+    if inspect.iscoroutinefunction(func):
+        target = func
+    else:
+        owner = getattr(func, "__self__", None) or inspect.getmodule(func)
+        async_func = getattr(owner, f"{func.__name__}_async", None)
+        if async_func is not None and inspect.iscoroutinefunction(async_func):
+            target = async_func
+        else:
+            return await upstream.call(upstream.BESTDORI_HOST, lambda: asyncio.to_thread(func, *args, **kwargs))
+    # Rate limit, retries and circuit breaker shared by every bestdori.com request
+    return await upstream.call(upstream.BESTDORI_HOST, lambda: target(*args, **kwargs))
+
+
+class BestdoriDirectory:
+    def __init__(self, name: str, loader: Callable[[], Awaitable[dict]], ttl: float = DIRECTORY_TTL):
+        self.name = name
+        self.ttl = ttl
+        self._loader = loader
+        self._data: dict | None = None
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._listeners: list[Callable[[], None]] = []
+
+    def add_listener(self, callback: Callable[[], None]):
+        # Called whenever a loaded directory is replaced by a refresh
+        self._listeners.append(callback)
+
+    @property
+    def data(self) -> dict | None:
+        # Whatever is loaded right now, None before the first load, never touches the network
+        return self._data
+
+    async def get(self) -> dict:
+        if self._data is None:
+            await self.refresh(force=False)
+        return self._data
+
+    async def refresh(self, force: bool = True):
+        async with self._lock:
+            if not force and self._data is not None:
+                return
+            replaced = self._data
+            self._data = await self._loader()
+            print(f"[bestdori_data] Loaded {len(self._data)} {self.name}")
+            if replaced is not None and replaced != self._data:
+                for callback in self._listeners:
+                    callback()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.ttl)
+            try:
+                await self.refresh()
+            except Exception as e:
+                # Keep serving the previous directory until the next round
+                print(f"[bestdori_data] Refresh of {self.name} failed: {e}")
+
+
+def band_directory() -> BestdoriDirectory:
+    return BestdoriDirectory("bands", lambda: call_bestdori(bestdori.bands.get_all))
+
+
+def card_directory() -> BestdoriDirectory:
+    return BestdoriDirectory("cards", lambda: call_bestdori(bestdori.cards.get_all, 5), RELEASE_DIRECTORY_TTL)
+
+
+def character_directory() -> BestdoriDirectory:
+    return BestdoriDirectory("characters", lambda: call_bestdori(bestdori.characters.get_all, 5))
+
+
+def gacha_directory() -> BestdoriDirectory:
+    return BestdoriDirectory("gachas", lambda: call_bestdori(bestdori.gacha.get_all, 5), RELEASE_DIRECTORY_TTL)
+
+
+# What bestdori-api raises when an asset (e.g. after-training art) really does not exist
+ASSET_MISSING = (bestdori.exceptions.NotExistException, bestdori.exceptions.AssetsNotExistError)
+
+
+# ── Asset cache paths for the "bestdori" source, shared by the cogs and the warm-up ─
+def card_art_path(card_id: int, variant: str) -> str:
+    return f"card/{card_id}/{variant}"
+
+
+def card_thumb_path(card_id: int, variant: str) -> str:
+    return f"card/{card_id}/thumb/{variant}"
+
+
+def banner_path(gacha_id: int, server: str) -> str:
+    return f"gacha/{gacha_id}/banner/{server}"
+
+
+def icon_path(char_id: int) -> str:
+    return f"character/{char_id}/icon"
+
+
+# ── Asset loaders for AssetCache, the urls depend on names only the info has ────
+def card_art_loader(card_id: int, variant: str) -> Callable[[], Awaitable[bytes]]:
+    async def load() -> bytes:
+        card = bestdori.cards.Card(card_id)
+        await call_bestdori(card.get_info_async)
+        return await call_bestdori(card.get_card_async, variant)
+    return load
+
+
+def card_thumb_loader(card_id: int, variant: str) -> Callable[[], Awaitable[bytes]]:
+    async def load() -> bytes:
+        card = bestdori.cards.Card(card_id)
+        await call_bestdori(card.get_info_async)
+        return await call_bestdori(card.get_thumb_async, variant)
+    return load
+
+
+def banner_loader(gacha_id: int, server: str) -> Callable[[], Awaitable[bytes]]:
+    async def load() -> bytes:
+        gacha = bestdori.gacha.Gacha(gacha_id)
+        await call_bestdori(gacha.get_info_async)
+        return await call_bestdori(gacha.get_banner_async, server)
+    return load
+
+
+# ── Blocking-call guard ─────────────────────────────────────────────────────────
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+# (file, line) of every call site already reported
+_reported_sites: set[tuple[str, int]] = set()
+
+
+def _guard(func: Callable, qualname: str) -> Callable:
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _on_event_loop():
+            # The caller expects a value right away, so the call can only be reported, not moved to a thread
+            stack = traceback.extract_stack()[:-1]
+            caller = stack[-1]
+            metrics.inc("bot_blocking_calls_total", function=qualname)
+            if (caller.filename, caller.lineno) not in _reported_sites:
+                _reported_sites.add((caller.filename, caller.lineno))
+                print(
+                    f"[bestdori_data] Blocking call {qualname}() on the event loop "
+                    f"at {caller.filename}:{caller.lineno}, use call_bestdori() instead\n"
+                    + "".join(traceback.format_list(stack[-6:])).rstrip()
+                )
+        return func(*args, **kwargs)
+
+    wrapper.__bestdori_guarded__ = True
+    return wrapper
+
+
+def _guard_namespace(namespace: Any, prefix: str):
+    for attr, value in list(vars(namespace).items()):
+        if attr.startswith("_") or not callable(value) or getattr(value, "__bestdori_guarded__", False):
+            continue
+        if inspect.iscoroutinefunction(value) or inspect.isclass(value):
+            continue
+        # Only wrap sync functions that have an async twin, the rest are pure helpers
+        if not hasattr(namespace, f"{attr}_async"):
+            continue
+        setattr(namespace, attr, _guard(value, f"{prefix}.{attr}"))
+
+
+def install_blocking_guard(loop: asyncio.AbstractEventLoop, modules: list[ModuleType]):
+    if LOOP_DEBUG:
+        # asyncio's debug mode reports any callback that holds the loop for too long
+        loop.set_debug(True)
+        loop.slow_callback_duration = SLOW_CALLBACK_SECONDS
+    if not BLOCKING_GUARD:
+        return
+
+    for module in modules:
+        _guard_namespace(module, module.__name__)
+        for value in list(vars(module).values()):
+            if inspect.isclass(value) and value.__module__ == module.__name__:
+                _guard_namespace(value, f"{module.__name__}.{value.__name__}")
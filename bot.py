@@ -1,13 +1,46 @@
 import discord
 import asyncio
 from discord.ext import commands
+import math
 import os
 import sys
+import time
 from pathlib import Path
 
+import bestdori.bands
+import bestdori.cards
+import bestdori.characters
+import bestdori.gacha
+
+from asset_cache import AssetCache
+from bestdori_data import (
+    band_directory,
+    card_directory,
+    character_directory,
+    gacha_directory,
+    install_blocking_guard,
+)
+from cdn_cache import CdnUrlCache
+from command_sync import CommandTreeSync
+from http_client import create_session
+from image_render import ImageRenderer
+import lang_settings
+import localisation
+import metrics
+from pjsk_master import PjskMasterStore
+from response_cache import ResponseCache
+from search_index import SearchIndex
+import sharding
+from singleflight import SingleFlight
+from swr_cache import SwrCache
+from triggers import TriggerMatcher
+from warmup import WarmupPipeline
+
 # ── Bot configuration ───────────────────────────────────────────────────────────
 TOKEN = "<DISCORD_BOT_TOKEN>"
 VERSION = "CHU³-Beta-0.1.53"
+# Slash commands are also synced to these guilds, where changes show up without the global delay
+TEST_GUILD_IDS = (1256645661349249025,)
 # ────────────────────────────────────────────────────────────────────────────────
 
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
@@ -15,9 +48,79 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 intents = discord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix='^', intents=intents)
+# Plain Bot or AutoShardedBot, see BOT_SHARD_COUNT / BOT_SHARD_IDS in sharding.py
+bot_class, shard_options = sharding.bot_options()
+bot = bot_class(command_prefix='^', intents=intents, **shard_options)
 bot.version = VERSION
 
+# Raw (prefix-less) aliases, cogs may add their own with bot.raw_triggers.register()
+RAW_COMMANDS = {
+    "查卡": "card",
+    "角色": "character",
+    "活动": "event",
+    "卡池": "gacha",
+    "查谱": "song",
+    "帮助": "help",
+}
+bot.raw_triggers = TriggerMatcher(RAW_COMMANDS)
+bot.http_session = None  # created in main(), shared by every cog
+bot.pjsk_master = PjskMasterStore()
+bot.asset_cache = AssetCache()
+bot.cdn_urls = CdnUrlCache()
+bot.band_directory = band_directory()
+bot.character_directory = character_directory()
+bot.card_directory = card_directory()
+bot.gacha_directory = gacha_directory()
+bot.single_flight = SingleFlight()
+bot.response_cache = ResponseCache()
+# Data behind card/gacha/character replies, keyed (source, entity, id, lang)
+bot.game_data = SwrCache(bot.single_flight)
+bot.warmup = WarmupPipeline(bot)
+bot.renderer = ImageRenderer(bot.asset_cache, bot.cdn_urls, bot.single_flight)
+bot.shard_metrics = sharding.ShardMetrics(bot)
+bot.shared_state = sharding.SharedStateSync(bot)
+bot.command_sync = CommandTreeSync(bot, TEST_GUILD_IDS)
+# Name search over the directories and master tables above, for ^card <name> and slash autocomplete
+bot.search = SearchIndex(bot)
+
+# Rendered replies are keyed (command, source, id, lang) and their data (source, entity, id, lang),
+# drop both when the underlying data changes
+def _on_pjsk_update(repo: str):
+    bot.response_cache.invalidate(lambda key: key[1] == "pjsk" and bot.pjsk_master.repo_for(key[3]) == repo)
+    bot.game_data.invalidate(lambda key: key[0] == "pjsk" and bot.pjsk_master.repo_for(key[3]) == repo)
+
+
+def _on_bands_update():
+    bot.response_cache.invalidate(lambda key: key[:2] == ("character", "bestdori"))
+    bot.game_data.invalidate(lambda key: key[:2] == ("bestdori", "character"))
+
+
+bot.pjsk_master.add_listener(_on_pjsk_update)
+bot.band_directory.add_listener(_on_bands_update)
+localisation.add_reload_listener(bot.response_cache.clear)
+
+
+@bot.before_invoke
+async def _start_command_metrics(ctx: commands.Context):
+    metrics.command_started(ctx.command.qualified_name)
+
+
+@bot.after_invoke
+async def _finish_command_metrics(ctx: commands.Context):
+    metrics.command_finished(ctx.command_failed)
+
+
+def _gateway_latencies() -> dict:
+    # nan/inf until a shard has heartbeated once
+    return {
+        (("shard", str(shard_id)),): latency
+        for shard_id, latency in bot.shard_metrics.latencies().items()
+        if math.isfinite(latency)
+    }
+
+
+metrics.gauge("bot_gateway_latency_seconds", _gateway_latencies)
+
 bot.remove_command('help')
 # rm default help command
 
@@ -29,18 +132,28 @@ async def load_commands():
         print(f"[load_commands] No '{commands_dir}' directory found.")
         return
 
-    for file_path in commands_dir.rglob("*.py"):
-        if file_path.name == "__init__.py":
-            continue
-
-        rel_path = file_path.relative_to(base_dir)
-        module_path = ".".join(rel_path.with_suffix("").parts)
+    module_paths = [
+        ".".join(file_path.relative_to(base_dir).with_suffix("").parts)
+        for file_path in sorted(commands_dir.rglob("*.py"))
+        if file_path.name != "__init__.py"
+    ]
 
+    async def load(module_path: str):
+        # Everything the cogs import is already loaded by this file, so each extension only runs its own
+        # module and setup(). Setups that await (e.g. add_cog) interleave with each other.
+        started = time.perf_counter()
         try:
             await bot.load_extension(module_path)
-            print(f"[load_commands] Loaded: {module_path}")
         except Exception as e:
             print(f"[load_commands] Failed to load {module_path}: {e}")
+            return
+        elapsed = time.perf_counter() - started
+        metrics.observe("bot_extension_load_seconds", elapsed, extension=module_path)
+        print(f"[load_commands] Loaded: {module_path} ({elapsed * 1000:.0f} ms)")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(load(module_path) for module_path in module_paths))
+    print(f"[load_commands] {len(bot.extensions)} extensions in {(time.perf_counter() - started) * 1000:.0f} ms")
 
 
 @bot.event
@@ -53,15 +166,10 @@ async def on_ready():
     )
     await bot.change_presence(status=discord.Status.online, activity=activity)
 
-    try:
-        synced_global = await bot.tree.sync()
-        print(f"[on_ready] Global: Synced {len(synced_global)} slash commands.")
-
-        test_guild_id = 1256645661349249025
-        synced_guild = await bot.tree.sync(guild=discord.Object(id=test_guild_id))
-        print(f"[on_ready] Guild {test_guild_id}: Synced {len(synced_guild)} slash commands.")
-    except Exception as e:
-        print(f"[on_ready] Error syncing commands: {e}")
+    if sharding.is_primary(bot):
+        # Commands are global, the process running shard 0 syncs them for everyone.
+        # Runs once per process in the background, and only if the tree changed since the last sync.
+        bot.command_sync.start()
 
 
 @bot.event
@@ -69,33 +177,59 @@ async def on_message(message: discord.Message):
     if message.author.bot:
         return
 
-    content = message.content.strip()
-    raw_commands = {
-        "查卡": "card",
-        "角色": "character",
-        "活动": "event",
-        "卡池": "gacha",
-        "查谱": "song",
-        "帮助": "help",
-    }
-
-    for zh_trigger, eng_command in raw_commands.items():
-        if content == zh_trigger or content.startswith(f"{zh_trigger} "):
-            args = content[len(zh_trigger):].strip()
-            new_content = f"^{eng_command}"
-            if args:
-                new_content += f" {args}"
-
-            message.content = new_content
-            await bot.process_commands(message)
-            return
+    rewritten = bot.raw_triggers.rewrite(message.content.strip(), bot.command_prefix)
+    if rewritten is not None:
+        message.content = rewritten
+    elif not message.content.startswith(bot.command_prefix):
+        # Neither a raw alias nor a prefixed command, skip building a Context for it
+        return
 
     await bot.process_commands(message)
 
 async def main():
     async with bot:
-        await load_commands()
-        await bot.start(TOKEN)
+        install_blocking_guard(
+            asyncio.get_running_loop(),
+            [bestdori.bands, bestdori.cards, bestdori.characters, bestdori.gacha],
+        )
+        bot.http_session = create_session()
+        bot.pjsk_master.start(bot.http_session)
+        await bot.asset_cache.start(bot.http_session)
+        await bot.cdn_urls.start(bot.http_session)
+        await lang_settings.start()
+        bot.band_directory.start()
+        bot.character_directory.start()
+        bot.card_directory.start()
+        bot.gacha_directory.start()
+        localisation.start_watcher()
+        # Runs in the background, the bot logs in while caches fill
+        bot.warmup.start()
+        bot.search.start()
+        bot.shard_metrics.start()
+        # One port per process when shards are split over several of them
+        await metrics.start(metrics.METRICS_PORT and metrics.METRICS_PORT + min(sharding.local_shards(bot)))
+        bot.shared_state.start()
+        try:
+            await load_commands()
+            await bot.start(TOKEN)
+        finally:
+            await bot.command_sync.close()
+            await bot.shared_state.close()
+            await bot.shard_metrics.close()
+            await metrics.stop()
+            await bot.warmup.close()
+            await bot.search.close()
+            await bot.renderer.close()
+            await bot.game_data.close()
+            await bot.pjsk_master.close()
+            await bot.band_directory.close()
+            await bot.character_directory.close()
+            await bot.card_directory.close()
+            await bot.gacha_directory.close()
+            await localisation.stop_watcher()
+            await lang_settings.close()
+            await bot.cdn_urls.close()
+            await bot.http_session.close()
     
 
 if __name__ == "__main__":
@@ -0,0 +1,288 @@
+import asyncio
+import json
+import os
+import secrets
+import time
+from pathlib import Path
+from typing import NamedTuple
+from urllib.parse import parse_qs, urlparse
+
+import aiohttp
+import discord
+from discord.ext import commands
+
+import metrics
+from upstream import is_transient
+
+# ── Discord CDN url cache configuration ────────────────────────────────────────
+CDN_FILE = Path(__file__).parent / "cache" / "cdn_urls.json"
+# Signed attachment urls carry an `ex=<hex unix time>` expiry, stop using them a bit early
+EXPIRY_MARGIN = 60 * 60
+# Fallback lifetime for urls without an expiry parameter
+MAX_AGE = 24 * 60 * 60
+SAVE_DELAY = 5
+# A url not checked for this long is HEAD-requested before reuse, the message holding
+# the attachment may have been deleted or edited since
+VERIFY_AFTER = 10 * 60
+# Kept short, a url that cannot be checked in time is used as is
+VERIFY_TIMEOUT = 3
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+class Asset(NamedTuple):
+    source: str
+    path: str
+    filename: str
+    slot: str = "image"      # "image" or "thumbnail"
+    embed: int = 0           # index into the embeds of the reply
+    url: str | None = None   # upstream url, lets a cached reply re-fetch an evicted file
+
+
+def _expires_at(url: str, saved_at: float) -> float:
+    query = parse_qs(urlparse(url).query)
+    expiry = query.get("ex")
+    if expiry:
+        try:
+            return int(expiry[0], 16)
+        except ValueError:
+            pass
+    return saved_at + MAX_AGE
+
+
+class CdnUrlCache:
+    def __init__(self, path: Path = CDN_FILE):
+        self.path = Path(path)
+        # "source:path" -> {"url": ..., "expires": ..., "checked": ...}
+        self._urls: dict[str, dict] = {}
+        # Dropped since the last save, must not come back from another process's copy
+        self._forgotten: set[str] = set()
+        self._save_task: asyncio.Task | None = None
+        self._session: aiohttp.ClientSession | None = None
+        # key -> HEAD request in flight, concurrent lookups of one url share it
+        self._checks: dict[str, asyncio.Task] = {}
+
+    async def start(self, session: aiohttp.ClientSession | None = None):
+        # Without a session urls are reused unchecked until they expire
+        self._session = session
+        self._urls = await asyncio.to_thread(self._load)
+
+    async def reload(self):
+        # Adopts urls other processes (e.g. other shards) uploaded and saved to the same file
+        self._merge(await asyncio.to_thread(self._load))
+
+    def _load(self) -> dict:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"[cdn_cache] Ignoring unreadable {self.path.name}: {e}")
+            return {}
+
+    async def get(self, source: str, path: str) -> str | None:
+        key = f"{source}:{path}"
+        entry = self._urls.get(key)
+        if entry is None:
+            metrics.cache_event("cdn_url", "miss")
+            return None
+        if entry["expires"] - EXPIRY_MARGIN <= time.time():
+            # Stale, the next reply re-uploads and records a fresh url
+            del self._urls[key]
+            self._schedule_save()
+            metrics.cache_event("cdn_url", "evict")
+            metrics.cache_event("cdn_url", "miss")
+            return None
+        # Files from older versions have no "checked", those urls are checked on first use
+        if time.time() - entry.get("checked", 0) >= VERIFY_AFTER and not await self._verify(key, entry):
+            metrics.cache_event("cdn_url", "miss")
+            return None
+        metrics.cache_event("cdn_url", "hit")
+        return entry["url"]
+
+    def remember(self, source: str, path: str, url: str):
+        now = time.time()
+        self._urls[f"{source}:{path}"] = {"url": url, "expires": _expires_at(url, now), "checked": now}
+        self._schedule_save()
+
+    async def _verify(self, key: str, entry: dict) -> bool:
+        if self._session is None:
+            return True
+        check = self._checks.get(key)
+        if check is None:
+            check = self._checks[key] = asyncio.ensure_future(self._exists(entry["url"]))
+            check.add_done_callback(lambda _: self._checks.pop(key, None))
+        exists = await asyncio.shield(check)
+        if exists is not False:
+            # None means it could not be told, not worth holding up every reply to find out
+            entry["checked"] = time.time()
+            return True
+        print(f"[cdn_cache] Attachment for {key} is gone, re-uploading")
+        if self._urls.get(key) is entry:
+            self.forget(*key.split(":", 1))
+            metrics.cache_event("cdn_url", "evict")
+        return False
+
+    async def _exists(self, url: str) -> bool | None:
+        try:
+            async with self._session.head(url, timeout=aiohttp.ClientTimeout(total=VERIFY_TIMEOUT)) as resp:
+                if resp.status in (403, 404, 410):
+                    return False
+                return True if resp.status == 200 else None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"[cdn_cache] Could not check {url}: {type(e).__name__} {e}")
+            return None
+
+    def forget(self, source: str, path: str):
+        key = f"{source}:{path}"
+        self._forgotten.add(key)
+        if self._urls.pop(key, None) is not None:
+            self._schedule_save()
+
+    def forget_attachments(self, attachments: list[discord.Attachment]):
+        # For attachments Discord is about to delete, e.g. replaced by an edit. Compared without the
+        # query, the signature part changes whenever Discord hands out the url again.
+        gone = {urlparse(attachment.url).path for attachment in attachments}
+        if not gone:
+            return
+        for key, entry in list(self._urls.items()):
+            if urlparse(entry["url"]).path in gone:
+                self.forget(*key.split(":", 1))
+
+    def _merge(self, urls: dict):
+        now = time.time()
+        for key, entry in urls.items():
+            if key in self._forgotten or entry["expires"] - EXPIRY_MARGIN <= now:
+                continue
+            current = self._urls.get(key)
+            if current is None or current["expires"] < entry["expires"]:
+                self._urls[key] = entry
+
+    def _schedule_save(self):
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.create_task(self._save_later())
+
+    async def _save_later(self):
+        await asyncio.sleep(SAVE_DELAY)
+        await self.flush()
+
+    async def flush(self):
+        # Merged with the file first, other processes may have saved their own urls to it
+        self._merge(await asyncio.to_thread(self._load))
+        snapshot = dict(self._urls)
+        self._forgotten.clear()
+        await asyncio.to_thread(self._write, snapshot)
+
+    def _write(self, urls: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{secrets.token_hex(4)}.tmp")
+        with open(tmp_path, "w", encoding="utf8") as f:
+            json.dump(urls, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    async def close(self):
+        if self._save_task is not None and not self._save_task.done():
+            self._save_task.cancel()
+        await self.flush()
+
+
+async def _attach(bot: commands.Bot, embeds: list[discord.Embed], assets: list[Asset]) -> tuple[list[discord.File], dict[str, Asset]]:
+    cdn: CdnUrlCache = bot.cdn_urls
+
+    files = []
+    uploaded = {}
+    for asset in assets:
+        url = await cdn.get(asset.source, asset.path)
+        if url is None:
+            if asset.url is not None:
+                try:
+                    file_path = await bot.asset_cache.fetch_url(asset.source, asset.path, asset.url)
+                except Exception as e:
+                    if not is_transient(e):
+                        raise
+                    # Evicted and the source is failing right now, the reply goes out without this image
+                    print(f"[cdn_cache] Sending {asset.path} without its image: {type(e).__name__} {e}")
+                    continue
+            else:
+                file_path = await bot.asset_cache.get(asset.source, asset.path)
+            if file_path is None:
+                continue
+            try:
+                # discord.File streams from the open handle, the image is never read into memory here
+                files.append(discord.File(str(file_path), filename=asset.filename))
+            except FileNotFoundError:
+                # Evicted between lookup and open
+                continue
+            uploaded[asset.filename] = asset
+            url = f"attachment://{asset.filename}"
+
+        embed = embeds[asset.embed]
+        if asset.slot == "thumbnail":
+            embed.set_thumbnail(url=url)
+        else:
+            embed.set_image(url=url)
+    return files, uploaded
+
+
+def _remember(bot: commands.Bot, message: discord.Message, uploaded: dict[str, Asset]):
+    for attachment in message.attachments:
+        asset = uploaded.get(attachment.filename)
+        if asset is not None:
+            bot.cdn_urls.remember(asset.source, asset.path, attachment.url)
+
+
+async def reply_with_assets(
+    ctx: commands.Context, embeds: list[discord.Embed], assets: list[Asset], remember: bool = True, **kwargs
+) -> discord.Message:
+    # remember=False for replies that will be edited later, an edit deletes their attachments
+    files, uploaded = await _attach(ctx.bot, embeds, assets)
+    try:
+        with metrics.phase("upload"):
+            message = await ctx.reply(embeds=embeds, files=files, **kwargs)
+    finally:
+        for file in files:
+            file.close()
+
+    if remember:
+        _remember(ctx.bot, message, uploaded)
+    return message
+
+
+async def edit_with_assets(
+    bot: commands.Bot, message: discord.Message, embeds: list[discord.Embed], assets: list[Asset], **kwargs
+) -> discord.Message:
+    # Same as reply_with_assets(), for replacing what an existing reply shows (e.g. turning a page).
+    # The edit deletes the message's current attachments, and the next edit would delete the new ones,
+    # so urls are only ever forgotten here, never remembered.
+    bot.cdn_urls.forget_attachments(message.attachments)
+    files, _ = await _attach(bot, embeds, assets)
+    try:
+        message = await message.edit(embeds=embeds, attachments=files, **kwargs)
+    finally:
+        for file in files:
+            file.close()
+    return message
+
+
+async def resolve_asset(
+    bot: commands.Bot,
+    source: str,
+    path: str,
+    filename: str,
+    loader=None,
+    url: str | None = None,
+    slot: str = "image",
+    embed: int = 0,
+) -> Asset | None:
+    # Already on Discord's CDN, no need to even download it
+    if await bot.cdn_urls.get(source, path) is not None:
+        return Asset(source, path, filename, slot, embed, url)
+
+    # Makes sure the file is in the asset cache, reply_with_assets() uploads straight from disk
+    if url is not None:
+        file_path = await bot.asset_cache.fetch_url(source, path, url)
+    else:
+        file_path = await bot.asset_cache.fetch(source, path, loader)
+    if file_path is None:
+        return None
+    return Asset(source, path, filename, slot, embed, url)
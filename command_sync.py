@@ -0,0 +1,84 @@
+import asyncio
+import hashlib
+import json
+import os
+import secrets
+from pathlib import Path
+
+import discord
+from discord.ext import commands
+
+# ── Slash command sync configuration ────────────────────────────────────────────
+# Hash of the command tree last pushed to Discord, per application and scope
+SYNC_STATE_PATH = Path(__file__).parent / "cache" / "command_sync.json"
+# BOT_FORCE_SYNC=1 pushes the tree even if its hash did not change,
+# e.g. after commands were edited from another checkout of the same application
+FORCE_SYNC = os.environ.get("BOT_FORCE_SYNC", "0") == "1"
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+def tree_hash(tree: discord.app_commands.CommandTree, guild: discord.abc.Snowflake | None = None) -> str:
+    # The payload tree.sync() would send, sorted so cog load order does not matter
+    payload = sorted(
+        (command.to_dict(tree) for command in tree.get_commands(guild=guild)),
+        key=lambda command: (command.get("type", 1), command["name"]),
+    )
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf8")).hexdigest()
+
+
+class CommandTreeSync:
+    # Pushes slash commands once per process, and only the scopes whose tree changed since the last push
+    def __init__(self, bot: commands.Bot, guild_ids: tuple[int, ...] = (), path: Path = SYNC_STATE_PATH, force: bool = FORCE_SYNC):
+        self.bot = bot
+        self.guild_ids = guild_ids
+        self.path = Path(path)
+        self.force = force
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        # on_ready fires again after every reconnect, the first call is the only one that syncs
+        if self._task is None:
+            self._task = asyncio.create_task(self._sync_all())
+
+    async def close(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def _load_state(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{secrets.token_hex(4)}.tmp")
+        with open(tmp_path, "w", encoding="utf8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    async def _sync_all(self):
+        state = await asyncio.to_thread(self._load_state)
+        # A different bot token is a different set of registered commands
+        synced = state.setdefault(str(self.bot.application_id), {})
+
+        for guild_id in (None, *self.guild_ids):
+            scope = "global" if guild_id is None else f"guild:{guild_id}"
+            guild = None if guild_id is None else discord.Object(id=guild_id)
+            digest = tree_hash(self.bot.tree, guild)
+            if not self.force and synced.get(scope) == digest:
+                print(f"[command_sync] {scope}: unchanged, skipped sync.")
+                continue
+            try:
+                commands_synced = await self.bot.tree.sync(guild=guild)
+            except Exception as e:
+                print(f"[command_sync] {scope}: Error syncing commands: {e}")
+                continue
+            synced[scope] = digest
+            print(f"[command_sync] {scope}: Synced {len(commands_synced)} slash commands.")
+            await asyncio.to_thread(self._save_state, state)
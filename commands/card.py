@@ -9,19 +9,32 @@
 #     typing.Self = Self
 # ─────────────────────────────────────────────────────────────────────────────
 
-import io
+import asyncio
+import functools
 import json
 import re
-import aiohttp
+
 import discord
+from discord import app_commands
 from discord.ext import commands
 
 import bestdori.cards
 import bestdori.characters
 import bestdori.exceptions
 
-from lang_settings import language_settings
+from batch_lookup import BatchEntry, lookup_batch, parse_ids
+from bestdori_data import (
+    ASSET_MISSING, call_bestdori, card_art_path as bestdori_art_path, card_thumb_loader as bestdori_thumb_loader,
+    card_thumb_path as bestdori_thumb_path,
+)
+from cdn_cache import reply_with_assets, resolve_asset
+from lang_settings import resolve_language
 from localisation import get_text
+from pjsk_master import ASSET_BASE, can_train, card_art_path, card_thumb_path
+from response_cache import reply_from_cache
+from search_index import autocomplete_choices, resolve_query
+from swr_cache import complete
+from upstream import UpstreamUnavailable, is_transient, with_deadline
 
 _lang_to_index = {
     "JPN": 0,
@@ -31,68 +44,167 @@ _lang_to_index = {
     "KOR": 4
 }
 
-_repo_map = {
-    "ENG": "sekai-master-db-en-diff",
-    "JPN": "sekai-master-db-diff",
-    "CHS": "sekai-master-db-cn-diff",
-    "CHT": "sekai-master-db-tc-diff",
-    "KOR": "sekai-master-db-kr-diff",
-}
-
 class CardCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
     # PJSK section, fetched from sekai viewer's github
     async def _get_pjsk_card(self, card_id: int, lang: str) -> dict:
-        repo = _repo_map.get(lang, "sekai-master-db-en-diff")
-        base = f"https://raw.githubusercontent.com/Sekai-World/{repo}/main"
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{base}/cards.json") as resp:
-                cards = await resp.json(content_type=None)
-            async with session.get(f"{base}/gameCharacters.json") as resp:
-                chars = await resp.json(content_type=None)
-
-            card = next((c for c in cards if c.get("id") == card_id), None)
-            if not card:
-                raise ValueError("Card not found")
-
-            char = next((c for c in chars if c.get("id") == card.get("characterId")), None)
-            if char:
-                char_name = f"{char.get('firstName', '')} {char.get('givenName', '')}".strip()
-            else:
-                char_name = "N/A"
+        snapshot = await self.bot.pjsk_master.get_snapshot(lang)
+        index = snapshot.index
 
-            base_img = (
-                f"https://storage.sekai.best/sekai-jp-assets/character/member/{card['assetbundleName']}"
-            )
-            normal_url = f"{base_img}/card_normal.png"
-            after_url = f"{base_img}/card_after_training.png"
+        card = index.card(card_id)
+        if not card:
+            raise ValueError("Card not found")
 
-            async with session.get(normal_url) as img_resp:
-                normal_bytes = await img_resp.read() if img_resp.status == 200 else None
+        char_name = index.character_name(card.get("characterId"))
 
-            after_bytes = None
-            if card.get("cardRarityType") not in ("rarity_1", "rarity_2"):
-                async with session.get(after_url) as img_resp:
-                    if img_resp.status == 200:
-                        after_bytes = await img_resp.read()
+        normal_path = card_art_path(card, "normal")
+        after_path = card_art_path(card, "after_training")
+
+        fetches = [
+            resolve_asset(
+                self.bot, "sekai", normal_path, f"pjsk_{card_id}_normal.png", url=f"{ASSET_BASE}/{normal_path}"
+            )
+        ]
+        if can_train(card):
+            fetches.append(resolve_asset(
+                self.bot, "sekai", after_path, f"pjsk_{card_id}_after.png", url=f"{ASSET_BASE}/{after_path}", embed=1
+            ))
+
+        partial = False
+        assets = []
+        for result in await asyncio.gather(*fetches, return_exceptions=True):
+            if isinstance(result, BaseException):
+                if not is_transient(result):
+                    raise result
+                # Shown without this image, and not cached, so the next lookup tries again
+                partial = True
+                result = None
+            assets.append(result)
+        normal, after = (assets + [None])[:2]
 
         return {
             "title": card.get("prefix", "N/A"),
             "character": char_name,
-            "normal": normal_bytes,
-            "after": after_bytes,
+            "normal": normal,
+            "after": after,
+            "partial": partial,
         }
-    
 
-    @commands.command(name='card', aliases=['check_card', 'card_check'])
-    async def card(self, ctx: commands.Context, card_id: str = None):
-        if ctx.guild:
-            lang = language_settings["guild"].get(str(ctx.guild.id), "ENG")
-        else:
-            lang = language_settings["user"].get(str(ctx.author.id), "ENG")
+    async def _get_bestdori_card(self, card_id: int) -> dict:
+        card = bestdori.cards.Card(card_id)
+        info_task = asyncio.ensure_future(call_bestdori(card.get_info_async))
+
+        # Art and character both hang off the card info, but cached art does not need it at all
+        async def get_art(variant: str) -> bytes:
+            await info_task
+            return await call_bestdori(card.get_card_async, variant)
+
+        async def get_char_info() -> dict:
+            card_info = await info_task
+            character = bestdori.characters.Character(card_info['characterId'])
+            return await call_bestdori(character.get_info_async)
+
+        card_info, char_info, card_image_normal, card_image_after = await asyncio.gather(
+            info_task,
+            get_char_info(),
+            resolve_asset(
+                self.bot, "bestdori", bestdori_art_path(card_id, "normal"), f"card_{card_id}_normal.png",
+                lambda: get_art('normal'),
+            ),
+            resolve_asset(
+                self.bot, "bestdori", bestdori_art_path(card_id, "after_training"), f"card_{card_id}_after.png",
+                lambda: get_art('after_training'), embed=1,
+            ),
+            return_exceptions=True,
+        )
+        if isinstance(card_info, BaseException):
+            raise card_info
+        if isinstance(char_info, BaseException):
+            raise char_info
+
+        for art in (card_image_normal, card_image_after):
+            if isinstance(art, BaseException) and is_transient(art):
+                # Says nothing about the card, a stale reply or UNAVAILABLE beats one with art missing
+                raise art
+
+        # Only art that does not exist is an answer worth caching, anything else leaves the reply partial
+        partial = False
+        if isinstance(card_image_normal, BaseException):
+            partial = not isinstance(card_image_normal, ASSET_MISSING)
+            card_image_normal = None
+        can_train = True
+        if isinstance(card_image_after, BaseException):
+            if isinstance(card_image_after, ASSET_MISSING):
+                can_train = False
+            else:
+                partial = True
+            card_image_after = None
+
+        return {
+            "info": card_info,
+            "char_info": char_info,
+            "normal": card_image_normal,
+            "after": card_image_after,
+            "can_train": can_train,
+            "partial": partial,
+        }
+
+    def _batch_embed(self, lang: str, card_id, title: str, character: str) -> discord.Embed:
+        embed = discord.Embed(title=get_text(lang, "card", "EMBED_TITLE", CARD_ID=card_id), color=0x00ff00)
+        embed.add_field(name=get_text(lang, "card", "FIELD_TITLE"), value=title, inline=False)
+        embed.add_field(name=get_text(lang, "card", "FIELD_CHARACTER"), value=character, inline=False)
+        return embed
+
+    async def _card_batch(self, card_ids: list[str], lang: str) -> list[BatchEntry | None]:
+        # Text comes from the card/character directories and master tables already in memory,
+        # only the thumbnails of the page on screen are fetched
+        idx = _lang_to_index.get(lang, 3)
+        found = {}
+
+        pjsk_ids = [int(card_id[4:]) for card_id in card_ids if card_id.startswith("pjsk")]
+        if pjsk_ids:
+            index = (await self.bot.pjsk_master.get_snapshot(lang)).index
+            for card_id, card in zip(pjsk_ids, index.cards(pjsk_ids)):
+                if not card:
+                    continue
+                path = card_thumb_path(card, "normal")
+                thumb = functools.partial(
+                    resolve_asset, self.bot, "sekai", path, f"pjsk_{card_id}_thumb.png",
+                    url=f"{ASSET_BASE}/{path}", slot="thumbnail",
+                )
+                embed = self._batch_embed(
+                    lang, card_id, card.get("prefix", "N/A"), index.character_name(card.get("characterId"))
+                )
+                found[f"pjsk{card_id}"] = BatchEntry(embed, thumb)
+
+        bestdori_ids = [int(card_id) for card_id in card_ids if card_id.isdigit()]
+        if bestdori_ids:
+            cards, characters = await asyncio.gather(self.bot.card_directory.get(), self.bot.character_directory.get())
+            for card_id in bestdori_ids:
+                card_info = cards.get(str(card_id))
+                if not card_info:
+                    continue
+                prefix = card_info.get('prefix', [])
+                char_names = characters.get(str(card_info.get('characterId')), {}).get('characterName', [])
+                thumb = functools.partial(
+                    resolve_asset, self.bot, "bestdori", bestdori_thumb_path(card_id, "normal"),
+                    f"card_{card_id}_thumb.png", bestdori_thumb_loader(card_id, "normal"), slot="thumbnail",
+                )
+                embed = self._batch_embed(
+                    lang, card_id,
+                    prefix[idx] if len(prefix) > idx and prefix[idx] else "N/A",
+                    char_names[idx] if len(char_names) > idx and char_names[idx] else "N/A",
+                )
+                found[str(card_id)] = BatchEntry(embed, thumb)
+
+        return [found.get(card_id) for card_id in card_ids]
+
+    @commands.hybrid_command(name='card', aliases=['check_card', 'card_check'], description="Show a card by ID or name")
+    @app_commands.describe(card_id="Card ID (pjsk<ID> for Project Sekai), IDs like 1-10,15, or part of its title / character")
+    async def card(self, ctx: commands.Context, *, card_id: str = None):
+        lang = resolve_language(ctx.guild.id if ctx.guild else None, ctx.author.id)
 
         idx = _lang_to_index.get(lang, 3)  # default to english / index=3
 
@@ -101,12 +213,30 @@ class CardCog(commands.Cog):
             await ctx.reply(msg)
             return
 
+        batch_ids = parse_ids(card_id)
+        if batch_ids is not None:
+            await lookup_batch(ctx, lang, "card", batch_ids, lambda ids: self._card_batch(ids, lang))
+            return
+
+        card_id = await resolve_query(ctx, lang, "card", card_id)
+        if card_id is None:
+            return
+        # Slash invocations have 3 seconds to answer, prefix ones ignore this
+        await ctx.defer()
+
+        cache_key = None
         try:
             if isinstance(card_id, str) and card_id.lower().startswith("pjsk"):
                 pjsk_id = card_id[4:]
                 if not pjsk_id.isdigit():
                     raise ValueError("Invalid pjsk card id")
-                card_data = await self._get_pjsk_card(int(pjsk_id), lang)
+                cache_key = ("card", "pjsk", int(pjsk_id), lang)
+                if await reply_from_cache(ctx, cache_key):
+                    return
+                card_data = await with_deadline(self.bot.game_data.get(
+                    ("pjsk", "card", int(pjsk_id), lang), lambda: self._get_pjsk_card(int(pjsk_id), lang),
+                    keep=complete,
+                ))
 
                 title_text = get_text(lang, "card", "EMBED_TITLE", CARD_ID=pjsk_id)
                 embed = discord.Embed(title=title_text, color=0x00ff00)
@@ -121,47 +251,29 @@ class CardCog(commands.Cog):
                     inline=False,
                 )
 
-                files = []
-                if card_data.get("normal"):
-                    files.append(
-                        discord.File(
-                            io.BytesIO(card_data["normal"]),
-                            filename=f"pjsk_{pjsk_id}_normal.png",
-                        )
-                    )
-                if card_data.get("after"):
-                    files.append(
-                        discord.File(
-                            io.BytesIO(card_data["after"]),
-                            filename=f"pjsk_{pjsk_id}_after.png",
-                        )
-                    )
-
-                await ctx.reply(embed=embed, files=files)
+                assets = [a for a in (card_data.get("normal"), card_data.get("after")) if a]
+                assets = await self.bot.renderer.card_assets("sekai", int(pjsk_id), assets)
+                # One embed per image, a side-by-side composite needs just the first
+                embeds = [embed] + [discord.Embed(color=0x00ff00) for _ in range(max((a.embed for a in assets), default=0))]
+
+                if complete(card_data):
+                    self.bot.response_cache.put(cache_key, embeds, assets)
+                await reply_with_assets(ctx, embeds, assets)
                 return
             
  
-            card = bestdori.cards.Card(int(card_id))
-            card = bestdori.cards.Card(card_id)
-            card_info = await card.get_info_async()
-
-            character = bestdori.characters.Character(card_info['characterId'])
-            char_info = await character.get_info_async()
-
-            card_image_normal = None
-            card_image_after = None
-            can_train = True
-            try:
-                card_image_normal = await card.get_card_async('normal')
-
-            except Exception:
-                card_image_normal = None
-            try:
-                card_image_after = await card.get_card_async('after_training')
-        
-            except Exception:
-                card_image_after = None
-                can_train = False
+            cache_key = ("card", "bestdori", int(card_id), lang)
+            if await reply_from_cache(ctx, cache_key):
+                return
+            card_data = await with_deadline(self.bot.game_data.get(
+                ("bestdori", "card", int(card_id), lang), lambda: self._get_bestdori_card(int(card_id)),
+                keep=complete,
+            ))
+            card_info = card_data["info"]
+            char_info = card_data["char_info"]
+            card_image_normal = card_data["normal"]
+            card_image_after = card_data["after"]
+            can_train = card_data["can_train"]
 
             title_text = get_text(lang, "card", "EMBED_TITLE", CARD_ID=int(card_id))
             embed = discord.Embed(title=title_text, color=0x00ff00)
@@ -201,23 +313,29 @@ class CardCog(commands.Cog):
                     inline=False
                 )
 
-            files = []
-            if card_image_normal:
-                files.append(discord.File(io.BytesIO(card_image_normal),
-                                          filename=f"card_{card_id}_normal.png"))
-            if card_image_after:
-                files.append(discord.File(io.BytesIO(card_image_after),
-                                          filename=f"card_{card_id}_after.png"))
+            assets = [a for a in (card_image_normal, card_image_after) if a]
+            assets = await self.bot.renderer.card_assets("bestdori", int(card_id), assets)
+            embeds = [embed] + [discord.Embed(color=0x00ff00) for _ in range(max((a.embed for a in assets), default=0))]
 
-            await ctx.reply(embed=embed, files=files)
+            if complete(card_data):
+                self.bot.response_cache.put(cache_key, embeds, assets)
+            await reply_with_assets(ctx, embeds, assets)
 
         except bestdori.exceptions.NotExistException:
             msg = get_text(lang, "card", "NOT_FOUND", CARD_ID=card_id)
             await ctx.reply(msg)
+        except (UpstreamUnavailable, asyncio.TimeoutError):
+            # Source down or out of time, an expired copy of the reply beats an error
+            if cache_key is None or not await reply_from_cache(ctx, cache_key, stale=True):
+                await ctx.reply(get_text(lang, "card", "UNAVAILABLE"))
         except Exception as e:
             msg = get_text(lang, "card", "ERROR", ERROR=e)
             await ctx.reply(msg)
 
+    @card.autocomplete("card_id")
+    async def _card_id_autocomplete(self, interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+        return autocomplete_choices(self.bot, interaction, "card", current)
+
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(CardCog(bot))
@@ -9,17 +9,25 @@
 #     typing.Self = Self
 # ─────────────────────────────────────────────────────────────────────────────
 
-import io
-import aiohttp
+import asyncio
+import functools
+
 import discord
+from discord import app_commands
 from discord.ext import commands
 
 import bestdori.characters
-import bestdori.bands
 import bestdori.exceptions
 
-from lang_settings import language_settings
+from batch_lookup import BatchEntry, lookup_batch, parse_ids
+from bestdori_data import ASSET_MISSING, call_bestdori, icon_path
+from cdn_cache import reply_with_assets, resolve_asset
+from lang_settings import resolve_language
 from localisation import get_text
+from pjsk_master import ASSET_BASE
+from response_cache import reply_from_cache
+from search_index import autocomplete_choices, resolve_query
+from upstream import UpstreamUnavailable, with_deadline
 
 _lang_to_index = {
     "JPN": 0,
@@ -29,49 +37,106 @@ _lang_to_index = {
     "KOR": 4
 }
 
-_repo_map = {
-    "ENG": "sekai-master-db-en-diff",
-    "JPN": "sekai-master-db-diff",
-    "CHS": "sekai-master-db-cn-diff",
-    "CHT": "sekai-master-db-tc-diff",
-    "KOR": "sekai-master-db-kr-diff",
-}
-
 class CharacterCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
     async def _get_pjsk_character(self, char_id: int, lang: str) -> dict:
     # PJSK section, fetched from sekai viewer's github
-        repo = _repo_map.get(lang, "sekai-master-db-en-diff")
-        base = f"https://raw.githubusercontent.com/Sekai-World/{repo}/main"
+        snapshot = await self.bot.pjsk_master.get_snapshot(lang)
+        index = snapshot.index
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{base}/gameCharacters.json") as resp:
-                chars = await resp.json(content_type=None)
-            async with session.get(f"{base}/unitProfiles.json") as resp:
-                units = await resp.json(content_type=None)
-
-        char = next((c for c in chars if c.get("id") == char_id), None)
+        char = index.character(char_id)
         if not char:
             raise ValueError("Character not found")
 
-        unit_name = next((u["unitName"] for u in units if u.get("unit") == char.get("unit")), "N/A")
+        unit = index.unit_profile(char.get("unit"))
+        unit_name = unit.get("unitName", "N/A") if unit else "N/A"
 
         name = f"{char.get('firstName', '')} {char.get('givenName', '')}".strip()
         image_url = (
-            f"https://storage.sekai.best/sekai-jp-assets/character/character_trim/chr_trim_{char['resourceId']}.png"
+            f"{ASSET_BASE}/character/character_trim/chr_trim_{char['resourceId']}.png"
         )
 
         return {"name": name, "band": unit_name, "image": image_url}
 
-    @commands.command(name='character', aliases=['char'])
-    async def character(self, ctx: commands.Context, char_id: str = None):
+    async def _get_bestdori_character(self, char_id: int) -> dict:
+        character = bestdori.characters.Character(char_id)
+        # Band directory and icon only need the id, so they load alongside the character info
+        char_info, bands_info, icon = await asyncio.gather(
+            call_bestdori(character.get_info_async),
+            self.bot.band_directory.get(),
+            resolve_asset(
+                self.bot, "bestdori", icon_path(char_id), f"char_{char_id}.png",
+                lambda: call_bestdori(character.get_icon_async), slot="thumbnail",
+            ),
+            return_exceptions=True,
+        )
+        if isinstance(char_info, BaseException):
+            raise char_info
+        if isinstance(bands_info, BaseException):
+            raise bands_info
+        if isinstance(icon, ASSET_MISSING):
+            icon = None
+        elif isinstance(icon, BaseException):
+            raise icon
+
+        return {"info": char_info, "bands": bands_info, "icon": icon}
+
+    def _batch_embed(self, lang: str, char_id, name: str, band: str) -> discord.Embed:
+        embed = discord.Embed(
+            title=get_text(lang, "character", "EMBED_TITLE", CHAR_ID=char_id, NAME=name), color=0x00AAFF
+        )
+        embed.add_field(name=get_text(lang, "character", "FIELD_BAND"), value=band, inline=False)
+        return embed
+
+    async def _character_batch(self, char_ids: list[str], lang: str) -> list[BatchEntry | None]:
+        # Text comes from the character/band directories and master tables already in memory,
+        # only the icons of the page on screen are fetched
+        idx = _lang_to_index.get(lang, 3)
+        found = {}
+
+        pjsk_ids = [int(char_id[4:]) for char_id in char_ids if char_id.startswith("pjsk")]
+        if pjsk_ids:
+            index = (await self.bot.pjsk_master.get_snapshot(lang)).index
+            for char_id, char in zip(pjsk_ids, index.characters(pjsk_ids)):
+                if not char:
+                    continue
+                unit = index.unit_profile(char.get("unit"))
+                embed = self._batch_embed(
+                    lang, char_id, index.character_name(char_id), unit.get("unitName", "N/A") if unit else "N/A"
+                )
+                embed.set_thumbnail(url=f"{ASSET_BASE}/character/character_trim/chr_trim_{char['resourceId']}.png")
+                found[f"pjsk{char_id}"] = BatchEntry(embed)
+
+        bestdori_ids = [int(char_id) for char_id in char_ids if char_id.isdigit()]
+        if bestdori_ids:
+            characters, bands = await asyncio.gather(self.bot.character_directory.get(), self.bot.band_directory.get())
+            for char_id in bestdori_ids:
+                char_info = characters.get(str(char_id))
+                if not char_info:
+                    continue
+                char_names = char_info.get('characterName', [])
+                band_names = bands.get(str(char_info.get('bandId')), {}).get('bandName', [])
+                icon = functools.partial(
+                    resolve_asset, self.bot, "bestdori", icon_path(char_id), f"char_{char_id}.png",
+                    lambda char_id=char_id: call_bestdori(bestdori.characters.Character(char_id).get_icon_async),
+                    slot="thumbnail",
+                )
+                embed = self._batch_embed(
+                    lang, char_id,
+                    char_names[idx] if len(char_names) > idx and char_names[idx] else next((n for n in char_names if n), "N/A"),
+                    band_names[idx] if len(band_names) > idx and band_names[idx] else next((n for n in band_names if n), "Unknown"),
+                )
+                found[str(char_id)] = BatchEntry(embed, icon)
+
+        return [found.get(char_id) for char_id in char_ids]
 
-        if ctx.guild:
-            lang = language_settings["guild"].get(str(ctx.guild.id), "ENG")
-        else:
-            lang = language_settings["user"].get(str(ctx.author.id), "ENG")
+    @commands.hybrid_command(name='character', aliases=['char'], description="Show a character by ID or name")
+    @app_commands.describe(char_id="Character ID (pjsk<ID> for Project Sekai), IDs like 1-10,15, or part of their name")
+    async def character(self, ctx: commands.Context, *, char_id: str = None):
+
+        lang = resolve_language(ctx.guild.id if ctx.guild else None, ctx.author.id)
 
         idx = _lang_to_index.get(lang, 3)  # default to eng
 
@@ -80,12 +145,29 @@ class CharacterCog(commands.Cog):
             await ctx.reply(msg)
             return
 
+        batch_ids = parse_ids(char_id)
+        if batch_ids is not None:
+            await lookup_batch(ctx, lang, "character", batch_ids, lambda ids: self._character_batch(ids, lang))
+            return
+
+        char_id = await resolve_query(ctx, lang, "character", char_id)
+        if char_id is None:
+            return
+        # Slash invocations have 3 seconds to answer, prefix ones ignore this
+        await ctx.defer()
+
+        cache_key = None
         try:
             if isinstance(char_id, str) and char_id.lower().startswith("pjsk"):
                 pjsk_id = char_id[4:]
                 if not pjsk_id.isdigit():
                     raise ValueError("Invalid pjsk character id")
-                char_data = await self._get_pjsk_character(int(pjsk_id), lang)
+                cache_key = ("character", "pjsk", int(pjsk_id), lang)
+                if await reply_from_cache(ctx, cache_key):
+                    return
+                char_data = await with_deadline(self.bot.game_data.get(
+                    ("pjsk", "character", int(pjsk_id), lang), lambda: self._get_pjsk_character(int(pjsk_id), lang)
+                ))
                 title_text = get_text(lang, "character", "EMBED_TITLE", CHAR_ID=pjsk_id, NAME=char_data.get("name", "N/A"))
                 embed = discord.Embed(title=title_text, color=0x00AAFF)
                 embed.add_field(
@@ -96,13 +178,20 @@ class CharacterCog(commands.Cog):
                 image_url = char_data.get("image")
                 if image_url:
                     embed.set_thumbnail(url=image_url)
-                await ctx.reply(embed=embed)
+                self.bot.response_cache.put(cache_key, [embed], [])
+                await reply_with_assets(ctx, [embed], [])
                 return
 
-            character = bestdori.characters.Character(int(char_id))
-            char_info = await character.get_info_async()
+            cache_key = ("character", "bestdori", int(char_id), lang)
+            if await reply_from_cache(ctx, cache_key):
+                return
+            char_data = await with_deadline(self.bot.game_data.get(
+                ("bestdori", "character", int(char_id), lang), lambda: self._get_bestdori_character(int(char_id))
+            ))
+            char_info = char_data["info"]
+            bands_info = char_data["bands"]
+            icon = char_data["icon"]
 
-            bands_info: dict = bestdori.bands.get_all()
             band_id = char_info.get('bandId')
             band_name = "Unknown"
             if band_id is not None:
@@ -113,12 +202,6 @@ class CharacterCog(commands.Cog):
                     else:
                         band_name = band_entry['bandName'][3] or band_entry['bandName'][0] or "Unknown"
 
-            icon_bytes = None
-            try:
-                icon_bytes = await character.get_icon_async()
-            except bestdori.exceptions.NotExistException:
-                icon_bytes = None
-
             char_names = char_info.get('characterName', [])
             if len(char_names) > idx and char_names[idx]:
                 display_name = char_names[idx]
@@ -134,20 +217,25 @@ class CharacterCog(commands.Cog):
                 inline=False
             )
 
-            if icon_bytes:
-                file = discord.File(io.BytesIO(icon_bytes), filename=f"char_{char_id}.png")
-                embed.set_thumbnail(url=f"attachment://char_{char_id}.png")
-                await ctx.reply(embed=embed, file=file)
-            else:
-                await ctx.reply(embed=embed)
+            assets = [icon] if icon else []
+            self.bot.response_cache.put(cache_key, [embed], assets)
+            await reply_with_assets(ctx, [embed], assets)
 
         except bestdori.exceptions.NotExistException:
             msg = get_text(lang, "character", "NOT_FOUND", CHAR_ID=int(char_id))
             await ctx.reply(msg)
+        except (UpstreamUnavailable, asyncio.TimeoutError):
+            # Source down or out of time, an expired copy of the reply beats an error
+            if cache_key is None or not await reply_from_cache(ctx, cache_key, stale=True):
+                await ctx.reply(get_text(lang, "character", "UNAVAILABLE"))
         except Exception as e:
             msg = get_text(lang, "character", "ERROR", ERROR=e)
             await ctx.reply(msg)
 
+    @character.autocomplete("char_id")
+    async def _char_id_autocomplete(self, interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+        return autocomplete_choices(self.bot, interaction, "character", current)
+
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(CharacterCog(bot))
@@ -9,10 +9,12 @@
 #     typing.Self = Self
 # ─────────────────────────────────────────────────────────────────────────────
 
-import io
+import asyncio
 import datetime
-import aiohttp
+import functools
+
 import discord
+from discord import app_commands
 from discord.ext import commands
 
 import bestdori.gacha
@@ -20,8 +22,16 @@ import bestdori.cards
 import bestdori.characters
 import bestdori.exceptions
 
-from lang_settings import language_settings
+from batch_lookup import BatchEntry, lookup_batch, parse_ids
+from bestdori_data import banner_loader as bestdori_banner_loader, banner_path as bestdori_banner_path, call_bestdori
+from cdn_cache import reply_with_assets, resolve_asset
+from lang_settings import resolve_language
 from localisation import get_text
+from pjsk_master import ASSET_BASE, banner_path
+from response_cache import reply_from_cache
+from search_index import autocomplete_choices, resolve_query
+from swr_cache import complete
+from upstream import UpstreamUnavailable, is_transient, with_deadline
 
 _lang_to_index = {
     "JPN": 0,
@@ -31,55 +41,59 @@ _lang_to_index = {
     "KOR": 4
 }
 
-_repo_map = {
-    "ENG": "sekai-master-db-en-diff",
-    "JPN": "sekai-master-db-diff",
-    "CHS": "sekai-master-db-cn-diff",
-    "CHT": "sekai-master-db-tc-diff",
-    "KOR": "sekai-master-db-kr-diff",
-}
+_SERVERS = ["jp", "en", "tw", "cn", "kr"]
+
+
+def _bestdori_name_and_period(info: dict, idx: int) -> tuple[str, str]:
+    names = info.get("gachaName", [])
+    name = names[idx] if len(names) > idx and names[idx] else next((n for n in names if n), "N/A")
+
+    start_list = info.get("publishedAt", [])
+    end_list = info.get("closedAt", [])
+    start = start_list[idx] if len(start_list) > idx and start_list[idx] else next((t for t in start_list if t), None)
+    end = end_list[idx] if len(end_list) > idx and end_list[idx] else next((t for t in end_list if t), None)
+    start_str = start[:10] if isinstance(start, str) else str(start)
+    end_str = end[:10] if isinstance(end, str) else str(end)
+    return name, f"{start_str} - {end_str}"
+
+
+def _pjsk_time(ms) -> str:
+    return datetime.datetime.utcfromtimestamp(ms / 1000).strftime("%Y-%m-%d %H:%M") if ms else "N/A"
+
 
 class GachaCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
     async def _get_pjsk_gacha(self, gacha_id: int, lang: str) -> dict:
-        repo = _repo_map.get(lang, "sekai-master-db-en-diff")
-        base = f"https://raw.githubusercontent.com/Sekai-World/{repo}/main"
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{base}/gachas.json") as resp:
-                gachas = await resp.json(content_type=None)
-            async with session.get(f"{base}/cards.json") as resp:
-                cards = await resp.json(content_type=None)
-            async with session.get(f"{base}/gameCharacters.json") as resp:
-                characters = await resp.json(content_type=None)
-
-        gacha = next((g for g in gachas if g.get("id") == gacha_id), None)
+        snapshot = await self.bot.pjsk_master.get_snapshot(lang)
+        index = snapshot.index
+
+        gacha = index.gacha(gacha_id)
         if not gacha:
             raise ValueError("Gacha not found")
 
-        start = gacha.get("startAt")
-        end = gacha.get("endAt")
-        start_str = datetime.datetime.utcfromtimestamp(start / 1000).strftime("%Y-%m-%d %H:%M") if start else "N/A"
-        end_str = datetime.datetime.utcfromtimestamp(end / 1000).strftime("%Y-%m-%d %H:%M") if end else "N/A"
+        start_str = _pjsk_time(gacha.get("startAt"))
+        end_str = _pjsk_time(gacha.get("endAt"))
 
-        banner_url = (
-            f"https://storage.sekai.best/sekai-jp-assets/homebanner/{gacha['assetbundleName']}_rip/{gacha['assetbundleName']}.png"
-        )
-        banner_bytes = None
-        async with aiohttp.ClientSession() as session:
-            async with session.get(banner_url) as resp:
-                if resp.status == 200:
-                    banner_bytes = await resp.read()
+        path = banner_path(gacha)
+        partial = False
+        try:
+            banner = await resolve_asset(
+                self.bot, "sekai", path, f"pjsk_gacha_{gacha_id}.png", url=f"{ASSET_BASE}/{path}"
+            )
+        except Exception as e:
+            if not is_transient(e):
+                raise
+            # Shown without the banner, and not cached, so the next lookup tries again
+            banner = None
+            partial = True
 
         pickup_ids = [p.get("cardId") for p in gacha.get("gachaPickups", [])]
         pickups = []
-        for cid in pickup_ids[:3]:
-            card = next((c for c in cards if c.get("id") == cid), None)
+        for cid, card in zip(pickup_ids[:3], index.cards(pickup_ids[:3])):
             if card:
-                char = next((ch for ch in characters if ch.get("id") == card.get("characterId")), None)
-                char_name = f"{char.get('firstName', '')} {char.get('givenName', '')}".strip() if char else "N/A"
+                char_name = index.character_name(card.get("characterId"))
                 pickups.append(f"{card.get('prefix', 'N/A')} ({char_name})")
             else:
                 pickups.append(str(cid))
@@ -88,16 +102,87 @@ class GachaCog(commands.Cog):
             "title": gacha.get("name", "N/A"),
             "start": start_str,
             "end": end_str,
-            "banner": banner_bytes,
+            "banner": banner,
             "pickups": pickups,
+            "partial": partial,
         }
 
-    @commands.command(name="gacha")
-    async def gacha(self, ctx: commands.Context, gacha_id: str = None):
-        if ctx.guild:
-            lang = language_settings["guild"].get(str(ctx.guild.id), "ENG")
-        else:
-            lang = language_settings["user"].get(str(ctx.author.id), "ENG")
+    async def _get_bestdori_gacha(self, gacha_id: int, server: str) -> dict:
+        gacha = bestdori.gacha.Gacha(gacha_id)
+        info_task = asyncio.ensure_future(call_bestdori(gacha.get_info_async))
+
+        # The banner bundle name comes from the info, but a cached banner does not need it
+        async def get_banner() -> bytes:
+            await info_task
+            return await call_bestdori(gacha.get_banner_async, server)
+
+        info, banner = await asyncio.gather(
+            info_task,
+            resolve_asset(
+                self.bot, "bestdori", bestdori_banner_path(gacha_id, server), f"gacha_{gacha_id}.png",
+                get_banner,
+            ),
+            return_exceptions=True,
+        )
+        if isinstance(info, BaseException):
+            raise info
+        partial = False
+        if isinstance(banner, BaseException):
+            # Missing, not on this server or no banner at all is an answer, only a transient failure is retried
+            partial = is_transient(banner)
+            banner = None
+
+        return {"info": info, "banner": banner, "partial": partial}
+
+    def _batch_embed(self, lang: str, gacha_id, name: str, period: str) -> discord.Embed:
+        embed = discord.Embed(title=get_text(lang, "gacha", "EMBED_TITLE", GACHA_ID=gacha_id), color=0xFF66FF)
+        embed.add_field(name=get_text(lang, "gacha", "FIELD_NAME"), value=name, inline=False)
+        embed.add_field(name=get_text(lang, "gacha", "FIELD_PERIOD"), value=period, inline=False)
+        return embed
+
+    async def _gacha_batch(self, gacha_ids: list[str], lang: str) -> list[BatchEntry | None]:
+        # Text comes from the gacha directory and master tables already in memory,
+        # only the banners of the page on screen are fetched, shown as thumbnails
+        idx = _lang_to_index.get(lang, 3)
+        found = {}
+
+        pjsk_ids = [int(gacha_id[4:]) for gacha_id in gacha_ids if gacha_id.startswith("pjsk")]
+        if pjsk_ids:
+            index = (await self.bot.pjsk_master.get_snapshot(lang)).index
+            for gacha_id, gacha in zip(pjsk_ids, index.gachas(pjsk_ids)):
+                if not gacha:
+                    continue
+                path = banner_path(gacha)
+                banner = functools.partial(
+                    resolve_asset, self.bot, "sekai", path, f"pjsk_gacha_{gacha_id}.png",
+                    url=f"{ASSET_BASE}/{path}", slot="thumbnail",
+                )
+                embed = self._batch_embed(
+                    lang, gacha_id, gacha.get("name", "N/A"),
+                    f"{_pjsk_time(gacha.get('startAt'))} - {_pjsk_time(gacha.get('endAt'))}",
+                )
+                found[f"pjsk{gacha_id}"] = BatchEntry(embed, banner)
+
+        bestdori_ids = [int(gacha_id) for gacha_id in gacha_ids if gacha_id.isdigit()]
+        if bestdori_ids:
+            gachas = await self.bot.gacha_directory.get()
+            server = _SERVERS[idx]
+            for gacha_id in bestdori_ids:
+                info = gachas.get(str(gacha_id))
+                if not info:
+                    continue
+                banner = functools.partial(
+                    resolve_asset, self.bot, "bestdori", bestdori_banner_path(gacha_id, server), f"gacha_{gacha_id}.png",
+                    bestdori_banner_loader(gacha_id, server), slot="thumbnail",
+                )
+                found[str(gacha_id)] = BatchEntry(self._batch_embed(lang, gacha_id, *_bestdori_name_and_period(info, idx)), banner)
+
+        return [found.get(gacha_id) for gacha_id in gacha_ids]
+
+    @commands.hybrid_command(name="gacha", description="Show a gacha by ID or name")
+    @app_commands.describe(gacha_id="Gacha ID (pjsk<ID> for Project Sekai), IDs like 1-10,15, or part of its name")
+    async def gacha(self, ctx: commands.Context, *, gacha_id: str = None):
+        lang = resolve_language(ctx.guild.id if ctx.guild else None, ctx.author.id)
 
         idx = _lang_to_index.get(lang, 3)
 
@@ -105,12 +190,30 @@ class GachaCog(commands.Cog):
             await ctx.reply(get_text(lang, "gacha", "USAGE"))
             return
 
+        batch_ids = parse_ids(gacha_id)
+        if batch_ids is not None:
+            await lookup_batch(ctx, lang, "gacha", batch_ids, lambda ids: self._gacha_batch(ids, lang))
+            return
+
+        gacha_id = await resolve_query(ctx, lang, "gacha", gacha_id)
+        if gacha_id is None:
+            return
+        # Slash invocations have 3 seconds to answer, prefix ones ignore this
+        await ctx.defer()
+
+        cache_key = None
         try:
             if isinstance(gacha_id, str) and gacha_id.lower().startswith("pjsk"):
                 pjsk_id = gacha_id[4:]
                 if not pjsk_id.isdigit():
                     raise ValueError("Invalid pjsk gacha id")
-                data = await self._get_pjsk_gacha(int(pjsk_id), lang)
+                cache_key = ("gacha", "pjsk", int(pjsk_id), lang)
+                if await reply_from_cache(ctx, cache_key):
+                    return
+                data = await with_deadline(self.bot.game_data.get(
+                    ("pjsk", "gacha", int(pjsk_id), lang), lambda: self._get_pjsk_gacha(int(pjsk_id), lang),
+                    keep=complete,
+                ))
 
                 embed = discord.Embed(
                     title=get_text(lang, "gacha", "EMBED_TITLE", GACHA_ID=pjsk_id),
@@ -129,36 +232,24 @@ class GachaCog(commands.Cog):
                         inline=False,
                     )
 
-                files = []
-                if data["banner"]:
-                    files.append(
-                        discord.File(io.BytesIO(data["banner"]), filename=f"pjsk_gacha_{pjsk_id}.png")
-                    )
-                    embed.set_image(url=f"attachment://pjsk_gacha_{pjsk_id}.png")
-
-                await ctx.reply(embed=embed, files=files)
+                assets = [data["banner"]] if data["banner"] else []
+                if complete(data):
+                    self.bot.response_cache.put(cache_key, [embed], assets)
+                await reply_with_assets(ctx, [embed], assets)
                 return
 
-            gacha = bestdori.gacha.Gacha(int(gacha_id))
-            info = await gacha.get_info_async()
-
-            server = ["jp", "en", "tw", "cn", "kr"][idx]
-
-            banner_bytes = None
-            try:
-                banner_bytes = await gacha.get_banner_async(server)
-            except Exception:
-                banner_bytes = None
-
-            names = info.get("gachaName", [])
-            name = names[idx] if len(names) > idx and names[idx] else next((n for n in names if n), "N/A")
+            server = _SERVERS[idx]
+            cache_key = ("gacha", "bestdori", int(gacha_id), lang)
+            if await reply_from_cache(ctx, cache_key):
+                return
+            data = await with_deadline(self.bot.game_data.get(
+                ("bestdori", "gacha", int(gacha_id), lang), lambda: self._get_bestdori_gacha(int(gacha_id), server),
+                keep=complete,
+            ))
+            info = data["info"]
+            banner = data["banner"]
 
-            start_list = info.get("publishedAt", [])
-            end_list = info.get("closedAt", [])
-            start = next((start_list[idx], *start_list), None)
-            end = next((end_list[idx], *end_list), None)
-            start_str = start[:10] if isinstance(start, str) else str(start)
-            end_str = end[:10] if isinstance(end, str) else str(end)
+            name, period = _bestdori_name_and_period(info, idx)
 
             embed = discord.Embed(
                 title=get_text(lang, "gacha", "EMBED_TITLE", GACHA_ID=int(gacha_id)),
@@ -166,22 +257,29 @@ class GachaCog(commands.Cog):
             )
             embed.add_field(name=get_text(lang, "gacha", "FIELD_NAME"), value=name, inline=False)
             embed.add_field(
-                name=get_text(lang, "gacha", "FIELD_PERIOD"), value=f"{start_str} - {end_str}", inline=False
+                name=get_text(lang, "gacha", "FIELD_PERIOD"), value=period, inline=False
             )
 
-            if banner_bytes:
-                file = discord.File(io.BytesIO(banner_bytes), filename=f"gacha_{gacha_id}.png")
-                embed.set_image(url=f"attachment://gacha_{gacha_id}.png")
-                await ctx.reply(embed=embed, file=file)
-            else:
-                await ctx.reply(embed=embed)
+            assets = [banner] if banner else []
+            if complete(data):
+                self.bot.response_cache.put(cache_key, [embed], assets)
+            await reply_with_assets(ctx, [embed], assets)
 
         except bestdori.exceptions.NotExistException:
             msg = get_text(lang, "gacha", "NOT_FOUND", GACHA_ID=gacha_id)
             await ctx.reply(msg)
+        except (UpstreamUnavailable, asyncio.TimeoutError):
+            # Source down or out of time, an expired copy of the reply beats an error
+            if cache_key is None or not await reply_from_cache(ctx, cache_key, stale=True):
+                await ctx.reply(get_text(lang, "gacha", "UNAVAILABLE"))
         except Exception as e:
             msg = get_text(lang, "gacha", "ERROR", ERROR=e)
             await ctx.reply(msg)
 
+    @gacha.autocomplete("gacha_id")
+    async def _gacha_id_autocomplete(self, interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+        return autocomplete_choices(self.bot, interaction, "gacha", current)
+
+
 async def setup(bot: commands.Bot):
     await bot.add_cog(GachaCog(bot))
\ No newline at end of file
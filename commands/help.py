@@ -12,7 +12,7 @@
 import discord
 from discord.ext import commands
 
-from lang_settings import language_settings
+from lang_settings import resolve_language
 from localisation import get_text
 
 class HelpCog(commands.Cog):
@@ -21,10 +21,7 @@ class HelpCog(commands.Cog):
 
     @commands.command(name='help')
     async def help(self, ctx: commands.Context):
-        if ctx.guild:
-            lang = language_settings["guild"].get(str(ctx.guild.id), "ENG")
-        else:
-            lang = language_settings["user"].get(str(ctx.author.id), "ENG")
+        lang = resolve_language(ctx.guild.id if ctx.guild else None, ctx.author.id)
 
         title = get_text(lang, "help", "EMBED_TITLE")
         description = get_text(lang, "help", "EMBED_DESCRIPTION")
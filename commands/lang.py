@@ -12,7 +12,7 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
-from lang_settings import language_settings, save_language_settings
+from lang_settings import resolve_language, set_language
 from localisation import get_text
 
 class Lang(commands.Cog):
@@ -31,20 +31,18 @@ class Lang(commands.Cog):
     async def set_language(self, interaction: discord.Interaction, code: str):
         if interaction.guild is not None:
             if not interaction.user.guild_permissions.administrator:
-                current_lang = language_settings["guild"].get(str(interaction.guild.id), "ENG")
+                current_lang = resolve_language(interaction.guild.id, None)
                 msg = get_text(current_lang, "lang", "NO_ADMIN")
                 await interaction.response.send_message(msg, ephemeral=True)
                 return
 
-            language_settings["guild"][str(interaction.guild.id)] = code
-            save_language_settings()
+            set_language("guild", interaction.guild.id, code)
 
             confirm = get_text(code, "lang", "CONFIRM_GUILD", LANG=code)
             await interaction.response.send_message(confirm, ephemeral=True)
 
         else:
-            language_settings["user"][str(interaction.user.id)] = code
-            save_language_settings()
+            set_language("user", interaction.user.id, code)
 
             confirm = get_text(code, "lang", "CONFIRM_USER", LANG=code)
             await interaction.response.send_message(confirm, ephemeral=True)
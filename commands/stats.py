@@ -0,0 +1,139 @@
+import discord
+from discord.ext import commands
+
+import metrics
+from lang_settings import resolve_language
+from localisation import get_text
+
+# Embed field values are capped at 1024 characters
+FIELD_LIMIT = 1024
+
+
+def _ms(seconds: float | None) -> str:
+    return "n/a" if seconds is None else f"{seconds * 1000:.0f} ms"
+
+
+def _field(lines: list[str], lang: str) -> str:
+    if not lines:
+        return get_text(lang, "stats", "NO_DATA")
+    value = ""
+    for line in lines:
+        if len(value) + len(line) + 1 > FIELD_LIMIT:
+            break
+        value += line + "\n"
+    return value
+
+
+def _merge(series: dict[metrics.Labels, metrics.Histogram], by: str) -> dict[str, metrics.Histogram]:
+    # Folds e.g. the per-outcome histograms of a command into one per command
+    merged = {}
+    for labels, histogram in series.items():
+        name = dict(labels)[by]
+        total = merged.get(name)
+        if total is None:
+            total = merged[name] = metrics.Histogram(histogram.buckets)
+        total.counts = [a + b for a, b in zip(total.counts, histogram.counts)]
+        total.sum += histogram.sum
+        total.count += histogram.count
+    return merged
+
+
+class StatsCog(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    def _command_lines(self, lang: str) -> list[str]:
+        lines = []
+        merged = _merge(metrics.histograms("bot_command_seconds"), "command")
+        for name, histogram in sorted(merged.items(), key=lambda item: -item[1].count):
+            lines.append(get_text(
+                lang, "stats", "COMMAND_LINE", NAME=name, COUNT=histogram.count,
+                P50=_ms(histogram.quantile(0.5)), P95=_ms(histogram.quantile(0.95)), P99=_ms(histogram.quantile(0.99)),
+            ))
+        return lines
+
+    def _phase_lines(self, lang: str) -> list[str]:
+        lines = []
+        for labels, histogram in sorted(metrics.histograms("bot_command_phase_seconds").items()):
+            names = dict(labels)
+            lines.append(get_text(
+                lang, "stats", "COMMAND_LINE", NAME=f"{names['command']}/{names['phase']}", COUNT=histogram.count,
+                P50=_ms(histogram.quantile(0.5)), P95=_ms(histogram.quantile(0.95)), P99=_ms(histogram.quantile(0.99)),
+            ))
+        return lines
+
+    def _upstream_lines(self, lang: str) -> list[str]:
+        series = metrics.histograms("bot_upstream_seconds")
+        errors = {}
+        for labels, histogram in series.items():
+            names = dict(labels)
+            if names["status"] != "ok":
+                errors[names["host"]] = errors.get(names["host"], 0) + histogram.count
+        lines = []
+        for host, histogram in sorted(_merge(series, "host").items()):
+            lines.append(get_text(
+                lang, "stats", "UPSTREAM_LINE", HOST=host, COUNT=histogram.count,
+                ERRORS=errors.get(host, 0), P95=_ms(histogram.quantile(0.95)),
+            ))
+        return lines
+
+    def _cache_lines(self, lang: str) -> list[str]:
+        events = {}
+        for labels, value in metrics.counters("bot_cache_events_total").items():
+            names = dict(labels)
+            events.setdefault(names["cache"], {})[names["event"]] = int(value)
+        lines = []
+        for name, counts in sorted(events.items()):
+            # A stale answer was still served from the cache
+            hits = counts.get("hit", 0) + counts.get("stale", 0)
+            total = hits + counts.get("miss", 0)
+            rate = f"{hits / total:.0%}" if total else "n/a"
+            lines.append(get_text(
+                lang, "stats", "CACHE_LINE", NAME=name, RATE=rate, HITS=hits, TOTAL=total,
+                EVICTIONS=counts.get("evict", 0),
+            ))
+        return lines
+
+    def _gateway_lines(self, lang: str) -> list[str]:
+        lines = [
+            get_text(lang, "stats", "SHARD_LINE", SHARD=dict(labels)["shard"], LATENCY=_ms(latency))
+            for labels, latency in sorted(metrics.gauges("bot_gateway_latency_seconds").items())
+        ]
+        lag = metrics.histograms("bot_event_loop_lag_seconds").get(())
+        if lag is not None:
+            lines.append(get_text(lang, "stats", "LOOP_LAG", LAG=_ms(lag.quantile(0.99))))
+        return lines
+
+    @commands.command(name='stats')
+    @commands.is_owner()
+    async def stats(self, ctx: commands.Context):
+        lang = resolve_language(ctx.guild.id if ctx.guild else None, ctx.author.id)
+
+        if not metrics.enabled:
+            await ctx.reply(get_text(lang, "stats", "DISABLED"))
+            return
+
+        embed = discord.Embed(title=get_text(lang, "stats", "EMBED_TITLE"), color=0x00ff00)
+        sections = (
+            ("FIELD_COMMANDS", self._command_lines),
+            ("FIELD_PHASES", self._phase_lines),
+            ("FIELD_UPSTREAM", self._upstream_lines),
+            ("FIELD_CACHES", self._cache_lines),
+            ("FIELD_GATEWAY", self._gateway_lines),
+        )
+        for key, lines in sections:
+            embed.add_field(name=get_text(lang, "stats", key), value=_field(lines(lang), lang), inline=False)
+        embed.set_footer(text=get_text(lang, "help", "FOOTER", VERSION=self.bot.version))
+        await ctx.reply(embed=embed)
+
+    async def cog_command_error(self, ctx: commands.Context, error: commands.CommandError):
+        if isinstance(error, commands.NotOwner):
+            lang = resolve_language(ctx.guild.id if ctx.guild else None, ctx.author.id)
+            await ctx.reply(get_text(lang, "stats", "NOT_OWNER"))
+        else:
+            # Having a handler here silences the default traceback, keep the error visible
+            print(f"[stats] {type(error).__name__}: {error}")
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(StatsCog(bot))
@@ -0,0 +1,28 @@
+import aiohttp
+
+# ── Shared HTTP pool configuration ──────────────────────────────────────────────
+# Upstreams are only a handful of hosts (GitHub raw/API, storage.sekai.best),
+# so a small pool of kept-alive connections per host covers burst traffic.
+POOL_LIMIT = 64
+POOL_LIMIT_PER_HOST = 16
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 60
+
+TIMEOUT = aiohttp.ClientTimeout(total=30, connect=5, sock_connect=5, sock_read=15)
+USER_AGENT = "Bestdori-Discord-Bot (+https://github.com/aosumi-rena/Bestdori-Discord-Bot)"
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+def create_session() -> aiohttp.ClientSession:
+    # Must be called from inside the running event loop (e.g. `main()` in bot.py)
+    connector = aiohttp.TCPConnector(
+        limit=POOL_LIMIT,
+        limit_per_host=POOL_LIMIT_PER_HOST,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=TIMEOUT,
+        headers={"User-Agent": USER_AGENT},
+    )
@@ -0,0 +1,163 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from asset_cache import AssetCache
+from cdn_cache import Asset, CdnUrlCache
+import metrics
+from singleflight import SingleFlight
+from upstream import is_transient
+
+# ── Image render configuration ──────────────────────────────────────────────────
+# "composite": normal + after-training side by side in one image
+# "reencode": every card image re-encoded on its own
+# "off": upload the original PNGs, the default until an operator opts in
+RENDER_MODE = os.environ.get("BOT_RENDER_MODE", "off")
+RENDER_FORMAT = os.environ.get("BOT_RENDER_FORMAT", "webp")   # "webp" or "png"
+# Width of each card image after resizing, originals are 2048px wide
+RENDER_WIDTH = 1024
+WEBP_QUALITY = 88
+RENDER_WORKERS = 2
+# ────────────────────────────────────────────────────────────────────────────────
+
+RENDER_SOURCE = "render"
+
+
+def _render_images(inputs: list[str], output: str, fmt: str, width: int, quality: int) -> int:
+    # Runs in a worker process, everything it needs comes in as plain arguments
+    images = []
+    for input_path in inputs:
+        with Image.open(input_path) as image:
+            image = image.convert("RGBA")
+            if image.width > width:
+                height = round(image.height * width / image.width)
+                image = image.resize((width, height), Image.LANCZOS)
+            images.append(image)
+
+    if len(images) == 1:
+        result = images[0]
+    else:
+        result = Image.new("RGBA", (sum(i.width for i in images), max(i.height for i in images)), (0, 0, 0, 0))
+        x = 0
+        for image in images:
+            result.paste(image, (x, 0))
+            x += image.width
+
+    if fmt == "webp":
+        result.save(output, "WEBP", quality=quality, method=4)
+    else:
+        result.save(output, "PNG", optimize=True)
+    return os.path.getsize(output)
+
+
+class ImageRenderer:
+    def __init__(
+        self,
+        asset_cache: AssetCache,
+        cdn_urls: CdnUrlCache,
+        single_flight: SingleFlight,
+        mode: str = RENDER_MODE,
+        fmt: str = RENDER_FORMAT,
+        width: int = RENDER_WIDTH,
+        workers: int = RENDER_WORKERS,
+    ):
+        self.asset_cache = asset_cache
+        self.cdn_urls = cdn_urls
+        self._single_flight = single_flight
+        self.mode = mode if Image is not None else "off"
+        self.fmt = fmt
+        self.width = width
+        self.workers = workers
+        self._pool: ProcessPoolExecutor | None = None
+        if Image is None and mode != "off":
+            print("[image_render] Pillow is not installed, card images are sent as-is")
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in ("composite", "reencode")
+
+    async def card_assets(self, source: str, card_id: int, assets: list[Asset]) -> list[Asset]:
+        # Falls back to the originals whenever rendering is off or fails
+        if not self.enabled or not assets:
+            return assets
+        with metrics.phase("render"):
+            return await self._card_assets(source, card_id, assets)
+
+    async def _card_assets(self, source: str, card_id: int, assets: list[Asset]) -> list[Asset]:
+        if self.mode == "composite" and len(assets) > 1:
+            path = f"card/{source}/{card_id}/composite@{self.width}.{self.fmt}"
+            rendered = await self._rendered(path, assets, f"card_{card_id}.{self.fmt}", assets[0])
+            return [rendered] if rendered is not None else assets
+
+        results = []
+        for asset in assets:
+            variant = os.path.splitext(os.path.basename(asset.path))[0]
+            path = f"card/{source}/{card_id}/{variant}@{self.width}.{self.fmt}"
+            filename = f"{os.path.splitext(asset.filename)[0]}.{self.fmt}"
+            rendered = await self._rendered(path, [asset], filename, asset)
+            results.append(rendered or asset)
+        return results
+
+    async def _rendered(self, path: str, inputs: list[Asset], filename: str, template: Asset) -> Asset | None:
+        rendered = Asset(RENDER_SOURCE, path, filename, template.slot, template.embed)
+        # Keyed by source, card id, variant, width and format, so each render happens once
+        if await self.cdn_urls.get(RENDER_SOURCE, path) is not None:
+            return rendered
+        if await self.asset_cache.get(RENDER_SOURCE, path) is not None:
+            return rendered
+        # Two commands for the same card share one render
+        if not await self._single_flight.do((RENDER_SOURCE, path), lambda: self._render(path, inputs)):
+            return None
+        return rendered
+
+    async def _render(self, path: str, inputs: list[Asset]) -> bool:
+        input_paths = []
+        for asset in inputs:
+            if asset.url is not None:
+                try:
+                    file_path = await self.asset_cache.fetch_url(asset.source, asset.path, asset.url)
+                except Exception as e:
+                    if not is_transient(e):
+                        raise
+                    # The plain image goes out instead, if it can be fetched at all
+                    return False
+            else:
+                file_path = await self.asset_cache.get(asset.source, asset.path)
+            if file_path is None:
+                return False
+            input_paths.append(str(file_path))
+
+        tmp_path = await self.asset_cache.reserve(RENDER_SOURCE, path)
+        try:
+            loop = asyncio.get_running_loop()
+            size = await loop.run_in_executor(
+                self._executor(), _render_images, input_paths, str(tmp_path), self.fmt, self.width, WEBP_QUALITY
+            )
+        except BrokenProcessPool as e:
+            # A worker died (e.g. out of memory), start a fresh pool next time
+            self._pool = None
+            print(f"[image_render] Render pool broke while rendering {path}: {e}")
+            await self.asset_cache.discard(tmp_path)
+            return False
+        except Exception as e:
+            print(f"[image_render] Could not render {path}: {e}")
+            await self.asset_cache.discard(tmp_path)
+            return False
+        await self.asset_cache.adopt(RENDER_SOURCE, path, tmp_path, size)
+        return True
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    async def close(self):
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await asyncio.to_thread(pool.shutdown, True, cancel_futures=True)
@@ -1,16 +1,139 @@
+import asyncio
 import json
 import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 
-FILE_PATH = os.path.join(os.path.dirname(__file__), "language_settings.json")
+# BOT_LANG_DB moves the database elsewhere, e.g. the bench's temp folder
+DB_PATH = os.environ.get("BOT_LANG_DB") or os.path.join(os.path.dirname(__file__), "language_settings.db")
+# Pre-SQLite storage next to the database, imported once into it if present
+LEGACY_FILE_PATH = os.path.splitext(DB_PATH)[0] + ".json"
 
-if os.path.exists(FILE_PATH):
-    with open(FILE_PATH, "r", encoding="utf8") as f:
-        language_settings = json.load(f)
-else:
-    language_settings = {"guild": {}, "user": {}}
-    with open(FILE_PATH, "w", encoding="utf8") as f:
-        json.dump(language_settings, f, indent=4, ensure_ascii=False)
+DEFAULT_LANG = "ENG"
+SCOPES = ("guild", "user")
+# /lang bursts (e.g. an admin trying every language) collapse into one transaction
+FLUSH_DELAY = 1.0
 
-def save_language_settings():
-    with open(FILE_PATH, "w", encoding="utf8") as f:
-        json.dump(language_settings, f, indent=4, ensure_ascii=False)
+# In-memory view of the database, every command resolves against this
+language_settings = {"guild": {}, "user": {}}
+
+_pending: dict[tuple[str, str], str] = {}
+_flush_task: asyncio.Task | None = None
+# One writer thread, so transactions never interleave
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lang_settings")
+# Opened by start(), so importing this module (e.g. from a script or the tests) creates no database
+_conn: sqlite3.Connection | None = None
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH, timeout=10, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS language_settings ("
+        " scope TEXT NOT NULL,"
+        " target_id TEXT NOT NULL,"
+        " lang TEXT NOT NULL,"
+        " PRIMARY KEY (scope, target_id))"
+    )
+    return conn
+
+
+def _import_legacy(conn: sqlite3.Connection):
+    if not os.path.exists(LEGACY_FILE_PATH):
+        return
+    if conn.execute("SELECT 1 FROM language_settings LIMIT 1").fetchone():
+        return
+    with open(LEGACY_FILE_PATH, "r", encoding="utf8") as f:
+        legacy = json.load(f)
+    rows = [
+        (scope, target_id, code)
+        for scope in SCOPES
+        for target_id, code in legacy.get(scope, {}).items()
+    ]
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO language_settings VALUES (?, ?, ?)", rows)
+    print(f"[lang_settings] Imported {len(rows)} setting(s) from {os.path.basename(LEGACY_FILE_PATH)}")
+
+
+def _open() -> list[tuple[str, str, str]]:
+    global _conn
+    if _conn is None:
+        _conn = _connect()
+        _import_legacy(_conn)
+    return _read_all()
+
+
+def _read_all() -> list[tuple[str, str, str]]:
+    return _conn.execute("SELECT scope, target_id, lang FROM language_settings").fetchall()
+
+
+def _write(rows: list[tuple[str, str, str]]):
+    # Single transaction, a crash leaves either all of the batch or none of it
+    with _conn:
+        _conn.executemany(
+            "INSERT INTO language_settings (scope, target_id, lang) VALUES (?, ?, ?)"
+            " ON CONFLICT (scope, target_id) DO UPDATE SET lang = excluded.lang",
+            rows,
+        )
+
+
+def resolve_language(guild_id: int | None, user_id: int | None) -> str:
+    # Guild setting inside a guild, personal setting in DMs
+    if guild_id is not None:
+        return language_settings["guild"].get(str(guild_id), DEFAULT_LANG)
+    if user_id is not None:
+        return language_settings["user"].get(str(user_id), DEFAULT_LANG)
+    return DEFAULT_LANG
+
+
+def set_language(scope: str, target_id: int, code: str):
+    global _flush_task
+    if scope not in SCOPES:
+        raise ValueError(f"Unknown language scope {scope!r}")
+    language_settings[scope][str(target_id)] = code
+    _pending[(scope, str(target_id))] = code
+    if _flush_task is None or _flush_task.done():
+        _flush_task = asyncio.create_task(_flush_later())
+
+
+async def _flush_later():
+    await asyncio.sleep(FLUSH_DELAY)
+    await flush()
+
+
+async def flush():
+    if not _pending:
+        return
+    rows = [(scope, target_id, code) for (scope, target_id), code in _pending.items()]
+    _pending.clear()
+    try:
+        await asyncio.get_running_loop().run_in_executor(_writer, _write, rows)
+    except sqlite3.Error as e:
+        # Put the batch back unless a newer value arrived meanwhile, the next flush retries it
+        for scope, target_id, code in rows:
+            _pending.setdefault((scope, target_id), code)
+        print(f"[lang_settings] Failed to save language settings: {e}")
+
+
+async def start():
+    rows = await asyncio.get_running_loop().run_in_executor(_writer, _open)
+    for scope, target_id, code in rows:
+        if scope in language_settings:
+            language_settings[scope][target_id] = code
+
+
+async def reload():
+    # Picks up settings other processes (e.g. other shards) wrote to the shared database
+    rows = await asyncio.get_running_loop().run_in_executor(_writer, _read_all)
+    for scope, target_id, code in rows:
+        # Unsaved local changes are newer than what is on disk
+        if scope in language_settings and (scope, target_id) not in _pending:
+            language_settings[scope][target_id] = code
+
+
+async def close():
+    if _flush_task is not None and not _flush_task.done():
+        _flush_task.cancel()
+    await flush()
+    _writer.shutdown(wait=True)
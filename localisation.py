@@ -1,18 +1,148 @@
+import asyncio
 import json
 import os
+import re
 
-loaded_textmaps = {}
+LANGUAGES = ("ENG", "CHS", "CHT", "JPN", "KOR")
+FALLBACK_LANG = "ENG"
+BASE_DIR = os.path.dirname(__file__)
+RELOAD_INTERVAL = 5
 
-def get_text(lang_code: str, section: str, key: str, **kwargs) -> str:
+_placeholder = re.compile(r"\{([A-Za-z0-9_]+)\}")
+
+
+class Template:
+    __slots__ = ("literals", "names")
+
+    def __init__(self, text: str):
+        # "Card #{CARD_ID}" -> literals ("Card #", ""), names ("CARD_ID",)
+        pieces = _placeholder.split(text)
+        self.literals = tuple(pieces[0::2])
+        self.names = tuple(pieces[1::2])
+
+    def render(self, kwargs: dict) -> str:
+        if not self.names:
+            return self.literals[0]
+        out = [self.literals[0]]
+        for name, literal in zip(self.names, self.literals[1:]):
+            # Unknown placeholders stay as-is, same as the old str.replace() loop
+            out.append(str(kwargs[name]) if name in kwargs else "{" + name + "}")
+            out.append(literal)
+        return "".join(out)
+
+
+# lang -> {(section, key): Template}, already merged with the ENG fallback per key
+compiled_textmaps: dict[str, dict[tuple[str, str], Template]] = {}
+_mtimes: dict[str, float] = {}
+_watcher: asyncio.Task | None = None
+_reload_listeners: list = []
+
+
+def _textmap_path(lang_code: str) -> str:
+    return os.path.join(BASE_DIR, f"textmap_{lang_code}.json")
 
-    if lang_code not in loaded_textmaps:
-        path = os.path.join(os.path.dirname(__file__), f"textmap_{lang_code}.json")
+
+def _read_textmap(lang_code: str) -> dict:
+    with open(_textmap_path(lang_code), "r", encoding="utf8") as f:
+        return json.load(f)
+
+
+def _compile(textmap: dict) -> dict[tuple[str, str], Template]:
+    return {
+        (section, key): Template(text)
+        for section, entries in textmap.items()
+        for key, text in entries.items()
+    }
+
+
+def _validate(lang_code: str, own: dict, fallback: dict):
+    missing = sorted(set(fallback) - set(own))
+    if missing:
+        shown = ", ".join(f"{s}.{k}" for s, k in missing[:5])
+        print(f"[localisation] {lang_code}: {len(missing)} key(s) fall back to {FALLBACK_LANG}: {shown}")
+    for entry, template in own.items():
+        expected = fallback.get(entry)
+        if expected is not None and set(template.names) != set(expected.names):
+            print(f"[localisation] {lang_code}: placeholders of {entry[0]}.{entry[1]} differ from {FALLBACK_LANG}")
+
+
+def _build() -> tuple[dict[str, dict[tuple[str, str], Template]], dict[str, float]]:
+    own = {}
+    mtimes = {}
+    for lang_code in LANGUAGES:
+        path = _textmap_path(lang_code)
         if not os.path.exists(path):
-            path = os.path.join(os.path.dirname(__file__), "textmap_ENG.json")
-        with open(path, "r", encoding="utf8") as f:
-            loaded_textmaps[lang_code] = json.load(f)
-
-    text = loaded_textmaps[lang_code].get(section, {}).get(key, "")
-    for placeholder, value in kwargs.items():
-        text = text.replace("{" + placeholder + "}", str(value))
-    return text
+            continue
+        mtimes[lang_code] = os.path.getmtime(path)
+        own[lang_code] = _compile(_read_textmap(lang_code))
+
+    fallback = own.get(FALLBACK_LANG, {})
+    merged = {}
+    for lang_code, templates in own.items():
+        if lang_code != FALLBACK_LANG:
+            _validate(lang_code, templates, fallback)
+        merged[lang_code] = {**fallback, **templates}
+    return merged, mtimes
+
+
+def load_textmaps():
+    global compiled_textmaps, _mtimes
+    compiled_textmaps, _mtimes = _build()
+
+
+def get_text(lang_code: str, section: str, key: str, **kwargs) -> str:
+    templates = compiled_textmaps.get(lang_code) or compiled_textmaps.get(FALLBACK_LANG, {})
+    template = templates.get((section, key))
+    if template is None:
+        return ""
+    return template.render(kwargs)
+
+
+# ── Hot reload ──────────────────────────────────────────────────────────────────
+def _changed() -> bool:
+    for lang_code in LANGUAGES:
+        path = _textmap_path(lang_code)
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        if mtime != _mtimes.get(lang_code):
+            return True
+    return False
+
+
+async def _watch():
+    global compiled_textmaps, _mtimes
+    while True:
+        await asyncio.sleep(RELOAD_INTERVAL)
+        try:
+            if await asyncio.to_thread(_changed):
+                # Built off the loop and swapped in one assignment, readers never see half a reload
+                compiled_textmaps, _mtimes = await asyncio.to_thread(_build)
+                print("[localisation] Textmaps reloaded")
+                for callback in _reload_listeners:
+                    callback()
+        except (OSError, ValueError) as e:
+            # e.g. a textmap saved mid-edit, keep the last good copy
+            print(f"[localisation] Reload failed, keeping previous textmaps: {e}")
+
+
+def add_reload_listener(callback):
+    _reload_listeners.append(callback)
+
+
+def start_watcher():
+    global _watcher
+    if _watcher is None:
+        _watcher = asyncio.create_task(_watch())
+
+
+async def stop_watcher():
+    global _watcher
+    if _watcher is not None:
+        _watcher.cancel()
+        try:
+            await _watcher
+        except asyncio.CancelledError:
+            pass
+        _watcher = None
+
+
+load_textmaps()
@@ -0,0 +1,258 @@
+import asyncio
+import contextlib
+import contextvars
+import os
+import time
+from bisect import bisect_left
+from typing import Callable
+
+from aiohttp import web
+
+# ── Metrics configuration ───────────────────────────────────────────────────────
+# BOT_METRICS=0 turns every probe below into an early return
+METRICS_ENABLED = os.environ.get("BOT_METRICS", "1") != "0"
+# Prometheus text endpoint at http://127.0.0.1:<port>/metrics, 0 disables it.
+# With shards split over processes each one adds its first shard id to the port.
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = int(os.environ.get("BOT_METRICS_PORT", "9464"))
+# Upper bounds in seconds, the last bucket is +Inf
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# How often the event loop lag probe wakes up
+LOOP_LAG_INTERVAL = 0.5
+# ────────────────────────────────────────────────────────────────────────────────
+
+enabled = METRICS_ENABLED
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        # Per bucket, not cumulative, the extra slot at the end is +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float | None:
+        # Linear interpolation inside the bucket, same as Prometheus' histogram_quantile()
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+# name -> labels -> value
+_histograms: dict[str, dict[Labels, Histogram]] = {}
+_counters: dict[str, dict[Labels, float]] = {}
+# name -> callback returning labels -> value, read at scrape time
+_gauges: dict[str, Callable[[], dict[Labels, float]]] = {}
+
+# Name of the prefix command the current task is running, set by the bot's invoke hooks
+_command: contextvars.ContextVar[str | None] = contextvars.ContextVar("metrics_command", default=None)
+_command_started: contextvars.ContextVar[float] = contextvars.ContextVar("metrics_command_started", default=0.0)
+
+_server: web.AppRunner | None = None
+_lag_probe: asyncio.Task | None = None
+
+
+# ── Probes ──────────────────────────────────────────────────────────────────────
+def observe(name: str, value: float, **labels: str):
+    if not enabled:
+        return
+    series = _histograms.setdefault(name, {})
+    key = tuple(labels.items())
+    histogram = series.get(key)
+    if histogram is None:
+        histogram = series[key] = Histogram()
+    histogram.observe(value)
+
+
+def inc(name: str, amount: float = 1, **labels: str):
+    if not enabled:
+        return
+    series = _counters.setdefault(name, {})
+    key = tuple(labels.items())
+    series[key] = series.get(key, 0) + amount
+
+
+def cache_event(cache: str, event: str):
+    # event is "hit", "stale", "miss" or "evict"
+    if enabled:
+        inc("bot_cache_events_total", cache=cache, event=event)
+
+
+def gauge(name: str, callback: Callable[[], dict[Labels, float]]):
+    _gauges[name] = callback
+
+
+class _Timer:
+    __slots__ = ("name", "labels", "started")
+
+    def __init__(self, name: str, labels: dict):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe(self.name, time.perf_counter() - self.started, **self.labels)
+
+
+_NOOP = contextlib.nullcontext()
+
+
+def timer(name: str, **labels: str):
+    if not enabled:
+        return _NOOP
+    return _Timer(name, labels)
+
+
+def phase(name: str):
+    # Time one step (fetch, render, upload) of the command running in this task, no-op outside commands
+    command = _command.get()
+    if not enabled or command is None:
+        return _NOOP
+    return _Timer("bot_command_phase_seconds", {"command": command, "phase": name})
+
+
+def command_started(command: str):
+    if not enabled:
+        return
+    _command.set(command)
+    _command_started.set(time.perf_counter())
+
+
+def command_finished(failed: bool):
+    command = _command.get()
+    if not enabled or command is None:
+        return
+    elapsed = time.perf_counter() - _command_started.get()
+    observe("bot_command_seconds", elapsed, command=command, outcome="error" if failed else "ok")
+    _command.set(None)
+
+
+def reset():
+    # Drops everything recorded so far, e.g. between benchmark scenarios
+    _histograms.clear()
+    _counters.clear()
+
+
+# ── Reading ─────────────────────────────────────────────────────────────────────
+def histograms(name: str) -> dict[Labels, Histogram]:
+    return dict(_histograms.get(name, {}))
+
+
+def counters(name: str) -> dict[Labels, float]:
+    return dict(_counters.get(name, {}))
+
+
+def gauges(name: str) -> dict[Labels, float]:
+    callback = _gauges.get(name)
+    return callback() if callback is not None else {}
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def render() -> str:
+    # Prometheus text exposition format 0.0.4
+    lines = []
+    for name, series in sorted(_histograms.items()):
+        lines.append(f"# TYPE {name} histogram")
+        for labels, histogram in list(series.items()):
+            cumulative = 0
+            for bound, n in zip(histogram.buckets, histogram.counts):
+                cumulative += n
+                le = f'le="{bound}"'
+                lines.append(f"{name}_bucket{_labels(labels, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{name}_bucket{_labels(labels, le)} {histogram.count}")
+            lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+    for name, series in sorted(_counters.items()):
+        lines.append(f"# TYPE {name} counter")
+        for labels, value in list(series.items()):
+            lines.append(f"{name}{_labels(labels)} {value}")
+    for name in sorted(_gauges):
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in gauges(name).items():
+            lines.append(f"{name}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# ── Endpoint and event loop probe ───────────────────────────────────────────────
+async def _handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+
+async def _probe_loop_lag():
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        # Anything past the requested sleep is time the loop spent busy elsewhere
+        observe("bot_event_loop_lag_seconds", max(loop.time() - started - LOOP_LAG_INTERVAL, 0.0))
+
+
+async def start(port: int = METRICS_PORT, host: str = METRICS_HOST):
+    global _server, _lag_probe
+    if not enabled:
+        return
+    if _lag_probe is None:
+        _lag_probe = asyncio.create_task(_probe_loop_lag())
+    if not port or _server is not None:
+        return
+
+    app = web.Application()
+    app.router.add_get("/metrics", _handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        # e.g. another bot process on the same port, the ^stats command still works
+        print(f"[metrics] Could not listen on {host}:{port}: {e}")
+        await runner.cleanup()
+        return
+    _server = runner
+    print(f"[metrics] Serving http://{host}:{port}/metrics")
+
+
+async def stop():
+    global _server, _lag_probe
+    if _lag_probe is not None:
+        _lag_probe.cancel()
+        try:
+            await _lag_probe
+        except asyncio.CancelledError:
+            pass
+        _lag_probe = None
+    if _server is not None:
+        await _server.cleanup()
+        _server = None
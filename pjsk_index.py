@@ -0,0 +1,336 @@
+import sys
+import weakref
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from typing import Callable, Iterable
+
+# ── Columns kept from the master tables, everything else is dropped on load ────
+# "int" columns are array('q'), "str" columns interned strings, "pickups" tuples of card ids
+SCHEMAS = {
+    "cards": {
+        "id": "int",
+        "characterId": "int",
+        "prefix": "str",
+        "assetbundleName": "str",
+        "cardRarityType": "str",
+    },
+    "gameCharacters": {
+        "id": "int",
+        "firstName": "str",
+        "givenName": "str",
+        "unit": "str",
+        "resourceId": "int",
+    },
+    "gachas": {
+        "id": "int",
+        "name": "str",
+        "assetbundleName": "str",
+        "startAt": "int",
+        "endAt": "int",
+        "gachaPickups": "pickups",
+    },
+    "unitProfiles": {
+        "unit": "str",
+        "unitName": "str",
+    },
+}
+KEYS = {"unitProfiles": "unit"}
+# ────────────────────────────────────────────────────────────────────────────────
+
+# Stands in for a missing number, array('q') cannot hold None
+_MISSING = -(2 ** 63)
+
+
+def _pack(kind: str, value):
+    if kind == "int":
+        return _MISSING if value is None else int(value)
+    if kind == "str":
+        return None if value is None else sys.intern(str(value))
+    # pickups: [{"cardId": 1, ...}, ...] -> (1, ...)
+    return tuple(pickup.get("cardId") for pickup in value or ())
+
+
+def _unpack(kind: str, value):
+    if kind == "int":
+        return None if value == _MISSING else value
+    if kind == "str":
+        return value
+    return [{"cardId": card_id} for card_id in value]
+
+
+class Record:
+    # A view of one row, reads straight from the table's columns
+    __slots__ = ("_table", "_pos")
+
+    def __init__(self, table: "ColumnTable", pos: int):
+        self._table = table
+        self._pos = pos
+
+    def get(self, field: str, default=None):
+        kind = self._table.schema.get(field)
+        if kind is None:
+            return default
+        value = _unpack(kind, self._table.columns[field][self._pos])
+        return default if value is None else value
+
+    def __getitem__(self, field: str):
+        value = self.get(field)
+        if value is None:
+            raise KeyError(field)
+        return value
+
+    def __contains__(self, field: str) -> bool:
+        return self.get(field) is not None
+
+    def to_dict(self) -> dict:
+        row = {}
+        for field in self._table.schema:
+            value = self.get(field)
+            if value is not None:
+                row[field] = value
+        return row
+
+    def __repr__(self) -> str:
+        return f"Record({self.to_dict()!r})"
+
+
+class ColumnTable:
+    __slots__ = ("schema", "key", "columns", "ids", "base", "touched", "__weakref__")
+
+    def __init__(self, rows: Iterable[dict], schema: dict[str, str], key: str = "id"):
+        self.schema = schema
+        self.key = key
+        # Set by patched() when every kept row stayed at its position: the table it was patched from
+        # and the positions rewritten or appended, so reverse indexes can be patched the same way
+        self.base: weakref.ref | None = None
+        self.touched: tuple[int, ...] = ()
+        # Rows are stored sorted by key, so positions line up with `ids` and lookups are a bisect
+        keyed = sorted((row for row in rows if row.get(key) is not None), key=lambda row: row[key])
+        self.columns = {
+            field: array("q") if kind == "int" else []
+            for field, kind in schema.items()
+        }
+        for row in keyed:
+            for field, kind in schema.items():
+                self.columns[field].append(_pack(kind, row.get(field)))
+        self.ids = self.columns[key]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _position(self, row_id) -> int | None:
+        try:
+            pos = bisect_left(self.ids, row_id)
+        except TypeError:
+            # e.g. a str id against an int column
+            return None
+        if pos < len(self.ids) and self.ids[pos] == row_id:
+            return pos
+        return None
+
+    def get(self, row_id) -> Record | None:
+        pos = self._position(row_id)
+        return None if pos is None else Record(self, pos)
+
+    def batch(self, row_ids: Iterable) -> list:
+        return [self.get(row_id) for row_id in row_ids]
+
+    def range(self, start, end) -> list:
+        # Inclusive on both ends, like `^card 947-955`
+        lo = bisect_left(self.ids, start)
+        hi = bisect_right(self.ids, end)
+        return [Record(self, pos) for pos in range(lo, hi)]
+
+    def records(self) -> Iterable[Record]:
+        return (Record(self, pos) for pos in range(len(self.ids)))
+
+    def column(self, field: str):
+        return self.columns[field]
+
+    def _row(self, pos: int) -> tuple:
+        return tuple(self.columns[field][pos] for field in self.schema)
+
+    def to_rows(self) -> list[dict]:
+        # Plain dicts again, for the on-disk copy
+        return [record.to_dict() for record in self.records()]
+
+    def _pack_row(self, row: dict) -> tuple:
+        return tuple(_pack(kind, row.get(field)) for field, kind in self.schema.items())
+
+    def patched(self, rows: Iterable[dict]) -> tuple["ColumnTable", tuple[int, int, int]]:
+        # Applies the added/updated/removed ids on top of this table, unchanged rows keep their packed values.
+        # An unchanged table is returned as is, so its reverse indexes carry over too.
+        fresh = {row[self.key]: row for row in rows if row.get(self.key) is not None}
+        columns = [(field, kind, self.columns[field]) for field, kind in self.schema.items()]
+        updated = {}
+        removed = 0
+        for pos, row_id in enumerate(self.ids):
+            row = fresh.get(row_id)
+            if row is None:
+                removed += 1
+                continue
+            # Field by field, a changed row is packed in full once the first difference shows up
+            for field, kind, column in columns:
+                if _pack(kind, row.get(field)) != column[pos]:
+                    updated[pos] = self._pack_row(row)
+                    break
+        known = set(self.ids)
+        added = sorted(row_id for row_id in fresh if row_id not in known)
+        if not (added or updated or removed):
+            return self, (0, 0, 0)
+
+        table = ColumnTable((), self.schema, self.key)
+        fields = list(self.schema)
+        if not removed and (not added or not self.ids or added[0] > self.ids[-1]):
+            # The usual case, rows edited in place and new ids at the end: every kept row stays where it was
+            table.columns = {field: column[:] for field, column in self.columns.items()}
+            for pos, packed in updated.items():
+                for field, value in zip(fields, packed):
+                    table.columns[field][pos] = value
+            for row_id in added:
+                for field, value in zip(fields, self._pack_row(fresh[row_id])):
+                    table.columns[field].append(value)
+            table.base = weakref.ref(self)
+            table.touched = (*updated, *range(len(self.ids), len(self.ids) + len(added)))
+        else:
+            # Rows moved, merge in id order
+            for row_id in sorted(fresh):
+                pos = self._position(row_id)
+                if pos is None:
+                    packed = self._pack_row(fresh[row_id])
+                else:
+                    packed = updated.get(pos) or self._row(pos)
+                for field, value in zip(fields, packed):
+                    table.columns[field].append(value)
+        table.ids = table.columns[self.key]
+        return table, (len(added), len(updated), removed)
+
+
+def build_table(name: str, rows: Iterable[dict]) -> ColumnTable:
+    return ColumnTable(rows, SCHEMAS[name], KEYS.get(name, "id"))
+
+
+def _reverse_index(
+    table: ColumnTable,
+    field: str,
+    keys: Callable[[object], Iterable],
+    previous: tuple[ColumnTable, dict] | None,
+) -> dict:
+    # keys(value) -> what a row is listed under, e.g. every pickup card of a gacha
+    if previous is not None:
+        previous_table, previous_index = previous
+        # Table carried over unchanged from the previous snapshot
+        if previous_table is table:
+            return previous_index
+        # Patched in place: move only the touched positions, every other list is shared with the previous index
+        if table.base is not None and table.base() is previous_table:
+            old_column = previous_table.column(field)
+            column = table.column(field)
+            index = dict(previous_index)
+            copied = set()
+            for pos in table.touched:
+                old_keys = keys(old_column[pos]) if pos < len(old_column) else ()
+                new_keys = keys(column[pos])
+                if old_keys == new_keys:
+                    continue
+                for key, change in [*((key, -1) for key in old_keys), *((key, 1) for key in new_keys)]:
+                    if key not in copied:
+                        index[key] = list(index.get(key, ()))
+                        copied.add(key)
+                    if change < 0:
+                        index[key].remove(pos)
+                    else:
+                        insort(index[key], pos)
+            for key in copied:
+                if not index[key]:
+                    del index[key]
+            return index
+
+    index = defaultdict(list)
+    for pos, value in enumerate(table.column(field)):
+        for key in keys(value):
+            index[key].append(pos)
+    return dict(index)
+
+
+class PjskIndex:
+    def __init__(self, tables: dict[str, ColumnTable], previous: "PjskIndex | None" = None):
+        self._cards = self._table(tables, "cards")
+        self._characters = self._table(tables, "gameCharacters")
+        self._gachas = self._table(tables, "gachas")
+        self._unit_profiles = self._table(tables, "unitProfiles")
+
+        # Reverse indexes hold row positions: value -> sorted positions
+        self._cards_by_character = _reverse_index(
+            self._cards, "characterId", lambda char_id: (char_id,),
+            previous and (previous._cards, previous._cards_by_character),
+        )
+        self._gachas_by_card = _reverse_index(
+            self._gachas, "gachaPickups", lambda card_ids: card_ids,
+            previous and (previous._gachas, previous._gachas_by_card),
+        )
+
+    @staticmethod
+    def _table(tables: dict[str, ColumnTable], name: str) -> ColumnTable:
+        table = tables.get(name)
+        return build_table(name, []) if table is None else table
+
+    # ── Point lookups ───────────────────────────────────────────────────────────
+    def card(self, card_id: int) -> Record | None:
+        return self._cards.get(card_id)
+
+    def character(self, char_id: int) -> Record | None:
+        return self._characters.get(char_id)
+
+    def gacha(self, gacha_id: int) -> Record | None:
+        return self._gachas.get(gacha_id)
+
+    def unit_profile(self, unit: str) -> Record | None:
+        return self._unit_profiles.get(unit)
+
+    # ── Reverse indexes ─────────────────────────────────────────────────────────
+    def cards_for_character(self, char_id: int) -> list:
+        return [Record(self._cards, pos) for pos in self._cards_by_character.get(char_id, ())]
+
+    def gachas_for_card(self, card_id: int) -> list:
+        return [Record(self._gachas, pos) for pos in self._gachas_by_card.get(card_id, ())]
+
+    # ── Batch / range queries ───────────────────────────────────────────────────
+    def card_ids(self) -> list:
+        # Sorted ascending, newest cards last
+        return list(self._cards.ids)
+
+    def gacha_ids(self) -> list:
+        return list(self._gachas.ids)
+
+    def cards(self, card_ids: Iterable[int]) -> list:
+        return self._cards.batch(card_ids)
+
+    def characters(self, char_ids: Iterable[int]) -> list:
+        return self._characters.batch(char_ids)
+
+    def gachas(self, gacha_ids: Iterable[int]) -> list:
+        return self._gachas.batch(gacha_ids)
+
+    def cards_in_range(self, start: int, end: int) -> list:
+        return self._cards.range(start, end)
+
+    def gachas_in_range(self, start: int, end: int) -> list:
+        return self._gachas.range(start, end)
+
+    def gachas_active_at(self, when_ms: int) -> list:
+        # Scans the two time columns only, rows are only materialised for matches
+        starts = self._gachas.column("startAt")
+        ends = self._gachas.column("endAt")
+        return [
+            Record(self._gachas, pos)
+            for pos, (start, end) in enumerate(zip(starts, ends))
+            if start != _MISSING and start <= when_ms <= end
+        ]
+
+    def character_name(self, char_id: int, default: str = "N/A") -> str:
+        char = self._characters.get(char_id)
+        if not char:
+            return default
+        return f"{char.get('firstName', '')} {char.get('givenName', '')}".strip()
@@ -0,0 +1,308 @@
+import asyncio
+import json
+import os
+import secrets
+import time
+from pathlib import Path
+from typing import Callable
+
+import aiohttp
+
+import upstream
+from pjsk_index import SCHEMAS, ColumnTable, PjskIndex, build_table
+
+# ── PJSK master data, mirrored from sekai viewer's github ──────────────────────
+REPO_MAP = {
+    "ENG": "sekai-master-db-en-diff",
+    "JPN": "sekai-master-db-diff",
+    "CHS": "sekai-master-db-cn-diff",
+    "CHT": "sekai-master-db-tc-diff",
+    "KOR": "sekai-master-db-kr-diff",
+}
+DEFAULT_REPO = "sekai-master-db-en-diff"
+
+TABLES = ("cards", "gameCharacters", "gachas", "unitProfiles")
+
+RAW_BASE = "https://raw.githubusercontent.com/Sekai-World/{repo}/main"
+COMMIT_URL = "https://api.github.com/repos/Sekai-World/{repo}/commits/main"
+ASSET_BASE = "https://storage.sekai.best/sekai-jp-assets"
+
+# Full reload even if the upstream commit did not move
+SNAPSHOT_TTL = 6 * 60 * 60
+# Unauthenticated GitHub API allows 60 calls/hour, keep 5 repos well under it
+COMMIT_CHECK_INTERVAL = 10 * 60
+# Last synced tables + their ETag/Last-Modified, so a restart only costs 304s
+MASTER_CACHE_DIR = Path(__file__).parent / "cache" / "master"
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+# ── Asset paths under ASSET_BASE, shared by the cogs and the warm-up prefetch ───
+def card_art_path(card: dict, variant: str) -> str:
+    # variant is "normal" or "after_training"
+    return f"character/member/{card['assetbundleName']}/card_{variant}.png"
+
+
+def card_thumb_path(card: dict, variant: str) -> str:
+    return f"thumbnail/chara_rip/{card['assetbundleName']}_{variant}.png"
+
+
+def can_train(card: dict) -> bool:
+    return card.get("cardRarityType") not in ("rarity_1", "rarity_2")
+
+
+def banner_path(gacha: dict) -> str:
+    return f"homebanner/{gacha['assetbundleName']}_rip/{gacha['assetbundleName']}.png"
+
+
+class PjskSnapshot:
+    __slots__ = ("repo", "commit", "loaded_at", "tables", "index")
+
+    def __init__(
+        self, repo: str, commit: str | None, tables: dict[str, ColumnTable], previous: PjskIndex | None = None
+    ):
+        self.repo = repo
+        self.commit = commit
+        self.loaded_at = time.monotonic()
+        self.tables = tables
+        # Built once per snapshot, so every lookup in the cogs is a dict hit.
+        # Given the previous index, unchanged tables and rows are carried over as-is.
+        self.index = PjskIndex(tables, previous)
+
+    def table(self, name: str) -> ColumnTable | None:
+        return self.tables.get(name)
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.loaded_at
+
+
+class PjskMasterStore:
+    def __init__(
+        self,
+        ttl: float = SNAPSHOT_TTL,
+        check_interval: float = COMMIT_CHECK_INTERVAL,
+        cache_dir: Path = MASTER_CACHE_DIR,
+    ):
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.cache_dir = Path(cache_dir)
+        self._snapshots: dict[str, PjskSnapshot] = {}
+        # repo -> {table: {"etag": ..., "last_modified": ...}, "commit": {...}}
+        self._validators: dict[str, dict[str, dict]] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._task: asyncio.Task | None = None
+        self._session: aiohttp.ClientSession | None = None
+        self._listeners: list[Callable[[str], None]] = []
+
+    @staticmethod
+    def repo_for(lang: str) -> str:
+        return REPO_MAP.get(lang, DEFAULT_REPO)
+
+    async def get_snapshot(self, lang: str) -> PjskSnapshot:
+        repo = self.repo_for(lang)
+        snapshot = self._snapshots.get(repo)
+        if snapshot is None:
+            snapshot = await self._load(repo)
+        return snapshot
+
+    def snapshot_for_repo(self, repo: str) -> PjskSnapshot | None:
+        return self._snapshots.get(repo)
+
+    async def refresh(self, repo: str):
+        commit = await self._fetch_commit(repo)
+
+        current = self._snapshots.get(repo)
+        if current is not None and current.age < self.ttl:
+            # Unknown commit (e.g. GitHub rate limit) only reloads once the TTL runs out
+            if commit is None or commit == current.commit:
+                return
+        await self._load(repo, commit=commit, force=True)
+
+    def add_listener(self, callback: Callable[[str], None]):
+        # Called with the repo name whenever a loaded snapshot is replaced
+        self._listeners.append(callback)
+
+    def start(self, session: aiohttp.ClientSession):
+        self._session = session
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            for repo in list(self._snapshots):
+                try:
+                    await self.refresh(repo)
+                except Exception as e:
+                    print(f"[pjsk_master] Refresh of {repo} failed: {e}")
+
+    async def _load(self, repo: str, commit: str | None = None, force: bool = False) -> PjskSnapshot:
+        lock = self._locks.setdefault(repo, asyncio.Lock())
+        async with lock:
+            # Someone else finished the load while we were waiting on the lock
+            if not force and repo in self._snapshots:
+                return self._snapshots[repo]
+
+            replaced = self._snapshots.get(repo)
+            # First load of this repo in the process, start from the copy on disk
+            current = replaced or await asyncio.to_thread(self._read_disk, repo)
+
+            if commit is None:
+                commit = await self._fetch_commit(repo)
+            base = RAW_BASE.format(repo=repo)
+            results = await asyncio.gather(
+                *(self._fetch_table(repo, name, f"{base}/{name}.json", current) for name in TABLES)
+            )
+
+            changed = {name: result for name, result in zip(TABLES, results) if result is not None}
+            if current is not None and not changed:
+                # Every table answered 304, keep the snapshot and its index as they are
+                current.commit = commit
+                current.loaded_at = time.monotonic()
+                self._snapshots[repo] = current
+                print(f"[pjsk_master] {repo} @ {(commit or 'unknown')[:7]} unchanged")
+                return current
+
+            # Column building and index construction are pure CPU, keep them off the loop
+            snapshot, changes = await asyncio.to_thread(
+                self._build_snapshot, repo, commit, current, {name: rows for name, (rows, _) in changed.items()}
+            )
+            validators = self._validators.setdefault(repo, {})
+            for name, (_, table_validators) in changed.items():
+                validators[name] = table_validators
+            self._snapshots[repo] = snapshot
+            await asyncio.to_thread(self._write_disk, repo, snapshot, list(changed))
+
+            summary = ", ".join(
+                f"{name} +{added} ~{updated} -{removed}"
+                for name, (added, updated, removed) in changes.items()
+                if added or updated or removed
+            )
+            print(f"[pjsk_master] Loaded {repo} @ {(commit or 'unknown')[:7]}" + (f" ({summary})" if summary else ""))
+            # A table re-served with a new ETag but identical rows is not worth invalidating caches for
+            if replaced is not None and (summary or len(changes) < len(changed)):
+                for callback in self._listeners:
+                    callback(repo)
+            return snapshot
+
+    @staticmethod
+    def _build_snapshot(
+        repo: str, commit: str | None, current: PjskSnapshot | None, changed: dict[str, list]
+    ) -> tuple[PjskSnapshot, dict[str, tuple[int, int, int]]]:
+        tables = dict(current.tables) if current is not None else {}
+        changes = {}
+        for name, rows in changed.items():
+            if name in tables:
+                tables[name], changes[name] = tables[name].patched(rows)
+            else:
+                tables[name] = build_table(name, rows)
+        # Unchanged tables are the same objects, so their reverse indexes carry over too
+        snapshot = PjskSnapshot(repo, commit, tables, current.index if current is not None else None)
+        return snapshot, changes
+
+    async def _fetch_table(
+        self, repo: str, name: str, url: str, current: PjskSnapshot | None
+    ) -> tuple[list, dict] | None:
+        # None means 304 Not Modified, the current rows are still valid
+        headers = {}
+        validators = self._validators.get(repo, {}).get(name, {}) if current is not None else {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+        async def get() -> tuple[list, dict] | None:
+            async with self._session.get(url, headers=headers) as resp:
+                if resp.status == 304:
+                    return None
+                resp.raise_for_status()
+                rows = await resp.json(content_type=None)
+                return rows, {"etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}
+
+        return await upstream.call_url(url, get)
+
+    async def _fetch_commit(self, repo: str) -> str | None:
+        url = COMMIT_URL.format(repo=repo)
+        headers = {"Accept": "application/vnd.github.sha"}
+        # Conditional requests answered with 304 do not count against GitHub's rate limit
+        known = self._validators.get(repo, {}).get("commit", {})
+        if known.get("etag"):
+            headers["If-None-Match"] = known["etag"]
+
+        async def get() -> str | None:
+            async with self._session.get(url, headers=headers) as resp:
+                if resp.status >= 500:
+                    resp.raise_for_status()
+                if resp.status == 304:
+                    return known.get("sha")
+                if resp.status != 200:
+                    return None
+                sha = (await resp.text()).strip()
+                self._validators.setdefault(repo, {})["commit"] = {"etag": resp.headers.get("ETag"), "sha": sha}
+                return sha
+
+        try:
+            return await upstream.call_url(url, get)
+        except (aiohttp.ClientError, asyncio.TimeoutError, upstream.UpstreamUnavailable):
+            return None
+
+    # ── On-disk copy ────────────────────────────────────────────────────────────
+    def _read_disk(self, repo: str) -> PjskSnapshot | None:
+        repo_dir = self.cache_dir / repo
+        try:
+            with open(repo_dir / "meta.json", "r", encoding="utf8") as f:
+                meta = json.load(f)
+            if meta.get("schemas") != SCHEMAS:
+                # Saved with other columns, the 304s would keep them stale, so start over
+                return None
+            tables = {}
+            for name in TABLES:
+                with open(repo_dir / f"{name}.json", "r", encoding="utf8") as f:
+                    tables[name] = build_table(name, json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"[pjsk_master] Ignoring unreadable cache of {repo}: {e}")
+            return None
+
+        validators = self._validators.setdefault(repo, {})
+        for name, table_validators in meta.get("tables", {}).items():
+            validators.setdefault(name, table_validators)
+        snapshot = PjskSnapshot(repo, meta.get("commit"), tables)
+        # Treat it as old, the conditional GETs right after decide what is still current
+        snapshot.loaded_at = 0.0
+        return snapshot
+
+    def _write_disk(self, repo: str, snapshot: PjskSnapshot, changed: list[str]):
+        repo_dir = self.cache_dir / repo
+        try:
+            repo_dir.mkdir(parents=True, exist_ok=True)
+            for name in changed:
+                self._write_json(repo_dir / f"{name}.json", snapshot.tables[name].to_rows())
+            validators = self._validators.get(repo, {})
+            meta = {
+                "commit": snapshot.commit,
+                "schemas": SCHEMAS,
+                "tables": {name: validators.get(name, {}) for name in TABLES},
+            }
+            # meta.json last, a crash in between only costs a full download next time
+            self._write_json(repo_dir / "meta.json", meta)
+        except OSError as e:
+            print(f"[pjsk_master] Could not save {repo} to disk: {e}")
+
+    @staticmethod
+    def _write_json(path: Path, data):
+        # Unique per writer, other processes may be saving the same repo
+        tmp_path = path.with_name(f"{path.name}.{secrets.token_hex(4)}.tmp")
+        with open(tmp_path, "w", encoding="utf8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
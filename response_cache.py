@@ -0,0 +1,78 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, NamedTuple
+
+import discord
+from discord.ext import commands
+
+from cdn_cache import Asset, reply_with_assets
+import metrics
+
+# ── Response cache configuration ────────────────────────────────────────────────
+MAX_ENTRIES = 1024
+RESPONSE_TTL = 15 * 60
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+class CachedResponse(NamedTuple):
+    embeds: list[dict]
+    assets: list[Asset]
+    expires: float
+
+    def build_embeds(self) -> list[discord.Embed]:
+        # Fresh objects every time, reply_with_assets() sets images on them
+        return [discord.Embed.from_dict(data) for data in self.embeds]
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES, ttl: float = RESPONSE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # (command, source, id, lang) -> CachedResponse, least recently used first
+        self._entries: OrderedDict[Hashable, CachedResponse] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, stale: bool = False) -> CachedResponse | None:
+        # Expired entries stay around until evicted, so they can stand in while an upstream is down
+        entry = self._entries.get(key)
+        if entry is None:
+            metrics.cache_event("response", "miss")
+            return None
+        expired = entry.expires <= time.monotonic()
+        if not stale and expired:
+            metrics.cache_event("response", "miss")
+            return None
+        metrics.cache_event("response", "stale" if expired else "hit")
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Hashable, embeds: list[discord.Embed], assets: list[Asset]):
+        # Assets are only references, the files live in the asset cache
+        self._entries[key] = CachedResponse(
+            [embed.to_dict() for embed in embeds],
+            list(assets),
+            time.monotonic() + self.ttl,
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            metrics.cache_event("response", "evict")
+
+    def invalidate(self, predicate: Callable[[tuple], bool]) -> int:
+        stale = [key for key in self._entries if predicate(key)]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        self._entries.clear()
+
+
+async def reply_from_cache(ctx: commands.Context, key: Hashable, stale: bool = False) -> bool:
+    cached = ctx.bot.response_cache.get(key, stale=stale)
+    if cached is None:
+        return False
+    await reply_with_assets(ctx, cached.build_embeds(), cached.assets)
+    return True
@@ -0,0 +1,536 @@
+import asyncio
+import itertools
+import math
+import unicodedata
+from typing import Callable, Hashable, Iterable, NamedTuple
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+import metrics
+from lang_settings import resolve_language
+from localisation import get_text
+from pjsk_master import REPO_MAP, PjskMasterStore
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:
+    # Optional, Chinese names are then only found by their characters, not by typing pinyin
+    lazy_pinyin = None
+
+# ── Search configuration ────────────────────────────────────────────────────────
+# Share of the query's bigrams a name must contain to count as a match
+MIN_COVERAGE = 0.6
+# Candidates listed when a query is ambiguous, slash autocomplete takes at most 25
+MAX_RESULTS = 10
+MAX_CHOICES = 25
+# Ties within a group of matches this small are ordered exactly (newest first), larger ones by insertion order
+SMALL_GROUP = 256
+# Bestdori keeps names per server in this order, same as _lang_to_index in the cogs
+BESTDORI_LANGS = ("JPN", "ENG", "CHT", "CHS", "KOR")
+FALLBACK_LANG = "ENG"
+# ────────────────────────────────────────────────────────────────────────────────
+
+KINDS = ("card", "character", "gacha")
+# Katakana folded onto hiragana, so either spelling finds the other
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+
+# (lang, label shown to users, text that gets indexed)
+Names = tuple[tuple[str, str, str], ...]
+
+
+class SearchHit(NamedTuple):
+    source: str      # "bestdori" or "pjsk"
+    id: int
+    label: str
+    exact: bool
+
+    @property
+    def token(self) -> str:
+        # What the command takes as its id argument
+        return f"pjsk{self.id}" if self.source == "pjsk" else str(self.id)
+
+
+def normalize(text: str) -> str:
+    # Full-width and half-width forms, case and katakana/hiragana all fold together, spaces and punctuation drop
+    text = unicodedata.normalize("NFKC", text).casefold().translate(_KATAKANA_TO_HIRAGANA)
+    return "".join(ch for ch in text if ch.isalnum())
+
+
+def _has_han(text: str) -> bool:
+    return any("一" <= ch <= "鿿" for ch in text)
+
+
+def variants(text: str) -> list[str]:
+    # Every spelling a name is indexed under
+    folded = normalize(text)
+    keys = [folded] if folded else []
+    if lazy_pinyin is not None and _has_han(folded):
+        pinyin = normalize("".join(lazy_pinyin(text)))
+        if pinyin and pinyin != folded:
+            keys.append(pinyin)
+    return keys
+
+
+def _doc_grams(text: str) -> set[str]:
+    # Single characters as well, so one-character queries (e.g. a kanji) still find something
+    grams = {text[i:i + 2] for i in range(len(text) - 1)}
+    grams.update(text)
+    return grams
+
+
+def _query_grams(text: str) -> set[str]:
+    if len(text) == 1:
+        return {text}
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def is_id(text: str) -> bool:
+    # What the cogs take as a plain id, anything else is searched by name
+    text = text.strip().lower()
+    return text.isdigit() or (text.startswith("pjsk") and text[4:].isdigit())
+
+
+def _tag(source: str, lang: str | None) -> str:
+    # PJSK names are tagged per master repo, the cogs only look ids up in the user's region
+    return source if lang is None else f"{source}:{PjskMasterStore.repo_for(lang)}"
+
+
+def split_source(text: str) -> tuple[str | None, str]:
+    # "pjsk miku" only searches Project Sekai data, like the pjsk<ID> prefix
+    text = text.strip()
+    if text[:5].lower() == "pjsk ":
+        return "pjsk", text[5:].strip()
+    return None, text
+
+
+def _bitmap(slots: Iterable[int]) -> int:
+    # One int with a bit per doc slot, built in one go rather than one big-int OR per slot
+    slots = list(slots)
+    if not slots:
+        return 0
+    bits = bytearray((max(slots) >> 3) + 1)
+    for slot in slots:
+        bits[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(bits, "little")
+
+
+def _count_planes(bitmaps: Iterable[int]) -> list[int]:
+    # Per-slot counts of how many bitmaps have that slot set, as binary digit planes (bit-sliced adder)
+    planes = []
+    for carry in bitmaps:
+        for j in range(len(planes)):
+            if not carry:
+                break
+            planes[j], carry = planes[j] ^ carry, planes[j] & carry
+        if carry:
+            planes.append(carry)
+    return planes
+
+
+def _at_least(planes: list[int], value: int, scope: int) -> int:
+    # Slots in scope whose count is >= value, comparing the digit planes from the top
+    greater = 0
+    equal = scope
+    for j in range(max(len(planes), value.bit_length()) - 1, -1, -1):
+        plane = planes[j] if j < len(planes) else 0
+        if value >> j & 1:
+            equal &= plane
+        else:
+            greater |= equal & plane
+            equal &= ~plane
+    return greater | equal
+
+
+def _slots(bitmap: int) -> Iterable[int]:
+    # Highest slot first
+    while bitmap:
+        slot = bitmap.bit_length() - 1
+        yield slot
+        bitmap ^= 1 << slot
+
+
+class NgramIndex:
+    # Inverted n-gram index over normalized names. Postings are bitmaps (Python ints, one bit per doc slot),
+    # so intersecting and counting them runs in C no matter how common a gram is.
+    def __init__(self):
+        self._postings: dict[str, int] = {}
+        # Secondary bitmaps used for ranking and filtering
+        self._exact: dict[str, int] = {}
+        self._lengths: dict[int, int] = {}
+        self._tags: dict[str, int] = {}
+        self._families = {"gram": self._postings, "exact": self._exact, "length": self._lengths, "tag": self._tags}
+        # slot -> (entity, normalized text, tag), None for a free slot
+        self._docs: list[tuple[Hashable, str, str] | None] = []
+        self._free: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self._docs) - len(self._free)
+
+    @staticmethod
+    def _keys(text: str, tag: str) -> list[tuple[str, Hashable]]:
+        # Every (family, key) bitmap a doc is listed in
+        keys = [("gram", gram) for gram in _doc_grams(text)]
+        keys += [("exact", text), ("length", len(text)), ("tag", tag)]
+        return keys
+
+    def _update(self, grouped: dict[tuple[str, Hashable], list[int]], add: bool):
+        for (family, key), group in grouped.items():
+            bitmaps = self._families[family]
+            if add:
+                bitmaps[key] = bitmaps.get(key, 0) | _bitmap(group)
+                continue
+            remaining = bitmaps.get(key, 0) & ~_bitmap(group)
+            if remaining:
+                bitmaps[key] = remaining
+            else:
+                bitmaps.pop(key, None)
+
+    def add_many(self, docs: list[tuple[Hashable, str, str]]) -> list[int]:
+        # docs are (entity, normalized text, tag), e.g. the source the entity comes from
+        slots = []
+        grouped: dict[tuple[str, Hashable], list[int]] = {}
+        for entity, text, tag in docs:
+            slot = self._free.pop() if self._free else len(self._docs)
+            if slot == len(self._docs):
+                self._docs.append(None)
+            self._docs[slot] = (entity, text, tag)
+            slots.append(slot)
+            for key in self._keys(text, tag):
+                grouped.setdefault(key, []).append(slot)
+        self._update(grouped, add=True)
+        return slots
+
+    def remove_many(self, slots: list[int]):
+        grouped: dict[tuple[str, Hashable], list[int]] = {}
+        for slot in slots:
+            _, text, tag = self._docs[slot]
+            self._docs[slot] = None
+            self._free.append(slot)
+            for key in self._keys(text, tag):
+                grouped.setdefault(key, []).append(slot)
+        self._update(grouped, add=False)
+
+    def _groups(self, docs: int, text: str) -> Iterable[int]:
+        # Exact matches first, then shorter names before longer ones
+        exact = self._exact.get(text, 0) & docs
+        if exact:
+            yield exact
+            docs &= ~exact
+        for length in sorted(self._lengths):
+            if not docs:
+                return
+            group = docs & self._lengths[length]
+            if group:
+                yield group
+                docs &= ~group
+
+    def query(self, text: str, limit: int, tags: Iterable[str] | None = None) -> list[tuple[Hashable, bool]]:
+        grams = _query_grams(text)
+        planes = _count_planes(self._postings.get(gram, 0) for gram in grams)
+        if tags is None:
+            scope = (1 << len(self._docs)) - 1
+        else:
+            scope = 0
+            for tag in tags:
+                scope |= self._tags.get(tag, 0)
+        needed = max(1, math.ceil(len(grams) * MIN_COVERAGE))
+
+        picked: dict[Hashable, tuple] = {}
+        above = 0
+        # Docs sharing the most grams with the query first
+        for level in range(len(grams), needed - 1, -1):
+            at_least = _at_least(planes, level, scope)
+            docs = at_least & ~above
+            above = at_least
+            for group in self._groups(docs, text):
+                slots = _slots(group)
+                if group.bit_count() <= SMALL_GROUP:
+                    # Few enough to order exactly, newest entity (highest id) first
+                    slots = sorted(slots, key=lambda slot: self._docs[slot][0][1], reverse=True)
+                for slot in slots:
+                    entity, doc_text, _ = self._docs[slot]
+                    if entity in picked:
+                        continue
+                    picked[entity] = (
+                        level, doc_text == text, doc_text.startswith(text), text in doc_text, -len(doc_text)
+                    )
+                    if len(picked) >= limit:
+                        return self._ranked(picked)
+        return self._ranked(picked)
+
+    @staticmethod
+    def _ranked(picked: dict[Hashable, tuple]) -> list[tuple[Hashable, bool]]:
+        # Prefix and substring matches move ahead of names that merely share the query's grams
+        ranked = sorted(picked.items(), key=lambda item: item[1], reverse=True)
+        return [(entity, rank[1]) for entity, rank in ranked]
+
+
+# ── Name extraction, runs in a worker thread ────────────────────────────────────
+def _pick(names: list | None, i: int) -> str | None:
+    return names[i] if names and len(names) > i and names[i] else None
+
+
+def _bestdori_names(directory: dict, field: str, characters: dict | None = None) -> dict[int, Names]:
+    entries = {}
+    for entry_id, entry in directory.items():
+        names = []
+        for i, lang in enumerate(BESTDORI_LANGS):
+            name = _pick(entry.get(field), i)
+            if name is None:
+                continue
+            if characters is not None:
+                # Cards are found by their title and by who is on them
+                character = characters.get(str(entry.get("characterId")), {})
+                char_name = _pick(character.get("characterName"), i)
+                if char_name:
+                    names.append((lang, f"{name} ({char_name})", f"{char_name} {name}"))
+                    continue
+            names.append((lang, name, name))
+        if names:
+            entries[int(entry_id)] = tuple(names)
+    return entries
+
+
+def _pjsk_names(kind: str, lang: str, snapshot) -> dict[int, Names]:
+    index = snapshot.index
+    entries = {}
+    if kind == "card":
+        for card in snapshot.table("cards").records():
+            prefix = card.get("prefix")
+            if prefix:
+                char_name = index.character_name(card.get("characterId"), "")
+                label = f"{prefix} ({char_name})" if char_name else prefix
+                entries[card["id"]] = ((lang, label, f"{char_name} {prefix}"),)
+    elif kind == "character":
+        for char in snapshot.table("gameCharacters").records():
+            name = index.character_name(char["id"], "")
+            if name:
+                # Given name first as well, both orders are in common use
+                reverse = f"{char.get('givenName', '')} {char.get('firstName', '')}"
+                entries[char["id"]] = ((lang, name, name), (lang, name, reverse))
+    else:
+        for gacha in snapshot.table("gachas").records():
+            name = gacha.get("name")
+            if name:
+                entries[gacha["id"]] = ((lang, name, name),)
+    return entries
+
+
+def _prepare(entries: dict[int, Names]) -> dict[int, tuple[Names, list[str]]]:
+    # Normalization (and pinyin) is the slow part, done here so applying the update on the loop is just set operations
+    return {
+        entry_id: (names, list(dict.fromkeys(key for _, _, text in names for key in variants(text))))
+        for entry_id, names in entries.items()
+    }
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+class SearchIndex:
+    # Names of cards, characters and gachas from the Bestdori directories and the PJSK master tables,
+    # in every language that is loaded. Kept up to date by diffing each source when it is replaced.
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self._indexes = {kind: NgramIndex() for kind in KINDS}
+        # (kind, source, id) -> lang -> label
+        self._labels: dict[tuple[str, str, int], dict[str, str]] = {}
+        # segment -> the source objects it was built from, compared by identity
+        self._built_from: dict[tuple, tuple] = {}
+        # segment -> id -> (names, doc slots)
+        self._segments: dict[tuple, dict[int, tuple[Names, list[int]]]] = {}
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._started = False
+
+    def start(self):
+        if self._started:
+            return
+        self._started = True
+        self.bot.pjsk_master.add_listener(lambda repo: self._schedule())
+        for directory in (self.bot.character_directory, self.bot.card_directory, self.bot.gacha_directory):
+            directory.add_listener(self._schedule)
+        self._task = asyncio.create_task(self._initial_load())
+
+    async def close(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _initial_load(self):
+        results = await asyncio.gather(
+            self.bot.character_directory.get(),
+            self.bot.card_directory.get(),
+            self.bot.gacha_directory.get(),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"[search_index] Directory load failed: {result}")
+        await self.refresh()
+
+    def _schedule(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.refresh())
+
+    def _sources(self) -> dict[tuple, tuple[Callable, tuple, tuple]]:
+        # segment -> (extractor, its arguments, the objects it reads), only what is already in memory
+        sources = {}
+        characters = self.bot.character_directory.data
+        cards = self.bot.card_directory.data
+        gachas = self.bot.gacha_directory.data
+        if characters is not None:
+            sources[("character", "bestdori", None)] = (_bestdori_names, (characters, "characterName"), (characters,))
+            if cards is not None:
+                sources[("card", "bestdori", None)] = (
+                    _bestdori_names, (cards, "prefix", characters), (cards, characters)
+                )
+        if gachas is not None:
+            sources[("gacha", "bestdori", None)] = (_bestdori_names, (gachas, "gachaName"), (gachas,))
+
+        for lang, repo in REPO_MAP.items():
+            snapshot = self.bot.pjsk_master.snapshot_for_repo(repo)
+            if snapshot is None:
+                continue
+            # Unchanged tables are carried over into the next snapshot as the same objects
+            tables = {
+                "card": (snapshot.table("cards"), snapshot.table("gameCharacters")),
+                "character": (snapshot.table("gameCharacters"),),
+                "gacha": (snapshot.table("gachas"),),
+            }
+            for kind in KINDS:
+                if all(table is not None for table in tables[kind]):
+                    sources[(kind, "pjsk", lang)] = (_pjsk_names, (kind, lang, snapshot), tables[kind])
+        return sources
+
+    def _is_current(self, segment: tuple, objects: tuple) -> bool:
+        built_from = self._built_from.get(segment)
+        return built_from is not None and all(a is b for a, b in zip(built_from, objects))
+
+    def _stale(self) -> bool:
+        sources = self._sources()
+        return any(not self._is_current(segment, objects) for segment, (_, _, objects) in sources.items())
+
+    async def refresh(self):
+        async with self._lock:
+            for segment, (extract, args, objects) in self._sources().items():
+                if self._is_current(segment, objects):
+                    continue
+                try:
+                    await self._refresh_segment(segment, extract, args)
+                except Exception as e:
+                    # Searches keep using what was indexed before, retried when the source changes again
+                    print(f"[search_index] Indexing {'/'.join(filter(None, segment))} failed: {e}")
+                self._built_from[segment] = objects
+
+    async def _refresh_segment(self, segment: tuple, extract: Callable, args: tuple):
+        entries = await asyncio.to_thread(extract, *args)
+        current = self._segments.get(segment, {})
+        changed = {
+            entry_id: names for entry_id, names in entries.items()
+            if entry_id not in current or current[entry_id][0] != names
+        }
+        prepared = await asyncio.to_thread(_prepare, changed)
+        removed = [entry_id for entry_id in current if entry_id not in entries]
+        self._apply(segment, prepared, removed)
+        kind = segment[0]
+        print(
+            f"[search_index] {'/'.join(filter(None, segment))}: "
+            f"+{len(prepared)} -{len(removed)} ({len(self._indexes[kind])} names indexed)"
+        )
+
+    def _apply(self, segment: tuple, prepared: dict[int, tuple[Names, list[str]]], removed: list[int]):
+        kind, source, lang = segment
+        index = self._indexes[kind]
+        current = self._segments.setdefault(segment, {})
+        stale_slots = []
+        for entry_id in itertools.chain(removed, prepared):
+            old = current.pop(entry_id, None)
+            if old is None:
+                continue
+            stale_slots.extend(old[1])
+            labels = self._labels.get((kind, source, entry_id), {})
+            for lang, _, _ in old[0]:
+                labels.pop(lang, None)
+            if not labels:
+                self._labels.pop((kind, source, entry_id), None)
+        index.remove_many(stale_slots)
+
+        # In id order, so slots of a fresh build follow ids (the tie-break for large groups of matches)
+        entry_ids = sorted(prepared)
+        tag = _tag(source, lang)
+        slots = iter(index.add_many([
+            ((source, entry_id), key, tag) for entry_id in entry_ids for key in prepared[entry_id][1]
+        ]))
+        for entry_id in entry_ids:
+            names, keys = prepared[entry_id]
+            current[entry_id] = (names, [next(slots) for _ in keys])
+            labels = self._labels.setdefault((kind, source, entry_id), {})
+            for lang, label, _ in names:
+                labels.setdefault(lang, label)
+
+    def _label(self, kind: str, source: str, entry_id: int, lang: str) -> str:
+        labels = self._labels.get((kind, source, entry_id)) or {}
+        return labels.get(lang) or labels.get(FALLBACK_LANG) or next(iter(labels.values()), str(entry_id))
+
+    def search(self, query: str, kind: str, lang: str, source: str | None = None, limit: int = MAX_RESULTS) -> list[SearchHit]:
+        if self._started and self._stale():
+            # e.g. a PJSK region loaded for the first time, its listeners only fire on replacement
+            self._schedule()
+        text = normalize(query)
+        if not text:
+            return []
+        # PJSK hits only from the user's region, another region may not have the id or use it for something else
+        tags = [_tag("bestdori", None), _tag("pjsk", lang)]
+        if source is not None:
+            tags = [tag for tag in tags if tag.split(":", 1)[0] == source]
+        with metrics.timer("bot_search_seconds", kind=kind):
+            matches = self._indexes[kind].query(text, limit, tags)
+        return [
+            SearchHit(entity_source, entry_id, self._label(kind, entity_source, entry_id, lang), exact)
+            for (entity_source, entry_id), exact in matches
+        ]
+
+
+# ── Cog helpers ─────────────────────────────────────────────────────────────────
+async def resolve_query(ctx: commands.Context, lang: str, kind: str, text: str) -> str | None:
+    # Ids pass straight through. A name resolves to the id of its one clear match,
+    # otherwise the candidates are listed and None tells the cog there is nothing left to do.
+    leading = text.split(maxsplit=1)
+    if leading and is_id(leading[0]):
+        # Words after an id are ignored, as when the argument was a single word
+        return leading[0]
+    source, query = split_source(text)
+    hits = ctx.bot.search.search(query, kind, lang, source)
+    if not hits:
+        await ctx.reply(get_text(lang, "search", "NO_MATCH", QUERY=query))
+        return None
+    exact = [hit for hit in hits if hit.exact]
+    if len(hits) == 1 or len(exact) == 1:
+        return (exact or hits)[0].token
+
+    lines = [f"`{hit.token}` {hit.label}" for hit in hits]
+    embed = discord.Embed(
+        title=get_text(lang, "search", "RESULTS_TITLE", QUERY=query),
+        description="\n".join(lines),
+        color=0x00AAFF,
+    )
+    embed.set_footer(text=get_text(lang, "search", "RESULTS_FOOTER", COMMAND=f"{ctx.prefix}{ctx.invoked_with}"))
+    await ctx.reply(embed=embed)
+    return None
+
+
+def autocomplete_choices(bot: commands.Bot, interaction: discord.Interaction, kind: str, current: str) -> list[app_commands.Choice[str]]:
+    if not current.strip() or is_id(current):
+        return []
+    lang = resolve_language(interaction.guild_id, interaction.user.id)
+    source, query = split_source(current)
+    choices = []
+    for hit in bot.search.search(query, kind, lang, source, MAX_CHOICES):
+        tag = "PJSK " if hit.source == "pjsk" else ""
+        # Choice names are capped at 100 characters
+        choices.append(app_commands.Choice(name=f"{tag}#{hit.id} {hit.label}"[:100], value=hit.token))
+    return choices
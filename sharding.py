@@ -0,0 +1,221 @@
+import asyncio
+import json
+import math
+import os
+import secrets
+import time
+from collections import Counter
+from pathlib import Path
+
+import discord
+from discord.ext import commands
+
+import lang_settings
+
+# ── Sharding configuration ──────────────────────────────────────────────────────
+# BOT_SHARD_COUNT: unset = one gateway connection (plain commands.Bot),
+#                  "auto" = as many shards as Discord recommends, a number = that many shards in total
+# BOT_SHARD_IDS:   shards this process runs, e.g. "0,1" or "2-3" (default: all of them).
+#                  Split the ids over several processes to run them side by side on one machine.
+SHARD_COUNT = os.environ.get("BOT_SHARD_COUNT", "").strip().lower()
+SHARD_IDS = os.environ.get("BOT_SHARD_IDS", "").strip()
+
+METRICS_INTERVAL = 60
+METRICS_DIR = Path(__file__).parent / "cache" / "shards"
+# Processes only share state through the on-disk stores, pick up the other shards' writes this often
+SHARED_SYNC_INTERVAL = 60
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+def _parse_ids(value: str) -> list[int] | None:
+    if not value:
+        return None
+    ids = []
+    for part in value.split(","):
+        part = part.strip()
+        if "-" in part:
+            start, end = part.split("-", 1)
+            ids.extend(range(int(start), int(end) + 1))
+        elif part:
+            ids.append(int(part))
+    return sorted(set(ids))
+
+
+def bot_options(count: str = SHARD_COUNT, ids: str = SHARD_IDS) -> tuple[type[commands.Bot], dict]:
+    shard_ids = _parse_ids(ids)
+    if not count:
+        if shard_ids is not None:
+            raise ValueError("BOT_SHARD_IDS needs BOT_SHARD_COUNT to be set as well")
+        return commands.Bot, {}
+    if count == "auto":
+        if shard_ids is not None:
+            raise ValueError("BOT_SHARD_IDS needs an explicit BOT_SHARD_COUNT, not 'auto'")
+        return commands.AutoShardedBot, {}
+
+    shard_count = int(count)
+    if shard_ids is not None and not all(0 <= shard_id < shard_count for shard_id in shard_ids):
+        raise ValueError(f"BOT_SHARD_IDS {shard_ids} out of range for {shard_count} shards")
+    return commands.AutoShardedBot, {"shard_count": shard_count, "shard_ids": shard_ids}
+
+
+def local_shards(bot: commands.Bot) -> list[int]:
+    if isinstance(bot, commands.AutoShardedBot):
+        return sorted(bot.shards) if bot.shards else list(bot.shard_ids or range(bot.shard_count or 1))
+    return [bot.shard_id or 0]
+
+
+def is_primary(bot: commands.Bot) -> bool:
+    # The process running shard 0 does the once-per-deployment work (e.g. slash command sync)
+    return 0 in local_shards(bot)
+
+
+def is_split(bot: commands.Bot) -> bool:
+    # Only some of the shards live in this process, the rest run elsewhere
+    return isinstance(bot, commands.AutoShardedBot) and bot.shard_ids is not None
+
+
+class ShardMetrics:
+    def __init__(self, bot: commands.Bot, interval: float = METRICS_INTERVAL, directory: Path = METRICS_DIR):
+        self.bot = bot
+        self.interval = interval
+        self.directory = Path(directory)
+        # shard id -> count since the last report
+        self._messages: Counter[int] = Counter()
+        self._interactions: Counter[int] = Counter()
+        # The gateway does not say which shard an event came in on, counted per process
+        self._gateway_events = 0
+        self._since = time.monotonic()
+        self._last: dict[int, dict] = {}
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self.bot.add_listener(self._on_message, "on_message")
+        self.bot.add_listener(self._on_interaction, "on_interaction")
+        self.bot.add_listener(self._on_socket_event_type, "on_socket_event_type")
+        self.bot.add_listener(self._on_shard_ready, "on_shard_ready")
+        self.bot.add_listener(self._on_shard_disconnect, "on_shard_disconnect")
+        if self._task is None:
+            self._task = asyncio.create_task(self._report_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> dict[int, dict]:
+        # Last report per shard, see _report()
+        return dict(self._last)
+
+    @staticmethod
+    def _shard_of(guild: discord.Guild | None) -> int:
+        # DMs always arrive on shard 0
+        return guild.shard_id if guild is not None else 0
+
+    async def _on_message(self, message: discord.Message):
+        self._messages[self._shard_of(message.guild)] += 1
+
+    async def _on_interaction(self, interaction: discord.Interaction):
+        self._interactions[self._shard_of(interaction.guild)] += 1
+
+    async def _on_socket_event_type(self, event_type: str):
+        self._gateway_events += 1
+
+    async def _on_shard_ready(self, shard_id: int):
+        print(f"[sharding] Shard {shard_id} ready")
+
+    async def _on_shard_disconnect(self, shard_id: int):
+        print(f"[sharding] Shard {shard_id} disconnected")
+
+    def latencies(self) -> dict[int, float]:
+        if isinstance(self.bot, commands.AutoShardedBot):
+            return dict(self.bot.latencies)
+        return {self.bot.shard_id or 0: self.bot.latency}
+
+    async def _report_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self._report()
+            except Exception as e:
+                print(f"[sharding] Metrics report failed: {e}")
+
+    async def _report(self):
+        now = time.monotonic()
+        minutes = max(now - self._since, 1e-9) / 60
+        latencies = self.latencies()
+        gateway_rate = self._gateway_events / minutes
+
+        report = {}
+        for shard_id in local_shards(self.bot):
+            latency = latencies.get(shard_id, math.nan)
+            report[shard_id] = {
+                "shard_id": shard_id,
+                "shard_count": self.bot.shard_count or 1,
+                "pid": os.getpid(),
+                # nan/inf until the shard has sent its first heartbeat
+                "latency_ms": round(latency * 1000, 1) if math.isfinite(latency) else None,
+                "messages_per_min": round(self._messages[shard_id] / minutes, 2),
+                "interactions_per_min": round(self._interactions[shard_id] / minutes, 2),
+                "process_gateway_events_per_min": round(gateway_rate, 2),
+                "updated_at": time.time(),
+            }
+        self._messages.clear()
+        self._interactions.clear()
+        self._gateway_events = 0
+        self._since = now
+        self._last = report
+
+        for shard_id, stats in report.items():
+            latency = "n/a" if stats["latency_ms"] is None else f"{stats['latency_ms']:.0f} ms"
+            print(
+                f"[sharding] Shard {shard_id}: {latency}, {stats['messages_per_min']:.1f} msg/min, "
+                f"{stats['interactions_per_min']:.1f} interactions/min"
+            )
+        # One file per shard, so every process on the machine can be read from one place
+        await asyncio.to_thread(self._write, report)
+
+    def _write(self, report: dict[int, dict]):
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            for shard_id, stats in report.items():
+                path = self.directory / f"shard_{shard_id}.json"
+                tmp_path = path.with_name(f"{path.name}.{secrets.token_hex(4)}.tmp")
+                with open(tmp_path, "w", encoding="utf8") as f:
+                    json.dump(stats, f)
+                os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[sharding] Could not write shard metrics: {e}")
+
+
+class SharedStateSync:
+    # With shards split over processes, each one re-reads what the others wrote to the shared stores
+    def __init__(self, bot: commands.Bot, interval: float = SHARED_SYNC_INTERVAL):
+        self.bot = bot
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None and is_split(self.bot):
+            self._task = asyncio.create_task(self._sync_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await lang_settings.reload()
+                await self.bot.cdn_urls.reload()
+            except Exception as e:
+                print(f"[sharding] Shared state sync failed: {e}")
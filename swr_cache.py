@@ -0,0 +1,141 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, NamedTuple
+
+import metrics
+from singleflight import SingleFlight
+import upstream
+
+# ── Stale-while-revalidate configuration ────────────────────────────────────────
+# Past the soft TTL a lookup still answers from memory and refreshes in the background,
+# only past the hard TTL does the caller wait for the source again
+SOFT_TTL = 10 * 60
+HARD_TTL = 24 * 60 * 60
+MAX_ENTRIES = 2048
+# Past the hard TTL, the source gets the command's deadline minus this much,
+# the rest is left for answering with the old value instead
+FALLBACK_MARGIN = 0.5
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+def _consume_error(task: asyncio.Future):
+    # A load that outlived its caller fails unobserved, keep asyncio from warning about it
+    if not task.cancelled():
+        task.exception()
+
+
+def complete(value: dict) -> bool:
+    # keep= for the cogs' data dicts, "partial" marks one that lost an image to a temporary failure
+    return not value.get("partial")
+
+
+class _Entry(NamedTuple):
+    value: Any
+    fetched_at: float
+
+
+class SwrCache:
+    def __init__(
+        self,
+        single_flight: SingleFlight,
+        soft_ttl: float = SOFT_TTL,
+        hard_ttl: float = HARD_TTL,
+        max_entries: int = MAX_ENTRIES,
+    ):
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.max_entries = max_entries
+        self._single_flight = single_flight
+        # key -> _Entry, least recently used first
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._refreshing: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(
+        self, key: Hashable, loader: Callable[[], Awaitable[Any]], keep: Callable[[Any], bool] | None = None
+    ) -> Any:
+        # keep(value) False hands the value to the caller without storing it, e.g. a reply missing an image
+        with metrics.phase("fetch"):
+            return await self._get(key, loader, keep)
+
+    async def _get(self, key: Hashable, loader: Callable[[], Awaitable[Any]], keep: Callable[[Any], bool] | None) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.fetched_at
+            if age < self.hard_ttl:
+                self._entries.move_to_end(key)
+                if age >= self.soft_ttl:
+                    metrics.cache_event("game_data", "stale")
+                    self._revalidate(key, loader, keep)
+                else:
+                    metrics.cache_event("game_data", "hit")
+                return entry.value
+
+        metrics.cache_event("game_data", "miss")
+        if entry is None:
+            return await self._load(key, loader, keep)
+
+        # The caller's with_deadline() cancels this coroutine when the budget runs out, so the wait has to
+        # end a little earlier here for the old value to still be returned. The load itself carries on.
+        load = asyncio.ensure_future(self._detached_load(key, loader, keep))
+        load.add_done_callback(_consume_error)
+        self._refreshing.add(load)
+        load.add_done_callback(self._refreshing.discard)
+        left = upstream.remaining()
+        try:
+            if left is None:
+                return await asyncio.shield(load)
+            return await asyncio.wait_for(asyncio.shield(load), max(left - FALLBACK_MARGIN, 0))
+        except (upstream.UpstreamUnavailable, asyncio.TimeoutError):
+            # Past the hard TTL but the source is down or slow, old data still beats no answer
+            print(f"[swr_cache] Serving {key} past its hard TTL, source unavailable")
+            return entry.value
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        stale = [key for key in self._entries if predicate(key)]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        self._entries.clear()
+
+    async def close(self):
+        for task in list(self._refreshing):
+            task.cancel()
+        await asyncio.gather(*self._refreshing, return_exceptions=True)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], keep: Callable[[Any], bool] | None) -> Any:
+        value = await self._single_flight.do(key, loader)
+        if keep is not None and not keep(value):
+            return value
+        self._entries[key] = _Entry(value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            metrics.cache_event("game_data", "evict")
+        return value
+
+    async def _detached_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], keep: Callable[[Any], bool] | None) -> Any:
+        # Outlives the caller's wait, so it must not inherit the caller's deadline either
+        upstream.clear_deadline()
+        return await self._load(key, loader, keep)
+
+    def _revalidate(self, key: Hashable, loader: Callable[[], Awaitable[Any]], keep: Callable[[Any], bool] | None):
+        if key in self._single_flight:
+            return
+        task = asyncio.create_task(self._refresh(key, loader, keep))
+        self._refreshing.add(task)
+        task.add_done_callback(self._refreshing.discard)
+
+    async def _refresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]], keep: Callable[[Any], bool] | None):
+        # The command that triggered this has already answered, its deadline does not apply
+        upstream.clear_deadline()
+        try:
+            await self._load(key, loader, keep)
+        except Exception as e:
+            # Keep serving the current value, the next lookup past the soft TTL tries again
+            print(f"[swr_cache] Background refresh of {key} failed: {e}")
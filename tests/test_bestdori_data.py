@@ -0,0 +1,48 @@
+import asyncio
+from types import ModuleType
+
+import bestdori_data
+
+
+def _fake_module() -> ModuleType:
+    module = ModuleType("fake_bestdori")
+
+    def get_all():
+        return "data"
+
+    async def get_all_async():
+        return "data"
+
+    module.get_all = get_all
+    module.get_all_async = get_all_async
+    return module
+
+
+def test_blocking_calls_are_reported_once_per_call_site(capsys):
+    module = _fake_module()
+
+    async def run():
+        bestdori_data.install_blocking_guard(asyncio.get_running_loop(), [module])
+        for _ in range(3):
+            assert module.get_all() == "data"
+        module.get_all()
+        # Off the loop, e.g. through call_bestdori()'s thread fallback, nothing is reported
+        assert await asyncio.to_thread(module.get_all) == "data"
+
+    asyncio.run(run())
+    reports = [line for line in capsys.readouterr().out.splitlines() if "Blocking call fake_bestdori.get_all()" in line]
+    assert len(reports) == 2
+
+
+def test_guard_leaves_async_twins_alone():
+    module = _fake_module()
+    async_twin = module.get_all_async
+
+    async def run():
+        bestdori_data.install_blocking_guard(asyncio.get_running_loop(), [module])
+        bestdori_data.install_blocking_guard(asyncio.get_running_loop(), [module])
+        assert module.get_all_async is async_twin
+        assert module.get_all.__wrapped__.__name__ == "get_all"
+        assert await bestdori_data.call_bestdori(module.get_all) == "data"
+
+    asyncio.run(run())
@@ -0,0 +1,91 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+
+import cdn_cache
+import upstream
+
+
+class _FailingAssets:
+    async def fetch_url(self, source, path, url):
+        raise upstream.UpstreamUnavailable("assets.test")
+
+
+def test_attach_skips_images_the_source_cannot_send_right_now(tmp_path):
+    bot = SimpleNamespace(cdn_urls=cdn_cache.CdnUrlCache(tmp_path / "cdn_urls.json"), asset_cache=_FailingAssets())
+    embeds = [discord.Embed(title="card")]
+    asset = cdn_cache.Asset("sekai", "card/1.png", "card_1.png", url="https://assets.test/card/1.png")
+
+    files, uploaded = asyncio.run(cdn_cache._attach(bot, embeds, [asset]))
+    assert files == [] and uploaded == {}
+    assert embeds[0].image.url is None
+
+
+def test_edit_forgets_the_urls_of_the_attachments_it_replaces(tmp_path):
+    async def run():
+        cdn = cdn_cache.CdnUrlCache(tmp_path / "cdn_urls.json")
+        cdn.remember("bestdori", "card/1/thumb/normal", "https://cdn.discordapp.com/attachments/1/2/card_1_thumb.png?ex=7fffffff&hm=a")
+        cdn.remember("bestdori", "card/2/thumb/normal", "https://cdn.discordapp.com/attachments/1/3/card_2_thumb.png?ex=7fffffff&hm=b")
+
+        async def edit(**kwargs):
+            return message
+
+        # Discord signs the url anew in every payload, only the path identifies the attachment
+        attachment = SimpleNamespace(url="https://cdn.discordapp.com/attachments/1/2/card_1_thumb.png?ex=7fffffff&hm=c")
+        message = SimpleNamespace(attachments=[attachment], edit=edit)
+        bot = SimpleNamespace(cdn_urls=cdn, asset_cache=_FailingAssets())
+        await cdn_cache.edit_with_assets(bot, message, [discord.Embed(title="page 2")], [])
+
+        assert await cdn.get("bestdori", "card/1/thumb/normal") is None
+        assert await cdn.get("bestdori", "card/2/thumb/normal") is not None
+        await cdn.close()
+
+    asyncio.run(run())
+
+
+class _FakeSession:
+    def __init__(self, status: int):
+        self.status = status
+        self.requests = []
+
+    def head(self, url, **kwargs):
+        self.requests.append(url)
+        response = SimpleNamespace(status=self.status)
+
+        class _Context:
+            async def __aenter__(self):
+                return response
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return _Context()
+
+
+def test_old_urls_are_checked_before_reuse(tmp_path):
+    async def run():
+        session = _FakeSession(404)
+        cdn = cdn_cache.CdnUrlCache(tmp_path / "cdn_urls.json")
+        await cdn.start(session)
+        cdn.remember("sekai", "card/1.png", "https://cdn.discordapp.com/attachments/1/2/card_1.png?ex=7fffffff")
+        cdn.remember("sekai", "card/2.png", "https://cdn.discordapp.com/attachments/1/3/card_2.png?ex=7fffffff")
+
+        # Just uploaded, trusted without a request
+        assert await cdn.get("sekai", "card/1.png") is not None
+        assert session.requests == []
+
+        # The message holding the attachment was deleted since
+        cdn._urls["sekai:card/1.png"]["checked"] -= cdn_cache.VERIFY_AFTER
+        assert await cdn.get("sekai", "card/1.png") is None
+        assert await cdn.get("sekai", "card/1.png") is None
+        assert len(session.requests) == 1
+
+        session.status = 200
+        cdn._urls["sekai:card/2.png"]["checked"] -= cdn_cache.VERIFY_AFTER
+        assert await cdn.get("sekai", "card/2.png") is not None
+        assert await cdn.get("sekai", "card/2.png") is not None
+        assert len(session.requests) == 2
+        await cdn.close()
+
+    asyncio.run(run())
@@ -0,0 +1,25 @@
+import asyncio
+
+import bestdori.exceptions
+
+from commands import gacha
+from swr_cache import complete
+
+
+def test_banner_not_on_server_is_a_complete_answer(monkeypatch):
+    info = {"gachaName": ["ガチャ", "Gacha"], "publishedAt": ["1", None]}
+
+    async def call_bestdori(func, *args):
+        if func.__name__ == "get_info_async":
+            return info
+        raise bestdori.exceptions.ServerNotAvailableError("Gacha 'Gacha'", *args)
+
+    async def resolve_asset(bot, source, path, filename, loader=None, **kwargs):
+        return await loader()
+
+    monkeypatch.setattr(gacha, "call_bestdori", call_bestdori)
+    monkeypatch.setattr(gacha, "resolve_asset", resolve_asset)
+
+    data = asyncio.run(gacha.GachaCog(bot=None)._get_bestdori_gacha(1, "en"))
+    assert data["banner"] is None
+    assert complete(data)
@@ -0,0 +1,17 @@
+import asyncio
+
+import cdn_cache
+import image_render
+from singleflight import SingleFlight
+
+
+class _FailingAssets:
+    async def fetch_url(self, source, path, url):
+        raise asyncio.TimeoutError()
+
+
+def test_render_falls_back_when_an_input_cannot_be_fetched(tmp_path):
+    renderer = image_render.ImageRenderer(_FailingAssets(), cdn_cache.CdnUrlCache(tmp_path / "cdn_urls.json"), SingleFlight())
+    asset = cdn_cache.Asset("sekai", "card/1.png", "card_1.png", url="https://assets.test/card/1.png")
+
+    assert asyncio.run(renderer._render("card/sekai/1/normal@1024.webp", [asset])) is False
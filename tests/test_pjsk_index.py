@@ -0,0 +1,71 @@
+from pjsk_index import PjskIndex, build_table
+
+
+def _cards(count: int, moved: set = frozenset()) -> list[dict]:
+    return [
+        {
+            "id": card_id,
+            "characterId": (card_id * 7) % 26 + 1 + (100 if card_id in moved else 0),
+            "prefix": f"Card {card_id}",
+            "assetbundleName": f"res{card_id:03d}",
+            "cardRarityType": "rarity_4",
+        }
+        for card_id in range(1, count + 1)
+    ]
+
+
+def _gachas(count: int) -> list[dict]:
+    return [
+        {"id": gacha_id, "name": f"Gacha {gacha_id}", "gachaPickups": [{"cardId": gacha_id * 3 % 50 + 1}]}
+        for gacha_id in range(1, count + 1)
+    ]
+
+
+def _assert_same_index(patched: PjskIndex, cards: list[dict], gachas: list[dict]):
+    rebuilt = PjskIndex({"cards": build_table("cards", cards), "gachas": build_table("gachas", gachas)})
+    assert patched._cards_by_character == rebuilt._cards_by_character
+    assert patched._gachas_by_card == rebuilt._gachas_by_card
+    for char_id in range(1, 130):
+        assert [r.to_dict() for r in patched.cards_for_character(char_id)] == [
+            r.to_dict() for r in rebuilt.cards_for_character(char_id)
+        ]
+
+
+def test_unchanged_rows_return_the_same_table():
+    table = build_table("cards", _cards(50))
+    patched, changes = table.patched(_cards(50))
+    assert patched is table
+    assert changes == (0, 0, 0)
+
+
+def test_updates_and_appends_patch_columns_and_reverse_indexes_in_place():
+    cards, gachas = _cards(50), _gachas(10)
+    tables = {"cards": build_table("cards", cards), "gachas": build_table("gachas", gachas)}
+    index = PjskIndex(tables)
+    before = {key: list(positions) for key, positions in index._cards_by_character.items()}
+
+    new_cards = _cards(55, moved={3, 20})
+    patched, changes = tables["cards"].patched(new_cards)
+    assert changes == (5, 2, 0)
+    assert patched.touched == (2, 19, 50, 51, 52, 53, 54)
+    # Kept rows share their packed values with the previous table
+    assert patched.column("prefix")[0] is tables["cards"].column("prefix")[0]
+
+    new_index = PjskIndex({"cards": patched, "gachas": tables["gachas"]}, index)
+    _assert_same_index(new_index, new_cards, gachas)
+    assert new_index._gachas_by_card is index._gachas_by_card
+    # The previous snapshot's index is left as it was
+    assert index._cards_by_character == before
+
+
+def test_removed_and_inserted_ids_fall_back_to_a_merge():
+    cards, gachas = _cards(30), _gachas(5)
+    tables = {"cards": build_table("cards", cards), "gachas": build_table("gachas", gachas)}
+    index = PjskIndex(tables)
+
+    new_cards = [card for card in cards if card["id"] != 10] + [{"id": 0, "characterId": 5}]
+    patched, changes = tables["cards"].patched(new_cards)
+    assert changes == (1, 0, 1)
+    assert patched.base is None
+    assert list(patched.ids[:3]) == [0, 1, 2]
+    _assert_same_index(PjskIndex({"cards": patched, "gachas": tables["gachas"]}, index), new_cards, gachas)
@@ -0,0 +1,24 @@
+import asyncio
+
+import search_index
+
+
+def _index_with(segment: tuple, entries: dict) -> search_index.SearchIndex:
+    index = search_index.SearchIndex(bot=None)
+    index._apply(segment, search_index._prepare(entries), [])
+    return index
+
+
+def test_pjsk_hits_only_come_from_the_users_region():
+    index = _index_with(("card", "pjsk", "ENG"), {12: (("ENG", "Miku Card", "Miku Card"),)})
+
+    assert [hit.token for hit in index.search("miku card", "card", "ENG")] == ["pjsk12"]
+    # The Japanese master data may not have card 12, or have another card under that id
+    assert index.search("miku card", "card", "JPN") == []
+    assert index.search("miku card", "card", "ENG", source="bestdori") == []
+
+
+def test_leading_id_is_looked_up_not_searched():
+    # Ids never reach the search or a reply, so no context is needed
+    assert asyncio.run(search_index.resolve_query(None, "ENG", "card", "12 extra")) == "12"
+    assert asyncio.run(search_index.resolve_query(None, "ENG", "card", "pjsk12 extra")) == "pjsk12"
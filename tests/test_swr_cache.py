@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+import swr_cache
+import upstream
+from singleflight import SingleFlight
+
+
+def _expired_cache(key, value) -> swr_cache.SwrCache:
+    cache = swr_cache.SwrCache(SingleFlight(), soft_ttl=1, hard_ttl=2)
+    cache._entries[key] = swr_cache._Entry(value, time.monotonic() - 10)
+    return cache
+
+
+def test_hung_source_past_hard_ttl_serves_old_value_within_deadline():
+    async def run():
+        cache = _expired_cache("k", "old")
+
+        async def hang():
+            await asyncio.sleep(60)
+
+        started = time.monotonic()
+        value = await upstream.with_deadline(cache.get("k", hang), 1.0)
+        assert value == "old"
+        assert time.monotonic() - started < 1.0
+        await cache.close()
+
+    asyncio.run(run())
+
+
+def test_unavailable_source_past_hard_ttl_serves_old_value():
+    async def run():
+        cache = _expired_cache("k", "old")
+
+        async def down():
+            raise upstream.UpstreamUnavailable("down.test")
+
+        assert await upstream.with_deadline(cache.get("k", down), 1.0) == "old"
+
+    asyncio.run(run())
+
+
+def test_fresh_load_past_hard_ttl_replaces_old_value():
+    async def run():
+        cache = _expired_cache("k", "old")
+
+        async def load():
+            return "new"
+
+        assert await upstream.with_deadline(cache.get("k", load), 1.0) == "new"
+        assert await cache.get("k", load) == "new"
+
+    asyncio.run(run())
+
+
+def test_load_past_hard_ttl_outlives_the_callers_deadline():
+    async def run():
+        cache = _expired_cache("k", "old")
+
+        async def slow():
+            await asyncio.sleep(0.5)
+            return "new"
+
+        async def load():
+            # Through upstream.call(), which cuts attempts off at the current deadline
+            return await upstream.call("slow.test", slow)
+
+        assert await upstream.with_deadline(cache.get("k", load), 0.3) == "old"
+        await asyncio.sleep(0.8)
+        assert cache._entries["k"].value == "new"
+        await cache.close()
+
+    asyncio.run(run())
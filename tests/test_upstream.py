@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+import upstream
+
+
+def _open_breaker(entry: upstream.Upstream):
+    entry.breaker.cooldown = 0.01
+    for _ in range(entry.breaker.threshold):
+        entry.breaker.record_failure()
+    assert entry.breaker.state == "open"
+
+
+async def _ok():
+    return "ok"
+
+
+def test_probe_with_expired_deadline_releases_half_open_circuit():
+    async def run():
+        entry = upstream.Upstream("probe.test", 100, 100)
+        _open_breaker(entry)
+        await asyncio.sleep(0.02)
+
+        # The probe is let through, then finds the command out of time before sending anything
+        token = upstream._deadline.set(asyncio.get_running_loop().time() - 1)
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await entry.call(_ok)
+        finally:
+            upstream._deadline.reset(token)
+
+        assert entry.breaker.state == "half-open"
+        assert await entry.call(_ok) == "ok"
+        assert entry.breaker.state == "closed"
+
+    asyncio.run(run())
+
+
+def test_cancelled_probe_releases_half_open_circuit():
+    async def run():
+        entry = upstream.Upstream("cancel.test", 100, 100)
+        _open_breaker(entry)
+        await asyncio.sleep(0.02)
+
+        hung = asyncio.Event()
+
+        async def hang():
+            hung.set()
+            await asyncio.sleep(60)
+
+        probe = asyncio.create_task(entry.call(hang))
+        await hung.wait()
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        assert await entry.call(_ok) == "ok"
+        assert entry.breaker.state == "closed"
+
+    asyncio.run(run())
+
+
+def test_half_open_lets_one_probe_through():
+    async def run():
+        entry = upstream.Upstream("single.test", 100, 100)
+        _open_breaker(entry)
+        await asyncio.sleep(0.02)
+
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return "ok"
+
+        probe = asyncio.create_task(entry.call(slow))
+        await asyncio.sleep(0)
+        with pytest.raises(upstream.UpstreamUnavailable):
+            await entry.call(_ok)
+        release.set()
+        assert await probe == "ok"
+        assert entry.breaker.state == "closed"
+
+    asyncio.run(run())
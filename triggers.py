@@ -0,0 +1,35 @@
+class TriggerMatcher:
+    def __init__(self, triggers: dict[str, str] | None = None):
+        # First character -> [(trigger, command)], longest trigger first so "查卡池" would beat "查卡"
+        self._by_first: dict[str, list[tuple[str, str]]] = {}
+        for trigger, command in (triggers or {}).items():
+            self.register(trigger, command)
+
+    def register(self, trigger: str, command: str):
+        if not trigger or " " in trigger:
+            raise ValueError(f"Invalid raw command trigger {trigger!r}")
+        bucket = [entry for entry in self._by_first.get(trigger[0], []) if entry[0] != trigger]
+        bucket.append((trigger, command))
+        bucket.sort(key=lambda entry: len(entry[0]), reverse=True)
+        self._by_first[trigger[0]] = bucket
+
+    def unregister(self, trigger: str):
+        bucket = [entry for entry in self._by_first.get(trigger[:1], []) if entry[0] != trigger]
+        if bucket:
+            self._by_first[trigger[0]] = bucket
+        else:
+            self._by_first.pop(trigger[:1], None)
+
+    def rewrite(self, content: str, prefix: str) -> str | None:
+        # Almost every chat message is rejected by this single dict lookup
+        if not content:
+            return None
+        bucket = self._by_first.get(content[0])
+        if bucket is None:
+            return None
+
+        for trigger, command in bucket:
+            if content == trigger or content.startswith(f"{trigger} "):
+                args = content[len(trigger):].strip()
+                return f"{prefix}{command} {args}" if args else f"{prefix}{command}"
+        return None
@@ -0,0 +1,246 @@
+import asyncio
+import contextvars
+import random
+import time
+from typing import Any, Awaitable, Callable
+from urllib.parse import urlsplit
+
+import aiohttp
+import bestdori.exceptions
+
+import metrics
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# ── Upstream resilience configuration ───────────────────────────────────────────
+# Time budget for everything a single command fetches, retries included
+COMMAND_DEADLINE = 12.0
+# Cap for one attempt, so a hung request leaves room for a retry
+ATTEMPT_TIMEOUT = 8.0
+MAX_RETRIES = 2
+BACKOFF_BASE = 0.25
+BACKOFF_CAP = 2.0
+# Consecutive failures that open a host's circuit, and how long it stays open
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0
+# host -> (requests per second, burst)
+RATE_LIMITS = {
+    "bestdori.com": (5, 10),
+    "raw.githubusercontent.com": (10, 20),
+    "api.github.com": (1, 5),
+    "storage.sekai.best": (10, 20),
+}
+DEFAULT_RATE_LIMIT = (10, 20)
+BESTDORI_HOST = "bestdori.com"
+# ────────────────────────────────────────────────────────────────────────────────
+
+_TRANSPORT_ERRORS = (aiohttp.ClientConnectionError, asyncio.TimeoutError)
+if httpx is not None:
+    _TRANSPORT_ERRORS += (httpx.TransportError,)
+
+# Absolute loop time by which the current command has to answer
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar("upstream_deadline", default=None)
+
+
+class UpstreamUnavailable(Exception):
+    def __init__(self, host: str):
+        self.host = host
+        super().__init__(f"{host} is unavailable, try again later")
+
+
+def remaining() -> float | None:
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - asyncio.get_running_loop().time()
+
+
+def clear_deadline():
+    # For background work spawned from a command, which may outlive the command's budget
+    _deadline.set(None)
+
+
+async def with_deadline(awaitable: Awaitable, seconds: float = COMMAND_DEADLINE) -> Any:
+    # Tasks started inside inherit the deadline, a nested budget can only shrink it
+    left = remaining()
+    if left is not None:
+        seconds = min(seconds, left)
+    token = _deadline.set(asyncio.get_running_loop().time() + seconds)
+    try:
+        return await asyncio.wait_for(awaitable, max(seconds, 0))
+    finally:
+        _deadline.reset(token)
+
+
+def _retryable(error: BaseException) -> bool:
+    if isinstance(error, _TRANSPORT_ERRORS):
+        return True
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status >= 500 or error.status == 429
+    if isinstance(error, bestdori.exceptions.HTTPStatusError):
+        return error.status_code >= 500 or error.status_code == 429
+    return False
+
+
+def is_transient(error: BaseException) -> bool:
+    # Might work on the next try, unlike a 404 or "does not exist", which is an answer in itself
+    return isinstance(error, (UpstreamUnavailable, asyncio.TimeoutError)) or _retryable(error)
+
+
+def _status(error: BaseException) -> str:
+    # Metric label, kept to a handful of values per host
+    if isinstance(error, aiohttp.ClientResponseError):
+        return str(error.status)
+    if isinstance(error, bestdori.exceptions.HTTPStatusError):
+        return str(error.status_code)
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+    if isinstance(error, _TRANSPORT_ERRORS):
+        return "transport"
+    return "error"
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            wait = (1 - self._tokens) / self.rate
+            left = remaining()
+            if left is not None and wait > left:
+                raise asyncio.TimeoutError()
+            await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        # Half-open lets exactly one probe through, its result closes or re-opens the circuit
+        if state == "half-open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def release_probe(self):
+        # Idempotent, record_success() / record_failure() already clear it
+        self._probing = False
+
+    def record_success(self):
+        self.failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._probing or self.failures >= self.threshold:
+            if self._opened_at is None or self._probing:
+                print(f"[upstream] {self.name}: circuit opened after {self.failures} failure(s)")
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+
+class Upstream:
+    def __init__(self, host: str, rate: float, burst: int):
+        self.host = host
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(host)
+
+    async def call(self, factory: Callable[[], Awaitable[Any]]) -> Any:
+        # factory is called again for every attempt, so pass a function, not a coroutine
+        for attempt in range(MAX_RETRIES + 1):
+            probe = self.breaker.state == "half-open"
+            if not self.breaker.allow():
+                metrics.inc("bot_upstream_short_circuits_total", host=self.host)
+                raise UpstreamUnavailable(self.host)
+            try:
+                await self.bucket.acquire()
+
+                timeout = ATTEMPT_TIMEOUT
+                left = remaining()
+                if left is not None:
+                    if left <= 0:
+                        raise asyncio.TimeoutError()
+                    timeout = min(timeout, left)
+
+                started = time.perf_counter()
+                try:
+                    result = await asyncio.wait_for(factory(), timeout)
+                except Exception as e:
+                    metrics.observe("bot_upstream_seconds", time.perf_counter() - started, host=self.host, status=_status(e))
+                    if not _retryable(e):
+                        # 404s, "not exist" and the like mean the host itself is fine
+                        self.breaker.record_success()
+                        raise
+                    self.breaker.record_failure()
+                    if attempt == MAX_RETRIES:
+                        raise
+                    # Full jitter, so retries from a burst of commands do not land together
+                    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+                    left = remaining()
+                    if left is not None and delay >= left:
+                        raise
+                    print(f"[upstream] {self.host}: {type(e).__name__} {e}, retry {attempt + 1}/{MAX_RETRIES}")
+                    await asyncio.sleep(delay)
+                else:
+                    metrics.observe("bot_upstream_seconds", time.perf_counter() - started, host=self.host, status="ok")
+                    self.breaker.record_success()
+                    return result
+            finally:
+                if probe:
+                    # A probe that ran out of budget or was cancelled before it got an answer
+                    # must not keep the circuit half-open with nobody allowed through
+                    self.breaker.release_probe()
+
+
+_upstreams: dict[str, Upstream] = {}
+
+
+def upstream(host: str) -> Upstream:
+    entry = _upstreams.get(host)
+    if entry is None:
+        rate, burst = RATE_LIMITS.get(host, DEFAULT_RATE_LIMIT)
+        entry = _upstreams[host] = Upstream(host, rate, burst)
+    return entry
+
+
+def host_of(url: str) -> str:
+    return urlsplit(url).hostname or url
+
+
+async def call(host: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+    return await upstream(host).call(factory)
+
+
+async def call_url(url: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+    return await upstream(host_of(url)).call(factory)
@@ -0,0 +1,187 @@
+import asyncio
+import time
+
+import bestdori_data
+import pjsk_master
+
+# ── Warm-up configuration ───────────────────────────────────────────────────────
+# PJSK regions whose master tables are loaded (and kept refreshed) from startup
+WARMUP_REGIONS = ("ENG", "JPN")
+# Art of this many newest cards per source is prefetched into the asset cache
+NEWEST_CARDS = 20
+# Concurrent prefetch downloads, small so live commands keep most of the connection pool
+PREFETCH_CONCURRENCY = 3
+# Bestdori keeps per-server lists in this order (publishedAt, closedAt, ...)
+BESTDORI_SERVERS = ("jp", "en", "tw", "cn", "kr")
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class WarmupPipeline:
+    def __init__(self, bot, regions=WARMUP_REGIONS, newest: int = NEWEST_CARDS, concurrency: int = PREFETCH_CONCURRENCY):
+        self.bot = bot
+        self.regions = tuple(regions)
+        self.newest = newest
+        self._budget = asyncio.Semaphore(concurrency)
+        self._tasks: set[asyncio.Task] = set()
+        self._started = False
+        # Ids already seen, so a refresh only prefetches what is actually new
+        self._known_pjsk: dict[str, tuple[set, set]] = {}
+        self._known_bestdori: tuple[set, set] | None = None
+
+    def start(self):
+        if self._started:
+            return
+        self._started = True
+        self.bot.pjsk_master.add_listener(self._on_pjsk_update)
+        self.bot.card_directory.add_listener(self._on_bestdori_update)
+        self.bot.gacha_directory.add_listener(self._on_bestdori_update)
+        self._spawn(self.run())
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def run(self):
+        started = time.monotonic()
+        jobs = [self._warm_pjsk(lang) for lang in self.regions]
+        jobs.append(self._warm_bestdori())
+        results = await asyncio.gather(*jobs, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"[warmup] Step failed: {result}")
+        print(f"[warmup] Done in {time.monotonic() - started:.1f}s")
+
+    # ── PJSK ────────────────────────────────────────────────────────────────────
+    async def _warm_pjsk(self, lang: str):
+        snapshot = await self.bot.pjsk_master.get_snapshot(lang)
+        index = snapshot.index
+        card_ids = index.card_ids()
+        gacha_ids = index.gacha_ids()
+        self._known_pjsk[snapshot.repo] = (set(card_ids), set(gacha_ids))
+
+        active = index.gachas_active_at(_now_ms())
+        await self._prefetch_pjsk(index.cards(card_ids[-self.newest:]), active)
+
+    async def _prefetch_pjsk(self, cards: list, gachas: list):
+        paths = []
+        for card in cards:
+            if not card or not card.get("assetbundleName"):
+                continue
+            paths.append(pjsk_master.card_art_path(card, "normal"))
+            if pjsk_master.can_train(card):
+                paths.append(pjsk_master.card_art_path(card, "after_training"))
+        for gacha in gachas:
+            if gacha and gacha.get("assetbundleName"):
+                paths.append(pjsk_master.banner_path(gacha))
+        await asyncio.gather(*(
+            self._prefetch("sekai", path, url=f"{pjsk_master.ASSET_BASE}/{path}") for path in paths
+        ))
+
+    def _on_pjsk_update(self, repo: str):
+        if repo in self._known_pjsk:
+            self._spawn(self._prefetch_new_pjsk(repo))
+
+    async def _prefetch_new_pjsk(self, repo: str):
+        snapshot = self.bot.pjsk_master.snapshot_for_repo(repo)
+        if snapshot is None:
+            return
+        index = snapshot.index
+        known_cards, known_gachas = self._known_pjsk[repo]
+        new_cards = [card_id for card_id in index.card_ids() if card_id not in known_cards]
+        new_gachas = [gacha_id for gacha_id in index.gacha_ids() if gacha_id not in known_gachas]
+        known_cards.update(new_cards)
+        known_gachas.update(new_gachas)
+        if new_cards or new_gachas:
+            print(f"[warmup] {repo}: prefetching {len(new_cards)} new card(s), {len(new_gachas)} new gacha(s)")
+            await self._prefetch_pjsk(index.cards(new_cards), index.gachas(new_gachas))
+
+    # ── Bestdori ────────────────────────────────────────────────────────────────
+    async def _warm_bestdori(self):
+        _, _, cards, gachas = await asyncio.gather(
+            self.bot.band_directory.get(),
+            self.bot.character_directory.get(),
+            self.bot.card_directory.get(),
+            self.bot.gacha_directory.get(),
+        )
+        self._known_bestdori = (set(cards), set(gachas))
+
+        newest = sorted(cards, key=int)[-self.newest:]
+        now = _now_ms()
+        active = [
+            (gacha_id, server)
+            for gacha_id, gacha in gachas.items()
+            for server, published, closed in zip(
+                BESTDORI_SERVERS, gacha.get("publishedAt") or [], gacha.get("closedAt") or []
+            )
+            if published and closed and int(published) <= now <= int(closed)
+        ]
+        await self._prefetch_bestdori({card_id: cards[card_id] for card_id in newest}, active)
+
+    async def _prefetch_bestdori(self, cards: dict, gachas: list):
+        jobs = []
+        for card_id, card in cards.items():
+            card_id = int(card_id)
+            variants = ["normal"]
+            if (card or {}).get("rarity", 0) >= 3:
+                variants.append("after_training")
+            for variant in variants:
+                jobs.append(self._prefetch(
+                    "bestdori", bestdori_data.card_art_path(card_id, variant),
+                    loader=bestdori_data.card_art_loader(card_id, variant),
+                ))
+        for gacha_id, server in gachas:
+            gacha_id = int(gacha_id)
+            jobs.append(self._prefetch(
+                "bestdori", bestdori_data.banner_path(gacha_id, server),
+                loader=bestdori_data.banner_loader(gacha_id, server),
+            ))
+        await asyncio.gather(*jobs)
+
+    def _on_bestdori_update(self):
+        if self._known_bestdori is not None:
+            self._spawn(self._prefetch_new_bestdori())
+
+    async def _prefetch_new_bestdori(self):
+        cards = await self.bot.card_directory.get()
+        gachas = await self.bot.gacha_directory.get()
+        known_cards, known_gachas = self._known_bestdori
+        new_cards = {card_id: card for card_id, card in cards.items() if card_id not in known_cards}
+        new_gachas = [gacha_id for gacha_id in gachas if gacha_id not in known_gachas]
+        known_cards.update(new_cards)
+        known_gachas.update(new_gachas)
+        if new_cards or new_gachas:
+            print(f"[warmup] Bestdori: prefetching {len(new_cards)} new card(s), {len(new_gachas)} new gacha(s)")
+            # Banners of new gachas for every server they are already published on
+            banners = [
+                (gacha_id, server)
+                for gacha_id in new_gachas
+                for server, published in zip(BESTDORI_SERVERS, gachas[gacha_id].get("publishedAt") or [])
+                if published
+            ]
+            await self._prefetch_bestdori(new_cards, banners)
+
+    # ── Shared ──────────────────────────────────────────────────────────────────
+    async def _prefetch(self, source: str, path: str, url: str | None = None, loader=None):
+        cache = self.bot.asset_cache
+        if (source, path) in cache:
+            return
+        # The budget only gates downloads, cached entries above return immediately
+        async with self._budget:
+            try:
+                if url is not None:
+                    await cache.fetch_url(source, path, url)
+                else:
+                    await cache.fetch(source, path, loader)
+            except Exception as e:
+                # e.g. a card without after-training art, the cog handles it on demand
+                print(f"[warmup] Could not prefetch {source}:{path}: {e}")